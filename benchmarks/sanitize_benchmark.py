@@ -0,0 +1,44 @@
+"""
+Compares sanitize_dataframe with the per-cell df.map(clean_string) it
+replaces, on a frame shaped like a value-codes mapping sheet.
+
+    python benchmarks/sanitize_benchmark.py
+"""
+import time
+import numpy as np
+import pandas as pd
+
+from sa_conversion_utils.utils.sanitize_utils import clean_string, sanitize_dataframe
+
+
+def main():
+    # Shaped like a value-codes mapping sheet: mostly clean text, one column
+    # with stray control characters, plus numeric and date columns
+    rows = 500_000
+    rng = np.random.default_rng(0)
+    codes = np.array([f"Code {i} description" for i in range(5_000)], dtype=object)
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "code": rng.choice(codes, rows),
+        "description": rng.choice(codes, rows),
+        "notes": np.where(rng.random(rows) < 0.01, "line one\x0bline two\x00", "plain note"),
+        "amount": rng.random(rows) * 1000,
+        "created": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10_000, rows), unit="min"),
+    })
+
+    start = time.perf_counter()
+    expected = df.map(clean_string)
+    per_cell = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = sanitize_dataframe(df)
+    vectorized = time.perf_counter() - start
+
+    assert result.equals(expected), "vectorized result differs from df.map(clean_string)"
+    print(f"{rows:,} rows x {len(df.columns)} columns")
+    print(f"df.map(clean_string): {per_cell:.2f} seconds")
+    print(f"sanitize_dataframe:   {vectorized:.2f} seconds ({per_cell / vectorized:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,11 +26,13 @@ setup(
     install_requires=[
         "bson >= 0.5.10", 
         "pandas",
+        "numpy",
         "sqlalchemy",
         "rich",
         "python-dotenv",
         "pyodbc",
         "openpyxl",
+        "xlsxwriter",
         "chardet",
         "pyyaml",
         "psycopg",
@@ -40,6 +42,8 @@ setup(
     ],
     extras_require={
         "dev": ["pytest>=7.0", "twine>=4.0.2"],
+        "zstd": ["zstandard"],
+        "parquet": ["pyarrow"],
     },
     python_requires=">=3.10",
     entry_points={"console_scripts": ["sami = sa_conversion_utils.main:main"]}
@@ -1,13 +1,20 @@
 import os
 import re
+import hashlib
 import subprocess
 import argparse
 import logging
-import zipfile
 
 from sa_conversion_utils.utils.validate_dir import validate_dir
+from sa_conversion_utils.utils.compression import compress_file, compression_suffix
+from sa_conversion_utils.utils.sqlcmd import run_sqlcmd_with_progress, fetch_database_size
+from sa_conversion_utils.commands.backup_catalog import BackupCatalog, backup_set_key, read_backup_header, to_sql_path
+from sa_conversion_utils.commands.backup_verify import verify_backup_set, hash_backup_files, verify_all
+from sa_conversion_utils.commands.backup_store import BackupStore, StoreBusyError, STORE_DIR_NAME, setup_store_parser, transfer_progress
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from rich.console import Console
+from rich.table import Table
 from rich.prompt import Confirm, Prompt
 from dotenv import load_dotenv
 
@@ -28,25 +35,168 @@ def setup_parser(subparsers):
 	backup_parser = subparsers.add_parser("backup", help="Backup SQL Server database.")
 	backup_parser.add_argument("-s", "--server", default=DEFUALT_SERVER, help="SQL Server")
 	backup_parser.add_argument("-d", "--database", default=DEFAULT_DB, help="Database")
-	backup_parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="Output path for the backup file.",)
+	backup_parser.add_argument("-o", "--output", nargs="+", default=DEFAULT_OUTPUT, help="Output directory for the backup file. Give several directories to spread stripes across them.",)
 	backup_parser.add_argument("-m", "--message", default="manual_backup", help="Message to include in the backup filename.")
 	backup_parser.add_argument("-y", "--yes", action="store_true", help="Skip confirmation prompt.")
-	backup_parser.add_argument("-z", "--zip", action="store_true", help="Zip the backup after creation")
-	backup_parser.set_defaults(func=lambda args: backup(args.server, args.database, args.message, args.output, args.yes))
+	backup_parser.add_argument("-z", "--compress", "--zip", dest="zip", action="store_true", help="Compress the backup into a .bak.gz or .bak.zst archive (see --archive-format) after creation. --zip is kept as an alias and no longer produces .zip files; restore still accepts older .bak.zip archives.")
+	backup_parser.add_argument("--archive-format", choices=["gzip", "zstd"], default="gzip", help="Archive format for --compress: .bak.gz or .bak.zst (default: gzip; zstd requires 'zstandard').")
+	backup_parser.add_argument("--archive-level", type=int, help="Compression level for --compress (default: 6 for gzip, 3 for zstd).")
+	backup_parser.add_argument("--archive-threads", type=int, help="Compression threads for --compress (default: all cores).")
+	backup_parser.add_argument("--compression", action="store_true", help="Use native SQL Server backup compression.")
+	backup_parser.add_argument("--stripes", type=int, default=1, help="Number of files to stripe the backup across (default: 1).")
+	backup_parser.add_argument("--buffercount", type=int, help="BUFFERCOUNT: number of I/O buffers used for the backup.")
+	backup_parser.add_argument("--maxtransfersize", type=int, help="MAXTRANSFERSIZE in bytes: largest unit of transfer, a multiple of 64 KB up to 4 MB.")
+	backup_parser.add_argument("--checksum", action="store_true", help="Verify page checksums and write a backup checksum.")
+	backup_parser.add_argument("--differential", action="store_true", help="Only back up extents changed since the last full backup.")
+	backup_parser.add_argument("--verify", action="store_true", help="Run RESTORE VERIFYONLY WITH CHECKSUM in the background after the backup (implies --checksum).")
+	backup_parser.add_argument("--store", action="store_true", help=f"Also add the backup to the deduplicated store (<output>/{STORE_DIR_NAME}).")
+	backup_parser.set_defaults(func=lambda args: backup(
+		args.server, args.database, args.message, args.output, args.yes,
+		zip_output=args.zip,
+		archive_format=args.archive_format,
+		archive_level=args.archive_level,
+		archive_threads=args.archive_threads,
+		compression=args.compression,
+		stripes=args.stripes,
+		buffer_count=args.buffercount,
+		max_transfer_size=args.maxtransfersize,
+		checksum=args.checksum,
+		differential=args.differential,
+		verify=args.verify,
+		store=args.store,
+	))
 
+	catalog_subparsers = backup_parser.add_subparsers(title="catalog", dest="backup_command")
 
-def zip_backup_file(bak_path: str) -> str:
-    """Zip the .bak file and return path to the .zip"""
-    zip_path = bak_path + ".zip"
+	index_parser = catalog_subparsers.add_parser("index", help="Rescan the backup directory into the backup catalog.")
+	index_parser.add_argument("-s", "--server", default=DEFUALT_SERVER, help="SQL Server used to read RESTORE HEADERONLY metadata.")
+	index_parser.add_argument("--backup-dir", default=DEFAULT_OUTPUT, help="Directory where backup files are stored.")
+	index_parser.add_argument("--no-header", action="store_true", help="Only catalog file names and sizes; skip RESTORE HEADERONLY.")
+	index_parser.set_defaults(func=index_backups)
+
+	list_parser = catalog_subparsers.add_parser("list", help="List catalogued backups, newest first.")
+	list_parser.add_argument("pattern", nargs="?", help="Only list backups whose name or database contains this.")
+	list_parser.add_argument("--backup-dir", default=DEFAULT_OUTPUT, help="Directory where backup files are stored.")
+	list_parser.set_defaults(func=list_backups)
+
+	verify_parser = catalog_subparsers.add_parser("verify-all", help="Verify catalogued backups with RESTORE VERIFYONLY.")
+	verify_parser.add_argument("pattern", nargs="?", help="Only verify backups whose name or database contains this.")
+	verify_parser.add_argument("-s", "--server", default=DEFUALT_SERVER, help="SQL Server")
+	verify_parser.add_argument("--backup-dir", default=DEFAULT_OUTPUT, help="Directory where backup files are stored.")
+	verify_parser.add_argument("-j", "--jobs", type=int, default=4, help="Backups verified concurrently (default: 4).")
+	verify_parser.add_argument("--hash", action="store_true", help="Also sha256 each file and compare with the checksum recorded at backup time.")
+	verify_parser.set_defaults(func=verify_all)
+
+	setup_store_parser(catalog_subparsers, default_backup_dir=DEFAULT_OUTPUT)
+
+
+def index_backups(args: argparse.Namespace):
+    """Rescans a backup directory into its catalog, reading headers of new or changed backups."""
+    if not os.path.isdir(args.backup_dir):
+        console.print(f"[red]Backup directory not found: {args.backup_dir}")
+        return
+
+    catalog = BackupCatalog(args.backup_dir)
+    server = None if args.no_header else args.server
+    with console.status(f"Indexing {args.backup_dir}..."):
+        counts = catalog.refresh(server=server)
+
+    console.print(
+        f"[green]Catalogued {len(catalog.backups)} backups "
+        f"({counts['added']} added, {counts['updated']} updated, {counts['removed']} removed): {catalog.path}"
+    )
+    logger.info(f"Indexed {args.backup_dir}: {counts}")
+
+
+def list_backups(args: argparse.Namespace):
+    """Prints the catalogued backups, newest first."""
+    if not os.path.isdir(args.backup_dir):
+        console.print(f"[red]Backup directory not found: {args.backup_dir}")
+        return
+
+    entries = BackupCatalog(args.backup_dir).find(args.pattern)
+    if not entries:
+        console.print("[yellow]No backups found.")
+        return
+
+    table = Table(title=f"Backups in {args.backup_dir}")
+    table.add_column("File", style="cyan")
+    table.add_column("Database", style="magenta")
+    table.add_column("Message")
+    table.add_column("Type")
+    table.add_column("Created")
+    table.add_column("Size", justify="right")
+    for entry in entries:
+        name = entry["key"] if len(entry["files"]) == 1 else f"{entry['key']} ({len(entry['files'])} stripes)"
+        kind = entry.get("type", "full")
+        if kind == "differential" and entry.get("base"):
+            kind = f"differential of {entry['base']}"
+        table.add_row(name, entry.get("database") or "", entry.get("message") or "", kind, (entry.get("created") or "")[:19], f"{entry['size'] / 1024 ** 3:.2f} GB")
+    console.print(table)
+
+
+def stripe_paths(output_dirs: list, base_name: str, stripes: int) -> list:
+    """
+    Returns the file paths of a backup set. A single-file backup keeps the
+    plain `<base>.bak` name; striped backups are numbered `<base>_1of4.bak` and
+    assigned round-robin to the output directories.
+    """
+    stripes = max(stripes, len(output_dirs), 1)
+    if stripes == 1:
+        return [os.path.join(output_dirs[0], f"{base_name}.bak")]
+    return [
+        os.path.join(output_dirs[i % len(output_dirs)], f"{base_name}_{i + 1}of{stripes}.bak")
+        for i in range(stripes)
+    ]
+
+
+def build_backup_options(
+        name: str,
+        compression: bool = False,
+        buffer_count: int = None,
+        max_transfer_size: int = None,
+        checksum: bool = False,
+        differential: bool = False
+    ) -> str:
+    """Builds the WITH clause options for BACKUP DATABASE."""
+    options = ["NOFORMAT", "INIT", f"NAME = '{name}'", "SKIP", "NOREWIND", "NOUNLOAD"]
+    if differential:
+        options.insert(0, "DIFFERENTIAL")
+    if compression:
+        options.append("COMPRESSION")
+    if checksum:
+        options.append("CHECKSUM")
+    if buffer_count:
+        options.append(f"BUFFERCOUNT = {buffer_count}")
+    if max_transfer_size:
+        options.append(f"MAXTRANSFERSIZE = {max_transfer_size}")
+    options.append("STATS = 10")
+    return ", ".join(options)
+
+
+def archive_backup_file(
+        bak_path: str,
+        archive_format: str = "gzip",
+        level: int = None,
+        threads: int = None,
+        digest=None
+    ) -> str:
+    """
+    Compress the .bak file with a multi-threaded compressor and return the
+    path to the archive (.bak.gz or .bak.zst). The .bak is streamed, never
+    loaded into memory, and is kept alongside the archive. A hashlib digest,
+    if given, receives the .bak's bytes during the same read.
+    """
+    archive_path = bak_path + compression_suffix(archive_format)
     try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(bak_path, os.path.basename(bak_path))
-        console.print(f"[green]Zipped backup: {zip_path}")
-        logger.info(f"Zipped backup: {zip_path}")
-        return zip_path
+        with console.status(f"Compressing {os.path.basename(bak_path)} ({archive_format})..."):
+            compress_file(bak_path, archive_path, archive_format, level, threads, digest=digest)
+        console.print(f"[green]Archived backup: {archive_path}")
+        logger.info(f"Archived backup: {archive_path}")
+        return archive_path
     except Exception as e:
-        console.print(f"[red]Error zipping backup: {e}")
-        logger.error(f"Error zipping backup: {e}")
+        console.print(f"[red]Error archiving backup: {e}")
+        logger.error(f"Error archiving backup: {e}")
         raise
 
 
@@ -56,7 +206,18 @@ def backup(
 		message: str = None,
 		output: str = DEFAULT_OUTPUT,
 		skip_confirm: bool = False,
-		zip_output: bool = False
+		zip_output: bool = False,
+		archive_format: str = "gzip",
+		archive_level: int = None,
+		archive_threads: int = None,
+		compression: bool = False,
+		stripes: int = 1,
+		buffer_count: int = None,
+		max_transfer_size: int = None,
+		checksum: bool = False,
+		differential: bool = False,
+		verify: bool = False,
+		store: bool = False
     ):
 
     if not server:
@@ -74,36 +235,128 @@ def backup(
 	# Sanitize message for safe filenames
     message = re.sub(r'[^A-Za-z0-9_-]+', '_', message)
 
-    # Create the backup filename
+    # Create the backup filename(s)
+    output_dirs = [output] if isinstance(output, str) else list(output)
     timestamp = datetime.now().strftime("%Y-%m-%d")
-    filename = f"{database}_{message}_{timestamp}.bak"
-    backup_path = os.path.join(output, filename)
+    kind = "diff_" if differential else ""
+    backup_paths = stripe_paths(output_dirs, f"{database}_{message}_{kind}{timestamp}", stripes)
+    backup_path = backup_paths[0]
 
-    # Check if the output directory exists, and create it if it doesn't
-    if not validate_dir(output, logger, create_if_missing=True):
-        logger.error(f"Failed to create backup directory: {output}")
-        raise ValueError(f"Failed to create backup directory: {output}")
+    # Check if the output directories exist, and create them if they don't
+    for output_dir in output_dirs:
+        if not validate_dir(output_dir, logger, create_if_missing=True):
+            logger.error(f"Failed to create backup directory: {output_dir}")
+            raise ValueError(f"Failed to create backup directory: {output_dir}")
+
+    # VERIFYONLY WITH CHECKSUM needs a backup written WITH CHECKSUM
+    checksum = checksum or verify
+
+    target = backup_path if len(backup_paths) == 1 else f"{len(backup_paths)} stripes in {', '.join(output_dirs)}"
 
     # Confirm the backup operation
     # https://learn.microsoft.com/en-us/sql/relational-databases/backup-restore/create-a-full-database-backup-sql-server?view=sql-server-ver16#TsqlProcedure
     # https://learn.microsoft.com/en-us/sql/t-sql/statements/backup-transact-sql?view=sql-server-ver16
-    if skip_confirm or Confirm.ask(f"Backup {server}.{database} to {backup_path}?"):
-        backup_command = (
-            f"sqlcmd -S {server} -Q \"BACKUP DATABASE [{database}] TO DISK = '{backup_path}' "
-            f"WITH NOFORMAT, INIT, NAME = '{database} Full Backup', SKIP, NOREWIND, NOUNLOAD, STATS = 10\""
+    if skip_confirm or Confirm.ask(f"Backup {server}.{database} to {target}?"):
+        disks = ", ".join(f"DISK = '{path}'" for path in backup_paths)
+        options = build_backup_options(
+            f"{database} {'Differential' if differential else 'Full'} Backup",
+            compression=compression,
+            buffer_count=buffer_count,
+            max_transfer_size=max_transfer_size,
+            checksum=checksum,
+            differential=differential,
         )
+        backup_query = f"BACKUP DATABASE [{database}] TO {disks} WITH {options}"
 
         try:
-            with console.status("Backing up database..."):
-                subprocess.run(backup_command, check=True, shell=True)
-                
-            console.print(f"[green]Backup complete: {backup_path}.")
-            logger.info(f"Backup complete: {backup_path}.")
+            run_sqlcmd_with_progress(
+                server,
+                backup_query,
+                f"Backing up {database}",
+                command="BACKUP",
+                database=database,
+                total_bytes=fetch_database_size(server, database),
+            )
+            console.print(f"[green]Backup complete: {target}.")
+            logger.info(f"Backup complete: {', '.join(backup_paths)}.")
         except subprocess.CalledProcessError as error:
             console.print(f"[red]Error backing up database {database}: {error}")
             logger.error(f"Error backing up database {database}: {error}")
             return
+
+        # Record the new backup in the catalog of the directory holding its first file
+        catalog = entry = None
+        try:
+            catalog = BackupCatalog(os.path.dirname(backup_path))
+            entry = catalog.record(
+                backup_paths,
+                database=database,
+                message=message,
+                header=read_backup_header(server, [to_sql_path(path) for path in backup_paths]),
+                source="backup",
+                backup_type="differential" if differential else "full",
+            )
+            # Track the differential against its base full
+            if differential:
+                entry["base"] = catalog.find_base(backup_set_key(os.path.basename(backup_path)))
+                if not entry["base"]:
+                    console.print(f"[yellow]Base full backup of {database} is not in the catalog of {catalog.backup_dir}.")
+            catalog.save()
+        except OSError as e:
+            logger.warning(f"Could not update backup catalog: {e}")
         
-        # If --zip was provided, zip the backup file
-        if zip_output:
-            zip_backup_file(backup_path)
+        # With --verify, VERIFYONLY runs on the server while the archive step
+        # (or, without --compress, a background hash) reads the files locally
+        executor = ThreadPoolExecutor(max_workers=2) if verify else None
+        if verify:
+            verify_future = executor.submit(verify_backup_set, server, [to_sql_path(path) for path in backup_paths], True)
+            if not zip_output:
+                hash_future = executor.submit(hash_backup_files, backup_paths)
+
+        # If --compress was provided, archive the backup file(s)
+        checksums = {}
+        try:
+            if zip_output:
+                for path in backup_paths:
+                    digest = hashlib.sha256() if verify else None
+                    archive_backup_file(path, archive_format, archive_level, archive_threads, digest=digest)
+                    if digest is not None:
+                        checksums[os.path.basename(path)] = digest.hexdigest()
+        finally:
+            if verify:
+                with console.status("Verifying backup..."):
+                    result = verify_future.result()
+                    if not zip_output:
+                        checksums = hash_future.result()
+                executor.shutdown()
+
+        if verify:
+            if result["status"] == "ok":
+                console.print(f"[green]Backup verified: {result['message']}")
+            else:
+                console.print(f"[red]Backup verification FAILED: {result['message']}")
+            if entry is not None:
+                entry["verify"] = result
+                entry["checksums"] = checksums
+                try:
+                    catalog.save()
+                except OSError as e:
+                    logger.warning(f"Could not update backup catalog: {e}")
+
+        # Only changed chunks are written, so storing successive backups of
+        # the same database costs a fraction of their size
+        if store:
+            backup_store = BackupStore(os.path.join(os.path.dirname(backup_path), STORE_DIR_NAME))
+            for path in backup_paths:
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    with transfer_progress() as progress:
+                        task = progress.add_task(f"Storing {os.path.basename(path)}", total=os.path.getsize(path))
+                        manifest = backup_store.add(path, on_bytes=lambda n: progress.advance(task, n))
+                except StoreBusyError as e:
+                    console.print(f"[yellow]Backup not stored: {e}. Add it later with 'sami backup store add'.")
+                    break
+                console.print(f"[green]Stored {manifest['name']}: {manifest['new_bytes'] / 1024 ** 2:,.1f} MB of new chunks.")
+
+        return backup_paths
@@ -0,0 +1,306 @@
+import os
+import re
+import json
+import logging
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..utils.file_utils import write_json_atomic
+from ..utils.sqlcmd import sqlcmd_rows
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "backup_catalog.json"
+
+# Striped backups are written as <name>_1of4.bak, <name>_2of4.bak, ...
+STRIPE_PATTERN = re.compile(r"^(?P<base>.+)_(?P<index>\d+)of(?P<count>\d+)\.bak$", re.IGNORECASE)
+
+# Backups are named <database>_<message>_<YYYY-mm-dd>.bak
+NAME_PATTERN = re.compile(r"^(?P<label>.+)_(?P<date>\d{4}-\d{2}-\d{2})$")
+
+# RESTORE HEADERONLY columns kept in the catalog
+HEADER_FIELDS = [
+    "DatabaseName", "BackupType", "BackupStartDate", "BackupFinishDate",
+    "BackupSize", "CompressedBackupSize", "FirstLSN", "LastLSN",
+    "CheckpointLSN", "DatabaseBackupLSN", "DifferentialBaseLSN",
+    "DifferentialBaseGUID", "BackupSetGUID", "ServerName",
+    "HasBackupChecksums", "IsCopyOnly",
+]
+
+# RESTORE HEADERONLY BackupType values
+BACKUP_TYPES = {"1": "full", "5": "differential"}
+
+
+def backup_set_key(filename: str) -> str:
+    """Returns the catalog key of a backup file: its name, or for stripes the name of the set."""
+    match = STRIPE_PATTERN.match(filename)
+    return f"{match.group('base')}.bak" if match else filename
+
+
+def stripe_index(path: str) -> int:
+    """Returns the 1-based stripe number of a striped backup file, 0 for a plain .bak."""
+    match = STRIPE_PATTERN.match(os.path.basename(path))
+    return int(match.group("index")) if match else 0
+
+
+def split_backup_name(key: str, database: Optional[str] = None):
+    """
+    Splits a catalog key into (database, message, date) from the naming
+    convention. Database and message can both contain underscores, so the
+    split is only exact when the database name is known (e.g. from the header).
+    """
+    label = key[:-4] if key.lower().endswith(".bak") else key
+    match = NAME_PATTERN.match(label)
+    date = None
+    if match:
+        label, date = match.group("label"), match.group("date")
+    if database and label.lower().startswith(f"{database.lower()}_"):
+        return database, label[len(database) + 1:], date
+    head, _, tail = label.partition("_")
+    return database or head, tail or None, date
+
+
+def to_sql_path(backup_file: str, base_dir: str = None) -> str:
+    """
+    Translates a local backup path to the path SQL Server sees, if
+    SQL_REMOTE_PATH_PREFIX is set. The prefix stands for base_dir (the backup
+    directory); files in its subdirectories keep their relative path.
+    """
+    prefix = os.getenv("SQL_REMOTE_PATH_PREFIX")
+    if prefix:
+        relative = os.path.basename(backup_file)
+        if base_dir:
+            try:
+                relative = os.path.relpath(os.path.abspath(backup_file), os.path.abspath(base_dir))
+            except ValueError:  # different drive
+                relative = os.pardir
+            if relative.startswith(os.pardir):
+                relative = os.path.basename(backup_file)
+        return os.path.join(prefix, relative)
+    return backup_file
+
+
+def read_backup_header(server: str, sql_paths: List[str]) -> Optional[Dict]:
+    """Runs RESTORE HEADERONLY against a backup set and returns the catalogued fields of its first backup."""
+    disks = ", ".join(f"DISK = N'{path}'" for path in sql_paths)
+    try:
+        rows = sqlcmd_rows(server, f"RESTORE HEADERONLY FROM {disks};")
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.warning(f"Could not read backup header of {sql_paths[0]}: {e}")
+        return None
+    if not rows:
+        return None
+    header = {field: rows[0].get(field) for field in HEADER_FIELDS if rows[0].get(field) not in (None, "NULL")}
+    # "2024-05-01 12:00:00.000" -> ISO, so dates sort together with file mtimes
+    for field in ("BackupStartDate", "BackupFinishDate"):
+        if field in header:
+            header[field] = header[field].replace(" ", "T")
+    return header
+
+
+class BackupCatalog:
+    """
+    Index of the backups in a backup directory, kept as backup_catalog.json
+    next to the files.
+
+    Each backup set (a .bak, or all stripes of a striped backup) has one
+    entry with its database, message, date, size and, when a server was
+    available, the RESTORE HEADERONLY metadata. Lookups read the catalog
+    instead of stat-ing every file; the directory is only rescanned when its
+    mtime shows files were added or removed.
+    """
+
+    def __init__(self, backup_dir: str, filename: str = CATALOG_FILE):
+        self.backup_dir = os.path.abspath(backup_dir)
+        self.path = os.path.join(self.backup_dir, filename)
+        self.data = {"dir_mtime": None, "backups": {}}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+                self.data.setdefault("backups", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable backup catalog {self.path}: {e}")
+
+    @property
+    def backups(self) -> Dict[str, Dict]:
+        return self.data["backups"]
+
+    def save(self):
+        write_json_atomic(self.path, self.data)
+
+    def file_paths(self, entry: Dict) -> List[str]:
+        """Returns the absolute paths of an entry's files, in stripe order."""
+        return [path if os.path.isabs(path) else os.path.join(self.backup_dir, path) for path in entry["files"]]
+
+    def relative_path(self, path: str) -> str:
+        path = os.path.abspath(path)
+        return os.path.basename(path) if os.path.dirname(path) == self.backup_dir else path
+
+    def record(
+            self,
+            paths: List[str],
+            database: str = None,
+            message: str = None,
+            header: Dict = None,
+            source: str = "index",
+            backup_type: str = None,
+            **extra
+        ) -> Dict:
+        """
+        Adds or replaces the entry for a backup set written to `paths`.
+        `source` is "backup" when the database and message are known exactly,
+        "index" when they were parsed from the file name. The backup type
+        ("full" or "differential") comes from the header when there is one.
+        """
+        key = backup_set_key(os.path.basename(paths[0]))
+        parsed_database, parsed_message, date = split_backup_name(key, database or (header or {}).get("DatabaseName"))
+        stats = [os.stat(path) for path in paths]
+        entry = {
+            "files": [self.relative_path(path) for path in paths],
+            "database": parsed_database,
+            "message": message or parsed_message,
+            "date": date,
+            "created": (header or {}).get("BackupFinishDate") or datetime.fromtimestamp(max(s.st_mtime for s in stats)).isoformat(),
+            "size": sum(s.st_size for s in stats),
+            "mtime": max(s.st_mtime for s in stats),
+            "header": header,
+            "source": source,
+            "type": BACKUP_TYPES.get((header or {}).get("BackupType")) or backup_type or "full",
+            **extra,
+        }
+        self.backups[key] = entry
+        return entry
+
+    def is_current(self, entry: Dict, paths: List[str]) -> bool:
+        """True if the entry still describes the files on disk (same size and mtime)."""
+        try:
+            stats = [os.stat(path) for path in paths]
+        except OSError:
+            return False
+        return entry.get("size") == sum(s.st_size for s in stats) and entry.get("mtime") == max(s.st_mtime for s in stats)
+
+    def refresh(self, server: str = None, read_headers: bool = True) -> Dict[str, int]:
+        """
+        Rescans the directory: new or changed backups are (re)catalogued,
+        entries whose files are gone are dropped. With a server, headers are
+        read for entries that do not have one yet.
+        """
+        sets = {}
+        with os.scandir(self.backup_dir) as entries:
+            for dir_entry in entries:
+                if dir_entry.is_file() and dir_entry.name.lower().endswith(".bak"):
+                    sets.setdefault(backup_set_key(dir_entry.name), []).append(dir_entry.path)
+
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        for key in [k for k, entry in self.backups.items() if k not in sets and not any(os.path.isabs(f) for f in entry["files"])]:
+            del self.backups[key]
+            counts["removed"] += 1
+
+        for key, paths in sets.items():
+            entry = self.backups.get(key)
+            if entry:
+                # Stripes backed up to other output directories are only known from the catalog
+                paths.extend(
+                    path for path in self.file_paths(entry)
+                    if os.path.dirname(path) != self.backup_dir and os.path.isfile(path)
+                )
+            paths.sort(key=stripe_index)
+            current = entry is not None and self.is_current(entry, paths)
+            if current and (entry.get("header") or not (server and read_headers)):
+                continue
+
+            header = entry.get("header") if current else None
+            if header is None and server and read_headers:
+                header = read_backup_header(server, [to_sql_path(path) for path in paths])
+            entry = entry or {}
+            preserved = {k: v for k, v in entry.items() if k not in ("files", "database", "message", "date", "created", "size", "mtime", "header", "source", "type")}
+            if not current:
+                # Verification results describe the old file contents
+                preserved.pop("verify", None)
+                preserved.pop("checksums", None)
+            if entry.get("source") == "backup":
+                self.record(paths, entry["database"], entry["message"], header, source="backup", backup_type=entry.get("type"), **preserved)
+            else:
+                self.record(paths, header=header, **preserved)
+            counts["updated" if entry else "added"] += 1
+
+        self.data["dir_mtime"] = os.stat(self.backup_dir).st_mtime
+        self.data["indexed"] = datetime.now().isoformat()
+        self.save()
+        return counts
+
+    def ensure_current(self):
+        """Rescans (without headers) only if files were added or removed since the last scan."""
+        if not os.path.isdir(self.backup_dir):
+            return
+        if self.data.get("dir_mtime") != os.stat(self.backup_dir).st_mtime:
+            logger.debug(f"Backup directory changed, refreshing catalog {self.path}")
+            self.refresh(read_headers=False)
+
+    def find(self, search_term: str = None) -> List[Dict]:
+        """
+        Returns the catalogued backups whose file name or database contains
+        search_term (case-insensitive), newest first. Each result carries its
+        catalog key under 'key'.
+        """
+        self.ensure_current()
+        term = (search_term or "").lower()
+        matches = [
+            {"key": key, **entry}
+            for key, entry in self.backups.items()
+            if term in key.lower() or term in (entry.get("database") or "").lower()
+        ]
+        return sorted(matches, key=lambda entry: entry.get("created") or "", reverse=True)
+
+    def find_base(self, key: str) -> Optional[str]:
+        """
+        Returns the catalog key of the full backup a differential is based on.
+
+        With headers, the base is the full whose CheckpointLSN equals the
+        differential's DifferentialBaseLSN. Without, it falls back to the
+        recorded base, then to the newest earlier full of the same database.
+        Copy-only fulls never serve as a differential base.
+        """
+        entry = self.backups[key]
+        fulls = {
+            k: e for k, e in self.backups.items()
+            if e.get("type", "full") == "full"
+            and (e.get("database") or "").lower() == (entry.get("database") or "").lower()
+            and (e.get("header") or {}).get("IsCopyOnly") != "1"
+        }
+
+        base_lsn = (entry.get("header") or {}).get("DifferentialBaseLSN")
+        if base_lsn:
+            for k, e in fulls.items():
+                if (e.get("header") or {}).get("CheckpointLSN") == base_lsn:
+                    return k
+        if entry.get("base") in fulls:
+            return entry["base"]
+        if base_lsn:
+            return None
+
+        earlier = [k for k, e in fulls.items() if (e.get("created") or "") <= (entry.get("created") or "")]
+        return max(earlier, key=lambda k: fulls[k].get("created") or "") if earlier else None
+
+    def restore_chain(self, key: str) -> List[str]:
+        """
+        Returns the catalog keys to restore in order: the full backup alone,
+        or a differential's base full followed by the differential.
+
+        Raises FileNotFoundError if a differential's base is not catalogued.
+        """
+        if self.backups[key].get("type") != "differential":
+            return [key]
+        base = self.find_base(key)
+        if not base:
+            raise FileNotFoundError(f"Base full backup of differential {key} is not in the backup catalog")
+        return [base, key]
+
+    def find_latest(self, search_term: str) -> Optional[Dict]:
+        for entry in self.find(search_term):
+            if all(os.path.isfile(path) for path in self.file_paths(entry)):
+                return entry
+        return None
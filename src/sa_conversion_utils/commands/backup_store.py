@@ -0,0 +1,530 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import socket
+import hashlib
+import logging
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from rich.console import Console
+from rich.progress import Progress, BarColumn, DownloadColumn, TextColumn, TimeRemainingColumn, TransferSpeedColumn
+from rich.table import Table
+
+from ..utils.file_utils import write_json_atomic
+from ..utils.compression import WRITE_BUFFER_SIZE, require_zstandard
+
+logger = logging.getLogger(__name__)
+console = Console()
+
+MANIFEST_SUFFIX = ".manifest.json"
+STORE_DIR_NAME = "store"
+CHUNKS_DIR = "chunks"
+MANIFESTS_DIR = "manifests"
+LOCKS_DIR = "locks"
+GC_LOCK = "gc.lock"
+STORE_CONFIG = "store.json"
+
+# Lock files of adds older than this are left over from a crashed process
+STALE_LOCK_SECONDS = 24 * 3600
+
+# Content-defined chunking: a cut is made after any byte where the low
+# CHUNK_BITS bits of the gear hash over the preceding bytes are zero, giving
+# ~1 MiB chunks on average, bounded by MIN/MAX_CHUNK_SIZE.
+CHUNK_BITS = 20
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Fixed gear table derived from sha256 so chunk boundaries never change between releases
+GEAR = np.array(
+    [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], "little") for i in range(256)],
+    dtype=np.uint32,
+)
+
+
+def find_cut_points(window: bytes, overlap: int, bits: int = CHUNK_BITS) -> np.ndarray:
+    """
+    Returns the chunk end offsets (relative to the bytes after `overlap`)
+    where the gear hash hits a boundary.
+
+    The gear hash h = (h << 1) + GEAR[byte] only depends on the last `bits`
+    bytes in its low `bits` bits, so it is computed for the whole block at
+    once: windows of 1, 2, 4, ... bytes are combined by doubling, 5 vector
+    steps for a 32-byte window. `window` starts with `overlap` bytes from the
+    previous block so positions at the block start see a full window.
+    """
+    data = np.frombuffer(window, dtype=np.uint8)
+    h = GEAR[data]
+    shifted = np.empty_like(h)
+    span = 1
+    while span < bits:
+        np.left_shift(h[:-span], np.uint32(span), out=shifted[span:])
+        h[span:] += shifted[span:]
+        span *= 2
+    h &= np.uint32((1 << bits) - 1)
+    hits = np.flatnonzero(h == 0)
+    return hits[hits >= overlap] - overlap + 1
+
+
+def iter_chunks(
+        f,
+        min_size: int = MIN_CHUNK_SIZE,
+        max_size: int = MAX_CHUNK_SIZE,
+        bits: int = CHUNK_BITS,
+        block_size: int = READ_BLOCK_SIZE,
+        workers: int = 1
+    ) -> Iterator[bytes]:
+    """
+    Splits a binary stream into content-defined chunks. Identical regions of
+    two backups produce identical chunks even if data before them was
+    inserted or removed, which fixed-size blocks would not.
+
+    Cut points of the next `workers` blocks are computed ahead on a thread
+    pool (numpy releases the GIL); boundaries do not depend on block size.
+    """
+    overlap = bits - 1
+    pending = bytearray()
+    tail = b""
+    lookahead = deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def read_ahead():
+            nonlocal tail
+            while len(lookahead) <= workers:
+                block = f.read(block_size)
+                if not block:
+                    return
+                lookahead.append((block, executor.submit(find_cut_points, tail + block, len(tail), bits)))
+                tail = (tail + block)[-overlap:]
+
+        read_ahead()
+        while lookahead:
+            block, future = lookahead.popleft()
+            read_ahead()
+            base = len(pending)
+            cuts = future.result() + base
+            pending += block
+
+            start = 0
+            for cut in cuts:
+                while cut - start > max_size:
+                    yield bytes(pending[start:start + max_size])
+                    start += max_size
+                if cut - start >= min_size:
+                    yield bytes(pending[start:cut])
+                    start = cut
+            # Whatever exceeds max_size is cut regardless of later candidates
+            while len(pending) - start > max_size:
+                yield bytes(pending[start:start + max_size])
+                start += max_size
+            del pending[:start]
+
+    if pending:
+        yield bytes(pending)
+
+
+class StoreBusyError(RuntimeError):
+    """Raised when an add and a gc would run on the same store at the same time."""
+
+
+def chunk_codec(compression: str):
+    """
+    Returns (compress, decompress) functions for chunk data. zstd contexts
+    are not thread-safe, so each thread gets its own.
+    """
+    if compression == "zstd":
+        zstandard = require_zstandard()
+        local = threading.local()
+
+        def compress(data):
+            if not hasattr(local, "compressor"):
+                local.compressor = zstandard.ZstdCompressor(level=3)
+            return local.compressor.compress(data)
+
+        def decompress(data):
+            if not hasattr(local, "decompressor"):
+                local.decompressor = zstandard.ZstdDecompressor()
+            return local.decompressor.decompress(data)
+
+        return compress, decompress
+    return (lambda data: zlib.compress(data, 6)), zlib.decompress
+
+
+class BackupStore:
+    """
+    Content-addressed, deduplicated store for .bak files.
+
+    Each backup is split into content-defined chunks; every unique chunk is
+    stored once, compressed, under chunks/<aa>/<sha256>. A manifest per
+    backup (manifests/<name>.bak.manifest.json) lists its chunks in order,
+    so nearly identical checkpoints of the same database mostly share chunks.
+    Files are reassembled by streaming the chunks back in order.
+
+    An add references chunks before its manifest is written, so gc must not
+    run meanwhile: each add holds a lock file under locks/ and gc holds
+    locks/gc.lock. Both create their own lock before looking for the other
+    kind, so of two that start together at least one sees the other and
+    gives up with StoreBusyError.
+
+    Chunks are shared by content, so every chunk in a store must use the
+    same codec: the compression is a store setting, saved in store.json by
+    the first add. Opening the store with a different compression raises
+    ValueError.
+    """
+
+    def __init__(self, store_dir: str, compression: str = None):
+        self.store_dir = os.path.abspath(store_dir)
+        self.chunks_dir = os.path.join(self.store_dir, CHUNKS_DIR)
+        self.manifests_dir = os.path.join(self.store_dir, MANIFESTS_DIR)
+        self.locks_dir = os.path.join(self.store_dir, LOCKS_DIR)
+        self.config_path = os.path.join(self.store_dir, STORE_CONFIG)
+
+        stored = self.stored_compression()
+        if stored is not None:
+            if compression is not None and compression != stored:
+                raise ValueError(
+                    f"The backup store {self.store_dir} uses {stored} compression; "
+                    f"it cannot take {compression} chunks (omit --compression or use another store)"
+                )
+            compression = stored
+        elif compression is None:
+            try:
+                import zstandard  # noqa: F401
+                compression = "zstd"
+            except ImportError:
+                compression = "zlib"
+        self.compression = compression
+
+    def stored_compression(self) -> Optional[str]:
+        """
+        The compression recorded in store.json. Stores created before it
+        existed fall back to the compression of their newest manifest.
+        """
+        if os.path.isfile(self.config_path):
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                return json.load(f)["compression"]
+        manifests = self.manifests()
+        return manifests[0]["compression"] if manifests else None
+
+    def save_config(self):
+        """Records the store's compression on its first add."""
+        if not os.path.isfile(self.config_path):
+            os.makedirs(self.store_dir, exist_ok=True)
+            write_json_atomic(self.config_path, {"compression": self.compression})
+
+    def chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def manifest_path(self, name: str) -> str:
+        return os.path.join(self.manifests_dir, f"{name}{MANIFEST_SUFFIX}")
+
+    def create_lock(self, name: str) -> str:
+        """Creates a lock file exclusively (raising FileExistsError if it exists) and returns its path."""
+        os.makedirs(self.locks_dir, exist_ok=True)
+        path = os.path.join(self.locks_dir, name)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{socket.gethostname()} pid {os.getpid()} {datetime.now().isoformat()}\n")
+        return path
+
+    def active_adds(self) -> List[str]:
+        """Lock files of adds in progress; stale ones (left by a crash) are removed."""
+        if not os.path.isdir(self.locks_dir):
+            return []
+        active = []
+        for entry in os.scandir(self.locks_dir):
+            if not entry.name.startswith("add-"):
+                continue
+            if time.time() - entry.stat().st_mtime > STALE_LOCK_SECONDS:
+                logger.warning(f"Removing stale backup store lock {entry.path}")
+                os.remove(entry.path)
+            else:
+                active.append(entry.path)
+        return active
+
+    def write_chunk(self, digest: str, data: bytes, compress) -> int:
+        """Writes one compressed chunk atomically and returns its stored size."""
+        path = self.chunk_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        packed = compress(data)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(packed)
+        os.replace(tmp_path, path)
+        return len(packed)
+
+    def add(self, bak_path: str, name: str = None, workers: int = None, on_bytes=None) -> Dict:
+        """
+        Stores a backup file and returns its manifest. Chunks already in the
+        store are only referenced; new ones are compressed on a thread pool
+        while the file is still being read.
+        """
+        name = name or os.path.basename(bak_path)
+        lock = self.create_lock(f"add-{uuid.uuid4().hex}.lock")
+        try:
+            gc_lock = os.path.join(self.locks_dir, GC_LOCK)
+            if os.path.exists(gc_lock):
+                raise StoreBusyError(f"Garbage collection is running on {self.store_dir} (delete {gc_lock} if it is not)")
+            return self.add_locked(bak_path, name, workers, on_bytes)
+        finally:
+            os.remove(lock)
+
+    def add_locked(self, bak_path: str, name: str, workers: int = None, on_bytes=None) -> Dict:
+        self.save_config()
+        compress, _ = chunk_codec(self.compression)
+        workers = workers or os.cpu_count() or 1
+        chunks = []
+        file_digest = hashlib.sha256()
+        seen = set()
+        new_chunks = 0
+        stored_bytes = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor, open(bak_path, "rb", buffering=WRITE_BUFFER_SIZE) as f:
+            pending = deque()
+            for chunk in iter_chunks(f, workers=workers):
+                file_digest.update(chunk)
+                digest = hashlib.sha256(chunk).hexdigest()
+                chunks.append([digest, len(chunk)])
+                if on_bytes:
+                    on_bytes(len(chunk))
+                if digest in seen or os.path.exists(self.chunk_path(digest)):
+                    continue
+                seen.add(digest)
+                new_chunks += 1
+                pending.append(executor.submit(self.write_chunk, digest, chunk, compress))
+                # Bound the chunks held in memory waiting for compression
+                while len(pending) >= workers * 2:
+                    stored_bytes += pending.popleft().result()
+            while pending:
+                stored_bytes += pending.popleft().result()
+
+        manifest = {
+            "name": name,
+            "source": os.path.abspath(bak_path),
+            "size": sum(size for _, size in chunks),
+            "sha256": file_digest.hexdigest(),
+            "compression": self.compression,
+            "chunks": chunks,
+            "new_chunks": new_chunks,
+            "new_bytes": stored_bytes,
+            "created": datetime.now().isoformat(),
+        }
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        write_json_atomic(self.manifest_path(name), manifest)
+        logger.info(f"Stored {name}: {len(chunks)} chunks, {new_chunks} new ({stored_bytes:,} bytes written)")
+        return manifest
+
+    def manifests(self) -> List[Dict]:
+        """Returns all manifests, newest first."""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        manifests = []
+        for entry in os.scandir(self.manifests_dir):
+            if entry.name.endswith(MANIFEST_SUFFIX):
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    manifests.append(json.load(f))
+        return sorted(manifests, key=lambda m: m["created"], reverse=True)
+
+    def find_latest(self, search_term: str) -> Optional[str]:
+        """Returns the manifest path of the newest stored backup whose name contains search_term."""
+        for manifest in self.manifests():
+            if search_term.lower() in manifest["name"].lower():
+                return self.manifest_path(manifest["name"])
+        return None
+
+    def gc(self) -> int:
+        """
+        Deletes chunks no manifest references and returns how many were
+        removed. Raises StoreBusyError if an add is in progress or another
+        gc is running.
+        """
+        if not os.path.isdir(self.chunks_dir):
+            return 0
+        try:
+            lock = self.create_lock(GC_LOCK)
+        except FileExistsError:
+            raise StoreBusyError(
+                f"Another garbage collection is running on {self.store_dir} "
+                f"(delete {os.path.join(self.locks_dir, GC_LOCK)} if it is not)"
+            )
+        try:
+            adds = self.active_adds()
+            if adds:
+                raise StoreBusyError(f"{len(adds)} backups are being added to {self.store_dir} ({', '.join(adds)})")
+            referenced = {digest for manifest in self.manifests() for digest, _ in manifest["chunks"]}
+            removed = 0
+            for prefix in os.scandir(self.chunks_dir):
+                for entry in os.scandir(prefix.path):
+                    if entry.name not in referenced:
+                        os.remove(entry.path)
+                        removed += 1
+            return removed
+        finally:
+            os.remove(lock)
+
+
+def load_manifest(manifest_path: str) -> Dict:
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def reassemble(manifest_path: str, dst_path: str, on_bytes=None):
+    """
+    Streams a stored backup back into dst_path chunk by chunk, checking each
+    chunk's sha256 and the whole file's. The store is the directory above
+    the manifest's; its chunks are decoded with the store's compression.
+    The result appears under dst_path only once complete.
+    """
+    manifest = load_manifest(manifest_path)
+    store = BackupStore(os.path.dirname(os.path.dirname(manifest_path)))
+    _, decompress = chunk_codec(store.compression)
+    file_digest = hashlib.sha256()
+    tmp_path = f"{dst_path}.tmp"
+    try:
+        with open(tmp_path, "wb", buffering=WRITE_BUFFER_SIZE) as dst:
+            for digest, size in manifest["chunks"]:
+                with open(store.chunk_path(digest), "rb") as f:
+                    data = decompress(f.read())
+                if len(data) != size or hashlib.sha256(data).hexdigest() != digest:
+                    raise ValueError(f"Chunk {digest} in {store.store_dir} is corrupt")
+                file_digest.update(data)
+                dst.write(data)
+                if on_bytes:
+                    on_bytes(size)
+        if file_digest.hexdigest() != manifest["sha256"]:
+            raise ValueError(f"Reassembled {manifest['name']} does not match its recorded sha256")
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def transfer_progress() -> Progress:
+    return Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+    )
+
+
+def resolve_store_dir(args: argparse.Namespace) -> str:
+    """--store-dir, or the store inside --backup-dir, where 'backup --store' puts it."""
+    return args.store_dir or os.path.join(args.backup_dir, STORE_DIR_NAME)
+
+
+def store_add(args: argparse.Namespace):
+    try:
+        store = BackupStore(resolve_store_dir(args), args.compression)
+    except ValueError as e:
+        console.print(f"[red]{e}")
+        return
+    for bak_path in args.files:
+        if not os.path.isfile(bak_path):
+            console.print(f"[red]Backup file not found: {bak_path}")
+            continue
+        try:
+            with transfer_progress() as progress:
+                task = progress.add_task(f"Storing {os.path.basename(bak_path)}", total=os.path.getsize(bak_path))
+                manifest = store.add(bak_path, workers=args.jobs, on_bytes=lambda n: progress.advance(task, n))
+        except StoreBusyError as e:
+            console.print(f"[red]{e}. Try again once it has finished.")
+            return
+        ratio = manifest["new_bytes"] / manifest["size"] if manifest["size"] else 0
+        console.print(
+            f"[green]Stored {manifest['name']}:[/green] {len(manifest['chunks'])} chunks, "
+            f"{manifest['new_chunks']} new, {manifest['new_bytes'] / 1024 ** 2:,.1f} MB written ({ratio:.1%} of the file)"
+        )
+
+
+def store_list(args: argparse.Namespace):
+    store = BackupStore(resolve_store_dir(args))
+    manifests = store.manifests()
+    if not manifests:
+        console.print("[yellow]The backup store is empty.")
+        return
+
+    chunk_sizes = {}
+    table = Table(title=f"Backup store {store.store_dir}")
+    table.add_column("Backup", style="cyan")
+    table.add_column("Created")
+    table.add_column("Size", justify="right")
+    table.add_column("Chunks", justify="right")
+    for manifest in manifests:
+        table.add_row(manifest["name"], manifest["created"][:19], f"{manifest['size'] / 1024 ** 3:.2f} GB", f"{len(manifest['chunks']):,}")
+        chunk_sizes.update({digest: size for digest, size in manifest["chunks"]})
+    console.print(table)
+
+    logical = sum(manifest["size"] for manifest in manifests)
+    unique = sum(chunk_sizes.values())
+    console.print(f"Logical {logical / 1024 ** 3:.2f} GB, unique {unique / 1024 ** 3:.2f} GB before compression")
+
+
+def store_gc(args: argparse.Namespace):
+    try:
+        removed = BackupStore(resolve_store_dir(args)).gc()
+    except StoreBusyError as e:
+        console.print(f"[red]{e}. Try again once it has finished.")
+        return
+    console.print(f"[green]Removed {removed} unreferenced chunks.")
+
+
+def store_extract(args: argparse.Namespace):
+    store = BackupStore(resolve_store_dir(args))
+    manifest_path = store.manifest_path(args.name)
+    if not os.path.isfile(manifest_path):
+        console.print(f"[red]No backup named {args.name} in {store.store_dir}")
+        return
+    output = args.output or os.path.join(os.getcwd(), args.name)
+    with transfer_progress() as progress:
+        task = progress.add_task(f"Reassembling {args.name}", total=load_manifest(manifest_path)["size"])
+        reassemble(manifest_path, output, on_bytes=lambda n: progress.advance(task, n))
+    console.print(f"[green]Reassembled {output}")
+
+
+def setup_store_parser(subparsers, default_backup_dir: str):
+    """
+    Adds 'store add|list|gc|extract' under the given (backup) subparsers.
+    The store defaults to <backup-dir>/store, resolved when the command runs.
+    """
+    store_dir_help = f"Store directory (default: <backup-dir>/{STORE_DIR_NAME})"
+    backup_dir_help = "Directory where backup files are stored."
+
+    store_parser = subparsers.add_parser("store", help="Deduplicated, content-addressed backup store.")
+    store_subparsers = store_parser.add_subparsers(title="store actions", dest="store_command", required=True)
+
+    add_parser = store_subparsers.add_parser("add", help="Add .bak files to the store.")
+    add_parser.add_argument("files", nargs="+", help="Backup files to store")
+    add_parser.add_argument("--store-dir", help=store_dir_help)
+    add_parser.add_argument("--backup-dir", default=default_backup_dir, help=backup_dir_help)
+    add_parser.add_argument("--compression", choices=["zstd", "zlib"], help="Chunk compression of a new store (default: zstd if installed, else zlib). An existing store keeps the compression it was created with.")
+    add_parser.add_argument("-j", "--jobs", type=int, help="Compression threads (default: all cores)")
+    add_parser.set_defaults(func=store_add)
+
+    list_parser = store_subparsers.add_parser("list", help="List stored backups and the store's dedup savings.")
+    list_parser.add_argument("--store-dir", help=store_dir_help)
+    list_parser.add_argument("--backup-dir", default=default_backup_dir, help=backup_dir_help)
+    list_parser.set_defaults(func=store_list)
+
+    gc_parser = store_subparsers.add_parser("gc", help="Delete chunks no stored backup references.")
+    gc_parser.add_argument("--store-dir", help=store_dir_help)
+    gc_parser.add_argument("--backup-dir", default=default_backup_dir, help=backup_dir_help)
+    gc_parser.set_defaults(func=store_gc)
+
+    extract_parser = store_subparsers.add_parser("extract", help="Reassemble a stored backup into a .bak file.")
+    extract_parser.add_argument("name", help="Stored backup name (its .bak file name)")
+    extract_parser.add_argument("-o", "--output", help="Output path (default: ./<name>)")
+    extract_parser.add_argument("--store-dir", help=store_dir_help)
+    extract_parser.add_argument("--backup-dir", default=default_backup_dir, help=backup_dir_help)
+    extract_parser.set_defaults(func=store_extract)
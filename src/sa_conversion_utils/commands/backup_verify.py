@@ -0,0 +1,127 @@
+import os
+import argparse
+import logging
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from rich.console import Console
+from rich.progress import Progress, BarColumn, MofNCompleteColumn, TextColumn, TimeElapsedColumn
+
+from .backup_catalog import BackupCatalog, to_sql_path
+from ..utils.file_utils import file_checksum
+from ..utils.sqlcmd import sqlcmd_query
+
+logger = logging.getLogger(__name__)
+console = Console()
+
+
+def verify_backup_set(server: str, sql_paths: List[str], checksum: bool = True) -> Dict:
+    """
+    Runs RESTORE VERIFYONLY against a backup set (WITH CHECKSUM if the backup
+    was written with checksums) and returns the result as a catalog entry:
+    {status: ok|failed, checksum, checked, message}.
+    """
+    disks = ", ".join(f"DISK = N'{path}'" for path in sql_paths)
+    query = f"RESTORE VERIFYONLY FROM {disks}{' WITH CHECKSUM' if checksum else ''};"
+    try:
+        lines = sqlcmd_query(server, query)
+        status = "ok"
+    except subprocess.CalledProcessError as e:
+        lines = [line.strip() for line in ((e.stdout or "") + (e.stderr or "")).splitlines() if line.strip()]
+        status = "failed"
+    except OSError as e:
+        lines = [str(e)]
+        status = "failed"
+
+    logger.log(logging.INFO if status == "ok" else logging.ERROR, f"VERIFYONLY {sql_paths[0]}: {status}")
+    return {
+        "status": status,
+        "checksum": checksum,
+        "checked": datetime.now().isoformat(),
+        "message": lines[-1] if lines else "",
+    }
+
+
+def hash_backup_files(paths: List[str]) -> Dict[str, str]:
+    """Returns the sha256 of each backup file, keyed by file name."""
+    return {os.path.basename(path): file_checksum(path) for path in paths}
+
+
+def has_backup_checksums(entry: Dict) -> bool:
+    """True if the backup was written WITH CHECKSUM, per its catalogued header."""
+    return (entry.get("header") or {}).get("HasBackupChecksums") == "1"
+
+
+def verify_catalog_entry(server: str, catalog: BackupCatalog, key: str, entry: Dict, hash_files: bool) -> Dict:
+    """Verifies one catalogued backup set; with hash_files, also checks or records the files' sha256."""
+    paths = catalog.file_paths(entry)
+    result = verify_backup_set(
+        server,
+        [to_sql_path(path, catalog.backup_dir) for path in paths],
+        checksum=has_backup_checksums(entry),
+    )
+    if hash_files:
+        checksums = hash_backup_files(paths)
+        recorded = entry.get("checksums")
+        if recorded and recorded != checksums:
+            result["status"] = "failed"
+            result["message"] = "File checksum differs from the one recorded at backup time"
+        result["checksums"] = checksums
+    return result
+
+
+def verify_all(args: argparse.Namespace):
+    """
+    Verifies every catalogued backup (optionally only those matching a
+    pattern) with up to --jobs VERIFYONLY runs at a time, recording each
+    result in the catalog as it completes. Results are collected on the main
+    thread, so the catalog is only ever written from there.
+    """
+    if not os.path.isdir(args.backup_dir):
+        console.print(f"[red]Backup directory not found: {args.backup_dir}")
+        return
+    if not args.server:
+        console.print("[red]Error: Server must be specified.")
+        return
+
+    catalog = BackupCatalog(args.backup_dir)
+    catalog.refresh(server=args.server)
+    entries = {entry.pop("key"): entry for entry in catalog.find(args.pattern)}
+    if not entries:
+        console.print("[yellow]No backups found.")
+        return
+
+    failed = []
+    with Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        console=console,
+    ) as progress:
+        task = progress.add_task("Verifying backups", total=len(entries))
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {
+                executor.submit(verify_catalog_entry, args.server, catalog, key, entry, args.hash): key
+                for key, entry in entries.items()
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                result = future.result()
+                checksums = result.pop("checksums", None)
+                catalog.backups[key]["verify"] = result
+                if checksums and not catalog.backups[key].get("checksums"):
+                    catalog.backups[key]["checksums"] = checksums
+                catalog.save()
+                if result["status"] == "ok":
+                    progress.console.print(f"[green]OK[/green] {key}")
+                else:
+                    failed.append(key)
+                    progress.console.print(f"[red]FAILED[/red] {key}: {result['message']}")
+                progress.advance(task)
+
+    summary = f"{len(entries) - len(failed)} of {len(entries)} backups verified"
+    console.print(f"[{'green' if not failed else 'red'}]{summary}")
+    logger.info(summary)
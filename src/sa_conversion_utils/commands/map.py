@@ -1,107 +1,233 @@
 import os
+import time
+import queue
+import shutil
+import hashlib
 import argparse
+import itertools
+import threading
 import pandas as pd
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from rich.console import Console
 from rich.prompt import Confirm
+from rich.progress import Progress, BarColumn, MofNCompleteColumn, TextColumn, TimeElapsedColumn
 from dotenv import load_dotenv
 
+from .map_workbook import MappingWorkbook, ExistingWorkbook, FileCreateError, MAX_SHEET_NAME, SPECIAL_COLUMNS_MAP, merge_annotations
+from .map_cache import MappingCache, CACHE_DIR_NAME, hash_chunk
+from .map_import import setup_import_parser
 from ..utils.create_engine import main as create_engine
-from ..utils.sanitize_utils import sanitize_dataframe
 from ..logging.logger_config import logger_config
 
 console = Console()
 logger = logger_config(name=__name__, log_file="map.log", level=logging.DEBUG, rich_console=console)
 
-def execute_query(query, engine, additional_columns=None):
-    """
-    Use pandas read_sql_query to execute a SQL query and return the result as a DataFrame.
-    """
-    try:
-        if not query:
-            logger.warning("Query is empty.")
-            return pd.DataFrame()
-
-        df = pd.read_sql_query(query, engine)
-        if additional_columns:
-            for col, default_value in additional_columns.items():
-                if col not in df.columns:
-                    df[col] = default_value
-        return df
-    except Exception as e:
-        logger.error(f"Error executing query: {e}")
-        return pd.DataFrame()
-
-def save_to_excel(dataframes, output_path):
+# Rows fetched per read_sql_query chunk, and chunks buffered per running query
+CHUNK_SIZE = 10_000
+QUEUE_DEPTH = 2
+
+def add_columns(df, additional_columns):
+    """Adds the analyst columns of special_columns_map that the query does not return."""
+    if additional_columns:
+        for col, default_value in additional_columns.items():
+            if col not in df.columns:
+                df[col] = default_value
+    return df
+
+def iter_query_chunks(query, engine, chunksize=CHUNK_SIZE, additional_columns=None):
     """
-    Save multiple DataFrames to an Excel file with different sheets.
+    Yields the result of a query as DataFrames of up to chunksize rows,
+    fetched from an open cursor, so the full result is never held in memory.
     """
-    if not dataframes:
-        logger.warning("No data to save.")
+    if not query:
+        logger.warning("Query is empty.")
         return
+    with engine.connect().execution_options(stream_results=True) as connection:
+        for chunk in pd.read_sql_query(query, connection, chunksize=chunksize):
+            yield add_columns(chunk, additional_columns)
+
+PRIORITY_ORDER = [
+    'Case Types',
+    'Case Staff',
+    'Party Roles',
+    'Value Codes',
+    'Intake'
+]
 
+def sheet_sort_key(filename):
+    """Sheets in PRIORITY_ORDER come first, in that order, then the rest alphabetically."""
+    sheet_name = os.path.splitext(filename)[0]
     try:
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for sheet_name, df in dataframes.items():
-                sanitized_df = sanitize_dataframe(df)
-                sanitized_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        logger.info(f"Excel file saved successfully to: {output_path}")
-        console.print(f"[green]Excel file saved successfully to: {output_path}[/green]")
-    except PermissionError as e:
-        logger.error(f"Permission denied: {e}")
-        console.print(f"[red]Permission denied: {e}[/red]")
-    except Exception as e:
-        logger.error(f"An error occurred while saving the Excel file: {e}")
-        console.print(f"[red]An error occurred while saving the Excel file: {e}[/red]")
+        return (PRIORITY_ORDER.index(sheet_name), sheet_name)
+    except ValueError:
+        return (float('inf'), sheet_name)
 
-def process_sql_files(mapping_dir, engine, special_columns_map):
+def read_mapping_queries(mapping_dir, special_columns_map):
     """
-    Process SQL files in the mapping directory and execute their queries.
+    Reads the mapping scripts of a directory in sheet order. Returns a list of
+    (sheet_name, query, additional_columns) tuples.
     """
-    PRIORITY_ORDER = [
-        'Case Types',
-        'Case Staff',
-        'Party Roles',
-        'Value Codes',
-        'Intake'
-    ]
-
     all_sql_files = [f for f in os.listdir(mapping_dir) if f.endswith('.sql')]
-
-    def sort_key(filename):
+    queries = []
+    for filename in sorted(all_sql_files, key=sheet_sort_key):
+        full_file_path = os.path.join(mapping_dir, filename)
         sheet_name = os.path.splitext(filename)[0]
         try:
-            return (PRIORITY_ORDER.index(sheet_name), sheet_name)
-        except ValueError:
-            return (float('inf'), sheet_name)
+            with open(full_file_path, 'r') as file:
+                query = file.read().strip()
+        except Exception as e:
+            logger.error(f"Failed to read SQL file {filename}: {e}")
+            continue
+
+        additional_columns = None
+        for pattern, columns in special_columns_map.items():
+            if pattern in filename.lower():
+                additional_columns = columns
+                break
+        queries.append((sheet_name, query, additional_columns))
+    return queries
+
+def hash_chunks(chunks, digest):
+    for chunk in chunks:
+        hash_chunk(digest, chunk)
+        yield chunk
 
-    sorted_files = sorted(all_sql_files, key=sort_key)
-    dataframes = {}
+def write_mapping_workbook(queries, engine, output_path, jobs=1, chunksize=CHUNK_SIZE, cache=None, existing=None):
+    """
+    Streams the results of the mapping queries straight into the workbook,
+    one sheet per query in sheet order. Returns the rows written per sheet
+    and the sheets whose query failed (with the error).
+
+    Up to `jobs` queries run at once, each feeding a bounded queue; sheets
+    are written in order as their queue drains. A query that is ahead of the
+    writer blocks once QUEUE_DEPTH chunks are waiting, so memory is bounded
+    by jobs * QUEUE_DEPTH chunks however large the results are.
+
+    With a MappingCache, unchanged queries are read back from it instead of
+    being run, and the others are cached as they stream.
+
+    With an ExistingWorkbook (--update), analyst work in it is kept: a sheet
+    whose query result is known to be unchanged (its cached result hash
+    matches the one recorded in the workbook) is copied as is without running
+    its query, other sheets are merged with the existing annotations, and
+    sheets no query produces (added by analysts) are copied at the end. A
+    sheet whose query fails or returns no rows is copied as is too; a query
+    failing mid-stream leaves a partial sheet, so callers must not replace
+    the existing workbook when any query failed.
+
+    Raises FileCreateError if the workbook cannot be written.
+    """
+    done = object()
+    cancelled = threading.Event()
+    result_hashes = {}
+    failed = {}
+
+    unchanged = set()
+    if existing is not None and cache is not None:
+        for sheet_name, query, _ in queries:
+            entry = cache.lookup(query)
+            if entry and entry.get("result_hash") and existing.has_sheet(sheet_name) \
+                    and existing.result_hash(sheet_name) == entry["result_hash"]:
+                unchanged.add(sheet_name)
+    queues = {sheet_name: queue.Queue(maxsize=QUEUE_DEPTH) for sheet_name, _, _ in queries if sheet_name not in unchanged}
 
-    for filename in sorted_files:
-        if filename.endswith('.sql'):
-            full_file_path = os.path.join(mapping_dir, filename)
-            sheet_name = os.path.splitext(filename)[0]
+    def put(q, item):
+        while not cancelled.is_set():
             try:
-                with open(full_file_path, 'r') as file:
-                    query = file.read().strip()
+                q.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-                    additional_columns = None
-                    for pattern, columns in special_columns_map.items():
-                        if pattern in filename.lower():
-                            additional_columns = columns
-                            break
+    def produce(sheet_name, query, additional_columns):
+        q = queues[sheet_name]
+        start = time.perf_counter()
+        rows = 0
+        digest = hashlib.sha256()
+        chunks = hash_chunks(iter_query_chunks(query, engine, chunksize), digest)
+        if cache is not None:
+            chunks = cache.iter_chunks(sheet_name, query, chunks, chunksize, digest=digest)
+        try:
+            for chunk in chunks:
+                chunk = add_columns(chunk, additional_columns)
+                rows += len(chunk)
+                if not put(q, chunk):
+                    return
+            cached = " (cached)" if cache is not None and sheet_name in cache.hits else ""
+            result_hashes[sheet_name] = cache.result_hashes.get(sheet_name) if cached else digest.hexdigest()
+            logger.info(f"{sheet_name}: {rows:,} rows in {time.perf_counter() - start:.2f}s{cached}")
+        except Exception as e:
+            failed[sheet_name] = e
+            logger.error(f"Error executing query for {sheet_name}: {e}")
+        finally:
+            chunks.close()
+            put(q, done)
+
+    def drain(q):
+        while (item := q.get()) is not done:
+            yield item
 
-                    df = execute_query(query, engine, additional_columns=additional_columns)
+    def first_rows(chunks):
+        """Returns the chunks with empty ones skipped up to the first with rows, or None if there are no rows."""
+        for chunk in chunks:
+            if not chunk.empty:
+                return itertools.chain([chunk], chunks)
+        return None
 
-                    if not df.empty:
-                        dataframes[sheet_name] = df
+    written = {}
+    with Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        console=console,
+    ) as progress, ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        query_sheets = {sheet_name[:MAX_SHEET_NAME] for sheet_name, _, _ in queries}
+        extra_sheets = [name for name in existing.sheetnames if name not in query_sheets] if existing is not None else []
+        task = progress.add_task("Writing mapping workbook", total=len(queries) + len(extra_sheets))
+        try:
+            for sheet_name, query, additional_columns in queries:
+                if sheet_name not in unchanged:
+                    executor.submit(produce, sheet_name, query, additional_columns)
+            with MappingWorkbook(output_path) as workbook:
+                for sheet_name, _, additional_columns in queries:
+                    progress.update(task, description=f"Writing {sheet_name}")
+                    if sheet_name in unchanged:
+                        logger.info(f"{sheet_name}: unchanged, kept as is")
+                        written[sheet_name] = workbook.write_sheet(sheet_name, existing.iter_chunks(sheet_name, chunksize))
+                        workbook.set_result_hash(sheet_name, existing.result_hash(sheet_name))
                     else:
-                        logger.warning(f"Empty DataFrame for SQL file: {filename}")
-            except Exception as e:
-                logger.error(f"Failed to read SQL file {filename}: {e}")
-    return dataframes
+                        chunks = drain(queues[sheet_name])
+                        if existing is not None and existing.has_sheet(sheet_name):
+                            chunks = first_rows(chunks)
+                            if chunks is None:
+                                # Nothing to merge into: keep the analyst's sheet rather than drop it
+                                reason = "failed" if sheet_name in failed else "returned no rows"
+                                logger.warning(f"{sheet_name}: query {reason}, existing sheet kept as is")
+                                written[sheet_name] = workbook.write_sheet(sheet_name, existing.iter_chunks(sheet_name, chunksize))
+                                if existing.result_hash(sheet_name):
+                                    workbook.set_result_hash(sheet_name, existing.result_hash(sheet_name))
+                                progress.advance(task)
+                                continue
+                            chunks = merge_annotations(chunks, existing, sheet_name, additional_columns or ())
+                        written[sheet_name] = workbook.write_sheet(sheet_name, chunks)
+                        if result_hashes.get(sheet_name):
+                            workbook.set_result_hash(sheet_name, result_hashes[sheet_name])
+                    if not written[sheet_name]:
+                        logger.warning(f"Empty DataFrame for SQL file: {sheet_name}.sql")
+                    progress.advance(task)
+                for sheet_name in extra_sheets:
+                    progress.update(task, description=f"Copying {sheet_name}")
+                    logger.info(f"{sheet_name}: not produced by a mapping query, kept as is")
+                    workbook.write_sheet(sheet_name, existing.iter_chunks(sheet_name, chunksize))
+                    progress.advance(task)
+        finally:
+            # Unblock queries still waiting on a queue if writing failed
+            cancelled.set()
+    return written, failed
 
 def map(args: argparse.Namespace):
     """
@@ -113,6 +239,10 @@ def map(args: argparse.Namespace):
     database = args.database or os.getenv("TARGET_DB")
     input_dir = args.input
 
+    if not input_dir:
+        console.print("[red]Error: --input is required to run mapping scripts.[/red]")
+        return
+
     if not Confirm.ask(f"Run [bold blue]{input_dir}[/bold blue] -> [bold yellow]{server}.{database}[/bold yellow]?"):
         logger.info("Execution cancelled.")
         return
@@ -122,43 +252,68 @@ def map(args: argparse.Namespace):
         console.print(f"[red]Input directory does not exist: {input_dir}[/red]")
         return
 
-    engine = create_engine(server=server, database=database)
-
-    special_columns_map = {
-        'party roles': {
-            "SA Role": None,
-            "SA Party": None
-        },
-        'value codes': {
-            "SmartAdvocate Screen": None,
-            "SmartAdvocate Section": None,
-            "SmartAdvocate Field": None,
-            "Contact Role": None,
-            "Contact Category": None,
-            "Contact Type": None,
-            "Comment": None
-        },
-        'user': {
-            "SmartAdvocate Screen": None,
-            "SmartAdvocate Section": None,
-            "SmartAdvocate Field": None,
-            "Contact Role": None,
-            "Contact Category": None,
-            "Contact Type": None,
-            "Comment": None
-        },
-        'case staff': {
-            'SmartAdvocate Role': None
-        }
-    }
-
-    dataframes = process_sql_files(input_dir, engine, special_columns_map)
+    jobs = max(1, args.jobs)
+    engine = create_engine(server=server, database=database, pool_size=jobs)
+
+    queries = read_mapping_queries(input_dir, SPECIAL_COLUMNS_MAP)
 
     output_filename = f"{os.path.basename(os.getcwd())} Data Mapping.xlsx"
     output_path = os.path.join(os.getcwd(), output_filename)
-    save_to_excel(dataframes, output_path)
+    cache = None
+    if not args.no_cache:
+        cache = MappingCache(os.path.join(os.getcwd(), CACHE_DIR_NAME), engine, server, database, refresh=args.refresh)
+        if not cache.enabled:
+            console.print("[yellow]Mapping results are not cached: install pyarrow (pip install sa-conversion-utils[parquet]).[/yellow]")
+            cache = None
 
-    logger.info(f"Saved results to {output_path}")
+    # The new workbook is written next to the output (--update reads the
+    # current one meanwhile) and only moved into place once every query succeeded
+    existing = None
+    if args.update and os.path.exists(output_path):
+        existing = ExistingWorkbook(output_path)
+    target_path = f"{output_path}.tmp.xlsx"
+    partial_path = f"{os.path.splitext(output_path)[0]} (partial).xlsx"
+
+    try:
+        written, failed = write_mapping_workbook(
+            queries, engine, target_path, jobs=jobs, chunksize=args.chunk_size, cache=cache, existing=existing
+        )
+    except (FileCreateError, PermissionError) as e:
+        logger.error(f"Permission denied: {e}")
+        console.print(f"[red]Permission denied: {e}[/red]")
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        return
+    finally:
+        if existing is not None:
+            existing.close()
+        if cache is not None:
+            cache.prune()
+
+    if failed:
+        # A failed query may have left a partial sheet (and, with --update, lost analyst work on its missing rows)
+        os.replace(target_path, partial_path)
+        console.print(f"[red]{len(failed)} mapping queries failed: {', '.join(failed)} (see map.log)[/red]")
+        console.print(f"[yellow]Partial run: {output_path} was left unchanged; the completed sheets are in {partial_path}.[/yellow]")
+        logger.warning(f"Partial run: {len(failed)} queries failed, workbook saved to {partial_path}")
+        return
+
+    try:
+        if existing is not None:
+            # Only cell values are carried over, so keep the previous workbook for its formatting and comments
+            backup_path = f"{output_path}.bak"
+            shutil.copy2(output_path, backup_path)
+            console.print(f"[yellow]--update keeps cell values only; formatting, comments and data validation are not carried over. The previous workbook was saved as {backup_path}.[/yellow]")
+        os.replace(target_path, output_path)
+    except PermissionError as e:
+        logger.error(f"Could not replace {output_path}: {e}")
+        console.print(f"[red]Could not replace {output_path} (is it open in Excel?): {e}. The new workbook is at {target_path}.[/red]")
+        return
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    console.print(f"[green]Excel file saved successfully to: {output_path}[/green]")
+    logger.info(f"Saved {sum(written.values()):,} rows in {len([n for n in written.values() if n])} sheets to {output_path}")
 
 def setup_parser(subparsers):
     """
@@ -177,8 +332,39 @@ def setup_parser(subparsers):
     )
     map_parser.add_argument(
         "-i", "--input",
-        required=True,
         metavar="",
         help="Path to the input folder containing mapping scripts."
     )
+    map_parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        metavar="",
+        help="Number of mapping queries to run concurrently (default: 1)."
+    )
+    map_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        metavar="",
+        help=f"Rows fetched per query round trip and written at a time (default: {CHUNK_SIZE:,})."
+    )
+    map_parser.add_argument(
+        "-u", "--update",
+        action="store_true",
+        help="Update the existing workbook: keep the values of analyst-filled columns and sheets. Only cell values are kept (no formatting, comments, data validation or column widths); the previous workbook is saved as a .bak copy."
+    )
+    map_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help=f"Re-run every query instead of reusing unchanged results from {CACHE_DIR_NAME}."
+    )
+    map_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the mapping result cache."
+    )
     map_parser.set_defaults(func=map)
+
+    map_subparsers = map_parser.add_subparsers(title="mapping workbook", dest="map_command")
+    setup_import_parser(map_subparsers)
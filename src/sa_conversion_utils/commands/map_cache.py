@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from ..utils.file_utils import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = ".map_cache"
+CACHE_INDEX_FILE = "cache_index.json"
+MAX_AGE_DAYS = 30
+
+# String literals and bracketed identifiers are kept as written; runs of
+# comments and whitespace collapse to one space
+SQL_TOKENS = re.compile(r"('(?:[^']|'')*')|(\[[^\]]*\])|((?:\s|--[^\n]*|/\*.*?\*/)+)", re.DOTALL)
+
+TABLE_STATE_QUERY = """
+SELECT s.name AS schema_name, t.name AS table_name, t.modify_date,
+    (SELECT SUM(p.rows) FROM sys.partitions p WHERE p.object_id = t.object_id AND p.index_id IN (0, 1)) AS row_count,
+    (SELECT MAX(us.last_user_update) FROM sys.dm_db_index_usage_stats us
+     WHERE us.database_id = DB_ID() AND us.object_id = t.object_id) AS last_user_update
+FROM sys.tables t
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+"""
+
+# dm_db_index_usage_stats needs VIEW SERVER STATE; without it, schema
+# changes and row counts still catch most source changes
+TABLE_STATE_QUERY_FALLBACK = """
+SELECT s.name AS schema_name, t.name AS table_name, t.modify_date,
+    (SELECT SUM(p.rows) FROM sys.partitions p WHERE p.object_id = t.object_id AND p.index_id IN (0, 1)) AS row_count
+FROM sys.tables t
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Returns the query without comments and with whitespace collapsed, so formatting edits keep their cache entry."""
+    def replace(match):
+        if match.group(1) or match.group(2):
+            return match.group(0)
+        return " "
+    return SQL_TOKENS.sub(replace, query).strip()
+
+
+def hash_chunk(digest, chunk: pd.DataFrame):
+    """Feeds a result chunk (column names and row hashes) into a hashlib digest identifying the whole result."""
+    digest.update("\x1f".join(map(str, chunk.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+
+
+def require_pyarrow():
+    """Returns pyarrow.parquet, or None if the optional pyarrow package is missing."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    return pq
+
+
+class MappingCache:
+    """
+    Caches mapping query results as Parquet files under .map_cache, with an
+    index (cache_index.json) of what each file holds.
+
+    An entry is keyed by the server, database and normalized query text, and
+    is only served while the fingerprint of the tables the query names is
+    unchanged. The fingerprint comes from one query over the catalog views at
+    startup: each table's modify_date (schema changes), row count and last
+    update from dm_db_index_usage_stats. Tables are matched by name in the
+    query text; a query naming none of the database's tables is fingerprinted
+    against all of them. Changes in other databases are not seen, which is
+    what --refresh is for.
+
+    Results are written to the cache while they stream into the workbook, so
+    a miss costs no extra query. Entries unused for MAX_AGE_DAYS are dropped.
+    """
+
+    def __init__(self, cache_dir: str, engine, server: str, database: str, refresh: bool = False):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.index_path = os.path.join(self.cache_dir, CACHE_INDEX_FILE)
+        self.engine = engine
+        self.server = server
+        self.database = database
+        self.refresh = refresh
+        self.pq = require_pyarrow()
+        self.lock = threading.Lock()
+        self.table_states = None
+        self.hits = set()
+        self.result_hashes = {}
+        self.data = {"entries": {}}
+
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+                self.data.setdefault("entries", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable mapping cache index {self.index_path}: {e}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.pq is not None
+
+    @property
+    def entries(self) -> Dict[str, Dict]:
+        return self.data["entries"]
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_json_atomic(self.index_path, self.data)
+
+    def cache_key(self, query: str) -> str:
+        return hashlib.sha256(f"{self.server}\n{self.database}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def load_table_states(self) -> Dict[str, str]:
+        """Reads the state of every table of the database once: {schema.table (lowercase): state}."""
+        with self.lock:
+            if self.table_states is None:
+                rows = []
+                for state_query in (TABLE_STATE_QUERY, TABLE_STATE_QUERY_FALLBACK):
+                    try:
+                        with self.engine.connect() as connection:
+                            rows = connection.execute(text(state_query)).mappings().all()
+                        break
+                    except Exception as e:
+                        logger.debug(f"Table state query failed: {e}")
+                else:
+                    logger.warning("Could not read table states, mapping results will not be cached")
+                self.table_states = {
+                    f"{row['schema_name']}.{row['table_name']}".lower():
+                        f"{row['modify_date']}|{row['row_count']}|{row.get('last_user_update')}"
+                    for row in rows
+                }
+        return self.table_states
+
+    def fingerprint(self, query: str) -> Optional[str]:
+        """Returns the source-state fingerprint of a query, or None if table states are unavailable."""
+        states = self.load_table_states()
+        if not states:
+            return None
+        normalized = normalize_query(query).lower()
+        referenced = {
+            table: state for table, state in states.items()
+            if re.search(rf"(?<![\w@#$])\[?{re.escape(table.split('.', 1)[1])}\]?(?![\w@#$])", normalized)
+        }
+        tables = referenced or states
+        return hashlib.sha256("\n".join(f"{table}={tables[table]}" for table in sorted(tables)).encode("utf-8")).hexdigest()
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry and entry.get("file"):
+            path = os.path.join(self.cache_dir, entry["file"])
+            if os.path.exists(path):
+                os.remove(path)
+
+    def prune(self):
+        """Drops entries unused for MAX_AGE_DAYS and Parquet files the index does not know."""
+        cutoff = time.time() - MAX_AGE_DAYS * 86400
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if e.get("last_used", 0) < cutoff]:
+                self.remove(key)
+            if os.path.isdir(self.cache_dir):
+                known = {e.get("file") for e in self.entries.values()}
+                for name in os.listdir(self.cache_dir):
+                    if name.endswith(".parquet") and name not in known:
+                        os.remove(os.path.join(self.cache_dir, name))
+            self.save()
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """Returns the current cache entry of a query (marking it used), or None on a miss or with --refresh."""
+        if self.refresh:
+            return None
+        fingerprint = self.fingerprint(query)
+        entry = self.entries.get(self.cache_key(query))
+        if not (entry and fingerprint and entry["fingerprint"] == fingerprint):
+            return None
+        with self.lock:
+            entry["last_used"] = time.time()
+        return entry
+
+    def iter_chunks(self, sheet_name: str, query: str, chunks: Iterator[pd.DataFrame], chunksize: int, digest=None) -> Iterator[pd.DataFrame]:
+        """
+        Yields the query's result: from the cache if a current entry exists
+        (the query never runs), otherwise from `chunks`, copying each chunk to
+        a new Parquet file that replaces the entry once the result is complete.
+
+        `digest` is the hashlib digest `chunks` feed with hash_chunk; its
+        value is stored with the entry, so a cache hit also knows the hash of
+        its result (in result_hashes) without re-hashing it.
+        """
+        key = self.cache_key(query)
+        fingerprint = self.fingerprint(query)
+        try:
+            entry = self.lookup(query)
+            if entry:
+                logger.info(f"{sheet_name}: served from the mapping cache")
+                with self.lock:
+                    self.hits.add(sheet_name)
+                    if entry.get("result_hash"):
+                        self.result_hashes[sheet_name] = entry["result_hash"]
+                if entry["file"]:
+                    for batch in self.pq.ParquetFile(os.path.join(self.cache_dir, entry["file"])).iter_batches(batch_size=chunksize):
+                        yield batch.to_pandas()
+                return
+
+            if not fingerprint:
+                yield from chunks
+                return
+            yield from self.write_through(sheet_name, key, fingerprint, chunks, digest)
+        finally:
+            chunks.close()
+
+    def write_through(self, sheet_name, key, fingerprint, chunks, digest=None):
+        import pyarrow as pa
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        filename = f"{key[:32]}.parquet"
+        tmp_path = os.path.join(self.cache_dir, f"{filename}.{threading.get_ident()}.tmp")
+        path = os.path.join(self.cache_dir, filename)
+        writer = None
+        has_file = False
+        rows = 0
+        caching = True
+        try:
+            for chunk in chunks:
+                if caching:
+                    try:
+                        table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+                        if writer is None:
+                            writer = self.pq.ParquetWriter(tmp_path, table.schema)
+                            has_file = True
+                        writer.write_table(table)
+                    except (pa.ArrowException, ValueError, TypeError) as e:
+                        # e.g. a column that was all NULL in the first chunk; the sheet is still written
+                        logger.debug(f"Not caching {sheet_name}: {e}")
+                        caching = False
+                rows += len(chunk)
+                yield chunk
+            if writer:
+                writer.close()
+                writer = None
+            if caching:
+                if has_file:
+                    os.replace(tmp_path, path)
+                elif os.path.exists(path):
+                    os.remove(path)
+                with self.lock:
+                    self.entries[key] = {
+                        "sheet": sheet_name,
+                        "fingerprint": fingerprint,
+                        "file": filename if has_file else None,
+                        "rows": rows,
+                        "result_hash": digest.hexdigest() if digest else None,
+                        "created": datetime.now().isoformat(),
+                        "last_used": time.time(),
+                    }
+                    self.save()
+        finally:
+            if writer:
+                writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
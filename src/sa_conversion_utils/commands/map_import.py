@@ -0,0 +1,373 @@
+import os
+import re
+import hashlib
+import zipfile
+import logging
+import argparse
+from datetime import date, datetime, time as dt_time
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from rich.console import Console
+from rich.prompt import Confirm
+from rich.progress import Progress, BarColumn, MofNCompleteColumn, TextColumn, TimeElapsedColumn
+
+from .map_workbook import ExistingWorkbook, is_volatile_column, special_columns
+from ..utils.create_engine import main as create_engine
+
+logger = logging.getLogger(__name__)
+console = Console()
+
+TABLE_PREFIX = "map_"
+IMPORT_LOG_TABLE = "map_imports"
+INSERT_BATCH_SIZE = 5_000
+
+# Index keys are limited to 1700 bytes (nvarchar: 2 bytes per character)
+MAX_INDEX_KEY_BYTES = 1700
+MAX_INDEX_COLUMNS = 16
+
+
+def table_name_for(sheet_name: str, prefix: str = TABLE_PREFIX) -> str:
+    """'Value Codes' -> map_value_codes"""
+    return prefix + (re.sub(r"[^0-9a-zA-Z]+", "_", sheet_name).strip("_").lower() or "sheet")
+
+
+def quote(identifier: str) -> str:
+    return "[" + str(identifier).replace("]", "]]") + "]"
+
+
+def column_names(header) -> List[str]:
+    """Header cells as column names: blanks become ColumnN and duplicates get a suffix."""
+    names, seen = [], set()
+    for i, cell in enumerate(header, start=1):
+        name = str(cell).strip() if cell is not None and str(cell).strip() else f"Column{i}"
+        base, n = name[:120], 2
+        while name.lower() in seen:
+            name = f"{base}_{n}"
+            n += 1
+        seen.add(name.lower())
+        names.append(name)
+    return names
+
+
+class ColumnType:
+    """Infers the narrowest SQL Server type holding every value seen in a column."""
+
+    def __init__(self):
+        self.kinds = set()
+        self.max_length = 0
+        self.max_int = 0
+
+    def observe(self, value):
+        if value is None or value == "":
+            return
+        if isinstance(value, bool):
+            self.kinds.add("bit")
+        elif isinstance(value, int):
+            self.kinds.add("int")
+            self.max_int = max(self.max_int, abs(value))
+        elif isinstance(value, float):
+            self.kinds.add("float")
+        elif isinstance(value, datetime):
+            self.kinds.add("datetime")
+        elif isinstance(value, date):
+            self.kinds.add("date")
+        elif isinstance(value, dt_time):
+            self.kinds.add("time")
+        else:
+            self.kinds.add("text")
+        self.max_length = max(self.max_length, len(str(value)))
+
+    @property
+    def sql_type(self) -> str:
+        kinds = self.kinds
+        if kinds == {"bit"}:
+            return "BIT"
+        if kinds == {"int"}:
+            return "INT" if self.max_int < 2 ** 31 else "BIGINT"
+        if kinds and kinds <= {"int", "float"}:
+            return "FLOAT"
+        if kinds and kinds <= {"date", "datetime"}:
+            return "DATETIME2" if "datetime" in kinds else "DATE"
+        if kinds == {"time"}:
+            return "TIME"
+        if self.max_length > 4000:
+            return "NVARCHAR(MAX)"
+        # Rounded up so small edits do not change the type
+        return f"NVARCHAR({max(50, -(-self.max_length // 50) * 50)})"
+
+    @property
+    def is_text(self) -> bool:
+        return self.sql_type.startswith("NVARCHAR")
+
+    @property
+    def key_bytes(self) -> Optional[int]:
+        """Bytes the column takes in an index key, or None if it cannot be indexed."""
+        sql_type = self.sql_type
+        if sql_type == "NVARCHAR(MAX)":
+            return None
+        if sql_type.startswith("NVARCHAR"):
+            return 2 * int(sql_type[9:-1])
+        return 8
+
+
+def sheet_raw_digest(existing: ExistingWorkbook, sheet_name: str) -> Optional[str]:
+    """
+    Hash of the sheet's XML part plus the shared strings, read from the
+    .xlsx zip without parsing it. Equal raw digests guarantee equal content;
+    a re-save in Excel changes them without changing content, so a mismatch
+    falls back to the content digest.
+    """
+    try:
+        part = existing.workbook[sheet_name]._worksheet_path.lstrip("/")
+        digest = hashlib.sha256()
+        with zipfile.ZipFile(existing.path) as archive:
+            names = set(archive.namelist())
+            for name in (part, "xl/sharedStrings.xml"):
+                if name in names:
+                    with archive.open(name) as f:
+                        for block in iter(lambda: f.read(1024 * 1024), b""):
+                            digest.update(block)
+        return digest.hexdigest()
+    except (KeyError, AttributeError, zipfile.BadZipFile) as e:
+        logger.debug(f"No raw digest for {sheet_name}: {e}")
+        return None
+
+
+def scan_sheet(rows: Iterator[tuple]) -> Dict:
+    """
+    One streaming pass over a sheet's rows (header first): the content
+    digest, the row count and the inferred type of each column.
+    """
+    header = list(next(rows, None) or [])
+    digest = hashlib.sha256(repr(tuple(header)).encode("utf-8"))
+    types = [ColumnType() for _ in header]
+    row_count = 0
+    for row in rows:
+        digest.update(repr(row).encode("utf-8"))
+        for column_type, value in zip(types, row):
+            column_type.observe(value)
+        row_count += 1
+    return {"columns": column_names(header), "types": types, "rows": row_count, "digest": digest.hexdigest()}
+
+
+def key_columns(sheet_name: str, columns: List[str], types: List[ColumnType]) -> List[str]:
+    """
+    Columns to index: the query columns of the sheet (not analyst columns or
+    volatile ones like counts) that fit in an index key, up to SQL Server's
+    key size limit.
+    """
+    annotations = {name.lower() for name in special_columns(sheet_name)}
+    keys, size = [], 0
+    for name, column_type in zip(columns, types):
+        if name.lower() in annotations or is_volatile_column(name) or column_type.key_bytes is None:
+            continue
+        if len(keys) == MAX_INDEX_COLUMNS or size + column_type.key_bytes > MAX_INDEX_KEY_BYTES:
+            break
+        keys.append(name)
+        size += column_type.key_bytes
+    return keys
+
+
+def ensure_import_log(cursor):
+    cursor.execute(f"""
+IF OBJECT_ID(N'dbo.{IMPORT_LOG_TABLE}', N'U') IS NULL
+    CREATE TABLE dbo.{IMPORT_LOG_TABLE} (
+        table_name SYSNAME NOT NULL PRIMARY KEY,
+        sheet_name NVARCHAR(255) NOT NULL,
+        workbook NVARCHAR(400) NOT NULL,
+        content_hash CHAR(64) NOT NULL,
+        raw_hash CHAR(64) NULL,
+        row_count INT NOT NULL,
+        imported_at DATETIME2 NOT NULL
+    );
+""")
+
+
+def last_import(cursor, table_name: str) -> Optional[Dict]:
+    """The import log entry of a mapping table, if the table still exists."""
+    cursor.execute(
+        f"SELECT content_hash, raw_hash FROM dbo.{IMPORT_LOG_TABLE} "
+        f"WHERE table_name = ? AND OBJECT_ID(N'dbo.' + QUOTENAME(table_name), N'U') IS NOT NULL",
+        table_name,
+    )
+    row = cursor.fetchone()
+    return {"content_hash": row[0], "raw_hash": row[1]} if row else None
+
+
+def to_sql_value(value, column_type: ColumnType):
+    if value == "":
+        return None
+    if column_type.is_text and value is not None and not isinstance(value, str):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else str(value)
+    return value
+
+
+def load_sheet(connection, rows: Iterator[tuple], sheet_name: str, table_name: str, scan: Dict, progress, task) -> List[str]:
+    """
+    Bulk-loads a sheet's rows (header first) into a staging table, indexes it, then swaps it in
+    for the mapping table in one transaction, so conversion scripts never
+    join against a half-loaded table. Returns the indexed key columns.
+    """
+    columns, types = scan["columns"], scan["types"]
+    staging = f"{table_name}__load"
+    keys = key_columns(sheet_name, columns, types)
+    column_list = ", ".join(quote(name) for name in columns)
+
+    cursor = connection.cursor()
+    # pyodbc sends each batch as one parameter array instead of a round trip per row
+    if hasattr(cursor, "fast_executemany"):
+        cursor.fast_executemany = True
+
+    cursor.execute(f"IF OBJECT_ID(N'dbo.{staging}', N'U') IS NOT NULL DROP TABLE dbo.{quote(staging)};")
+    cursor.execute(
+        f"CREATE TABLE dbo.{quote(staging)} ("
+        + ", ".join(f"{quote(name)} {column_type.sql_type} NULL" for name, column_type in zip(columns, types))
+        + ");"
+    )
+
+    insert = f"INSERT INTO dbo.{quote(staging)} ({column_list}) VALUES ({', '.join('?' for _ in columns)})"
+    next(rows, None)
+    batch = []
+    for row in rows:
+        batch.append([to_sql_value(value, column_type) for value, column_type in zip(row, types)])
+        if len(batch) == INSERT_BATCH_SIZE:
+            cursor.executemany(insert, batch)
+            progress.advance(task, len(batch))
+            batch = []
+    if batch:
+        cursor.executemany(insert, batch)
+        progress.advance(task, len(batch))
+
+    if keys:
+        cursor.execute(
+            f"CREATE INDEX {quote(f'IX_{table_name}_keys')} ON dbo.{quote(staging)} "
+            f"({', '.join(quote(name) for name in keys)});"
+        )
+
+    cursor.execute(f"IF OBJECT_ID(N'dbo.{table_name}', N'U') IS NOT NULL DROP TABLE dbo.{quote(table_name)};")
+    cursor.execute("EXEC sp_rename ?, ?;", f"dbo.{staging}", table_name)
+    return keys
+
+
+def record_import(cursor, table_name: str, sheet_name: str, workbook_path: str, scan: Dict, raw_hash: Optional[str]):
+    cursor.execute(f"DELETE FROM dbo.{IMPORT_LOG_TABLE} WHERE table_name = ?;", table_name)
+    cursor.execute(
+        f"INSERT INTO dbo.{IMPORT_LOG_TABLE} (table_name, sheet_name, workbook, content_hash, raw_hash, row_count, imported_at) "
+        f"VALUES (?, ?, ?, ?, ?, ?, SYSDATETIME());",
+        table_name, sheet_name, os.path.abspath(workbook_path)[:400], scan["digest"], raw_hash, scan["rows"],
+    )
+
+
+def import_workbook(args: argparse.Namespace):
+    """
+    Loads the sheets of a completed mapping workbook into map_* tables that
+    conversion scripts can join against.
+
+    Each sheet is imported into its own table (Value Codes -> map_value_codes)
+    with column types inferred from the values and an index on the query
+    columns. Sheets are skipped when they are unchanged since their last
+    import: first by a hash of the sheet's raw XML, which needs no parsing,
+    then by a hash of its cell values, computed in the same streaming pass
+    that infers the column types. The import log lives in dbo.map_imports.
+    """
+    load_dotenv(dotenv_path=os.path.join(os.getcwd(), ".env"))
+    server = args.server or os.getenv("SERVER")
+    database = args.database or os.getenv("TARGET_DB")
+    workbook_path = args.workbook
+
+    if not os.path.isfile(workbook_path):
+        console.print(f"[red]Workbook not found: {workbook_path}[/red]")
+        return
+    if not server or not database:
+        console.print("[red]Error: Server and Database must be specified.[/red]")
+        return
+
+    existing = ExistingWorkbook(workbook_path)
+    try:
+        sheet_names = [name for name in existing.sheetnames if not args.sheets or name in args.sheets]
+        if not sheet_names:
+            console.print("[yellow]No sheets to import.[/yellow]")
+            return
+        if not args.yes and not Confirm.ask(
+            f"Import {len(sheet_names)} sheets of [bold blue]{os.path.basename(workbook_path)}[/bold blue] "
+            f"into [bold yellow]{server}.{database}[/bold yellow]?"
+        ):
+            console.print("[yellow]Import aborted.[/yellow]")
+            return
+
+        engine = create_engine(server=server, database=database)
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            ensure_import_log(cursor)
+            connection.commit()
+
+            imported, skipped = 0, 0
+            with Progress(
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                MofNCompleteColumn(),
+                TimeElapsedColumn(),
+                console=console,
+            ) as progress:
+                for sheet_name in sheet_names:
+                    table_name = table_name_for(sheet_name, args.prefix)
+                    previous = None if args.force else last_import(cursor, table_name)
+                    raw_hash = sheet_raw_digest(existing, sheet_name)
+                    if previous and raw_hash and previous["raw_hash"] == raw_hash:
+                        progress.console.print(f"[dim]  {sheet_name}: unchanged, skipped[/dim]")
+                        skipped += 1
+                        continue
+
+                    task = progress.add_task(f"Scanning {sheet_name}", total=None)
+                    scan = scan_sheet(existing.iter_rows(sheet_name))
+                    if not scan["columns"]:
+                        progress.remove_task(task)
+                        progress.console.print(f"[yellow]  {sheet_name}: empty, skipped[/yellow]")
+                        continue
+                    if previous and previous["content_hash"] == scan["digest"]:
+                        # Same values, re-saved file: remember the new raw hash
+                        record_import(cursor, table_name, sheet_name, workbook_path, scan, raw_hash)
+                        connection.commit()
+                        progress.remove_task(task)
+                        progress.console.print(f"[dim]  {sheet_name}: unchanged, skipped[/dim]")
+                        skipped += 1
+                        continue
+
+                    progress.update(task, description=f"Loading {sheet_name}", total=scan["rows"], completed=0)
+                    try:
+                        keys = load_sheet(connection, existing.iter_rows(sheet_name), sheet_name, table_name, scan, progress, task)
+                        record_import(cursor, table_name, sheet_name, workbook_path, scan, raw_hash)
+                        connection.commit()
+                    except Exception as e:
+                        connection.rollback()
+                        logger.error(f"Failed to import {sheet_name} into {table_name}: {e}")
+                        progress.console.print(f"[red]  {sheet_name}: import failed: {e}[/red]")
+                        continue
+                    imported += 1
+                    logger.info(f"Imported {sheet_name} into {table_name}: {scan['rows']:,} rows, indexed on {keys}")
+                    progress.console.print(
+                        f"[green]  {sheet_name} -> {table_name}[/green] ({scan['rows']:,} rows"
+                        + (f", indexed on {', '.join(keys)})" if keys else ")")
+                    )
+        finally:
+            connection.close()
+    finally:
+        existing.close()
+
+    console.print(f"[green]{imported} sheets imported, {skipped} unchanged.[/green]")
+
+
+def setup_import_parser(subparsers):
+    """Adds 'import' under the 'map' subcommand."""
+    import_parser = subparsers.add_parser("import", help="Load a completed mapping workbook into map_* tables.")
+    import_parser.add_argument("workbook", help="Path to the mapping workbook (.xlsx)")
+    # SUPPRESS keeps `sami map -s ... import` working: parent values are not overwritten
+    import_parser.add_argument("-s", "--server", default=argparse.SUPPRESS, metavar="", help="SQL Server.")
+    import_parser.add_argument("-d", "--database", default=argparse.SUPPRESS, metavar="", help="Database.")
+    import_parser.add_argument("--sheets", nargs="+", metavar="", help="Only import these sheets.")
+    import_parser.add_argument("--prefix", default=TABLE_PREFIX, metavar="", help=f"Table name prefix (default: {TABLE_PREFIX}).")
+    import_parser.add_argument("--force", action="store_true", help="Import every sheet, even if unchanged.")
+    import_parser.add_argument("-y", "--yes", action="store_true", help="Skip confirmation prompt.")
+    import_parser.set_defaults(func=import_workbook)
@@ -0,0 +1,280 @@
+import re
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List
+
+import openpyxl
+import pandas as pd
+import xlsxwriter
+from xlsxwriter.exceptions import FileCreateError
+
+from ..utils.sanitize_utils import clean_string, sanitize_dataframe
+
+logger = logging.getLogger(__name__)
+
+# Excel's limits
+MAX_SHEET_ROWS = 1_048_576
+MAX_SHEET_NAME = 31
+
+# Custom document property holding the hash of a sheet's query result
+RESULT_PROPERTY_PREFIX = "sami_result:"
+
+# Columns added to the sheets whose file name contains the key, for analysts to fill in
+SPECIAL_COLUMNS_MAP = {
+    'party roles': {
+        "SA Role": None,
+        "SA Party": None
+    },
+    'value codes': {
+        "SmartAdvocate Screen": None,
+        "SmartAdvocate Section": None,
+        "SmartAdvocate Field": None,
+        "Contact Role": None,
+        "Contact Category": None,
+        "Contact Type": None,
+        "Comment": None
+    },
+    'user': {
+        "SmartAdvocate Screen": None,
+        "SmartAdvocate Section": None,
+        "SmartAdvocate Field": None,
+        "Contact Role": None,
+        "Contact Category": None,
+        "Contact Type": None,
+        "Comment": None
+    },
+    'case staff': {
+        'SmartAdvocate Role': None
+    }
+}
+
+# Columns whose values change with the data (e.g. 'Count', 'RecordCount',
+# 'total_cases') are never used to match rows
+VOLATILE_COLUMN_WORDS = {"count", "cnt", "total", "qty", "num"}
+
+
+class MappingWorkbook:
+    """
+    Streams DataFrame chunks into an .xlsx file with xlsxwriter in
+    constant_memory mode: each row is flushed to a temporary file as soon as
+    the next one starts, and strings are written inline instead of into a
+    shared string table, so memory stays flat whatever the sheet size.
+
+    The price is that rows must be written in order, and a sheet is finished
+    once the next one is started. Sheets are created on their first non-empty
+    chunk, so queries returning no rows add no sheet.
+
+    Raises xlsxwriter's FileCreateError from close() if the file cannot be
+    written (e.g. it is open in Excel).
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.workbook = xlsxwriter.Workbook(output_path, {
+            "constant_memory": True,
+            # Cell values are data: never turn them into links, formulas or numbers
+            "strings_to_urls": False,
+            "strings_to_formulas": False,
+            "strings_to_numbers": False,
+            "default_date_format": "yyyy-mm-dd hh:mm:ss",
+            "remove_timezone": True,
+        })
+        self.header_format = self.workbook.add_format({"bold": True})
+
+    def write_sheet(self, sheet_name: str, chunks: Iterable[pd.DataFrame]) -> int:
+        """Writes the chunks as one sheet, headed by the first chunk's columns. Returns the number of data rows."""
+        worksheet = None
+        row = 0
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            if worksheet is None:
+                worksheet = self.workbook.add_worksheet(sheet_name[:MAX_SHEET_NAME])
+                worksheet.write_row(0, 0, [str(column) for column in chunk.columns], self.header_format)
+            if row + len(chunk) >= MAX_SHEET_ROWS:
+                logger.warning(f"{sheet_name} exceeds Excel's {MAX_SHEET_ROWS:,} rows, truncating")
+                chunk = chunk.iloc[:MAX_SHEET_ROWS - 1 - row]
+
+            # Boxed as Python objects, with NaN/NaT as blank cells
+            values = sanitize_dataframe(chunk).astype(object)
+            values = values.where(chunk.notna(), None)
+            for record in values.itertuples(index=False, name=None):
+                row += 1
+                worksheet.write_row(row, 0, record)
+            if row >= MAX_SHEET_ROWS - 1:
+                break
+        return row
+
+    def set_result_hash(self, sheet_name: str, result_hash: str):
+        """Records the hash of the query result a sheet was written from, for later --update runs."""
+        self.workbook.set_custom_property(f"{RESULT_PROPERTY_PREFIX}{sheet_name[:MAX_SHEET_NAME]}", result_hash)
+
+    def close(self):
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ExistingWorkbook:
+    """
+    Read-only, streaming view of a previously written mapping workbook,
+    used to carry analyst work over into the regenerated one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.workbook = openpyxl.load_workbook(path, read_only=True)
+        self.result_hashes = {
+            prop.name[len(RESULT_PROPERTY_PREFIX):]: prop.value
+            for prop in self.workbook.custom_doc_props.props
+            if prop.name.startswith(RESULT_PROPERTY_PREFIX)
+        }
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return self.workbook.sheetnames
+
+    def has_sheet(self, sheet_name: str) -> bool:
+        return sheet_name[:MAX_SHEET_NAME] in self.workbook.sheetnames
+
+    def result_hash(self, sheet_name: str):
+        return self.result_hashes.get(sheet_name[:MAX_SHEET_NAME])
+
+    def iter_rows(self, sheet_name: str) -> Iterator[tuple]:
+        """Yields the header, then each non-empty row cut to the header's width."""
+        rows = self.workbook[sheet_name[:MAX_SHEET_NAME]].iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        while header and header[-1] is None:
+            header.pop()
+        if not header:
+            return
+        yield tuple(header)
+        for row in rows:
+            row = tuple(row[:len(header)]) + (None,) * (len(header) - len(row))
+            if any(value is not None for value in row):
+                yield row
+
+    def header(self, sheet_name: str) -> List:
+        return list(next(self.iter_rows(sheet_name), ()))
+
+    def iter_chunks(self, sheet_name: str, chunksize: int) -> Iterator[pd.DataFrame]:
+        """Yields a sheet's rows as DataFrames, to copy it into a new workbook unchanged."""
+        rows = self.iter_rows(sheet_name)
+        header = next(rows, None)
+        if header is None:
+            return
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, dtype=object)
+
+    def close(self):
+        self.workbook.close()
+
+
+def special_columns(sheet_name: str) -> Dict:
+    """Returns the SPECIAL_COLUMNS_MAP columns of a sheet, matched the way mapping scripts are."""
+    for pattern, columns in SPECIAL_COLUMNS_MAP.items():
+        if pattern in sheet_name.lower():
+            return columns
+    return {}
+
+
+def is_volatile_column(column) -> bool:
+    words = re.split(r"[^A-Za-z0-9]+|(?<=[a-z])(?=[A-Z])", str(column))
+    return "#" in str(column) or any(word.lower() in VOLATILE_COLUMN_WORDS for word in words)
+
+
+def key_value(value) -> str:
+    """
+    Normalizes a cell for matching rows between a query result and the
+    workbook, where numbers come back as int/float, text is sanitized and
+    dates are datetimes.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, Decimal):
+        value = float(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return clean_string(str(value)).strip()
+
+
+def row_keys(df: pd.DataFrame, key_columns: List) -> pd.Series:
+    keys = df[key_columns[0]].map(key_value).astype(object)
+    for column in key_columns[1:]:
+        keys = keys + "\x1f" + df[column].map(key_value).astype(object)
+    return keys
+
+
+def merge_annotations(
+        chunks: Iterable[pd.DataFrame],
+        existing: ExistingWorkbook,
+        sheet_name: str,
+        annotation_columns: Iterable = ()
+    ) -> Iterator[pd.DataFrame]:
+    """
+    Carries the analyst-filled columns of an existing sheet over to a new
+    query result streaming through.
+
+    Annotation columns are the special_columns_map columns of the sheet plus
+    any column of the existing sheet the query does not return (columns
+    analysts added themselves, which are appended). Rows are matched on the
+    columns both have in common, except annotations and volatile ones such
+    as counts. Only annotated rows of the existing sheet are held in memory.
+    Annotated rows the query no longer returns are reported and dropped.
+    """
+    old_rows = existing.iter_rows(sheet_name)
+    old_header = list(next(old_rows, ()))
+    annotations = None
+    matched = set()
+
+    for chunk in chunks:
+        if annotations is None:
+            added = [column for column in old_header if column not in chunk.columns]
+            annotation_set = set(annotation_columns or ()) | set(added)
+            annotated = [column for column in chunk.columns if column in annotation_set] + added
+            key_columns = [
+                column for column in chunk.columns
+                if column in old_header and column not in annotation_set and not is_volatile_column(column)
+            ]
+            annotations = {}
+            if key_columns and annotated:
+                key_positions = [old_header.index(column) for column in key_columns]
+                positions = [old_header.index(column) for column in annotated]
+                for row in old_rows:
+                    values = [row[position] for position in positions]
+                    if any(value is not None and value != "" for value in values):
+                        key = "\x1f".join(key_value(row[position]) for position in key_positions)
+                        annotations.setdefault(key, values)
+            logger.info(
+                f"{sheet_name}: merging {len(annotations):,} annotated rows on {', '.join(map(str, key_columns)) or 'no key columns'}"
+            )
+
+        chunk = chunk.copy()
+        for column in added:
+            chunk[column] = None
+        if annotations:
+            keys = row_keys(chunk, key_columns)
+            found = keys[keys.isin(annotations.keys())]
+            matched.update(found)
+            for i, column in enumerate(annotated):
+                values = found.map(lambda key: annotations[key][i])
+                chunk[column] = chunk[column].astype(object)
+                chunk.loc[values.index, column] = values
+        yield chunk
+
+    dropped = len(annotations or {}) - len(matched)
+    if dropped:
+        logger.warning(f"{sheet_name}: {dropped:,} annotated rows are no longer returned by the query and were dropped")
@@ -1,15 +1,370 @@
 import psycopg
 import os
+import queue
+import hashlib
+import json
+import time
+import threading
+from datetime import datetime
 import argparse
 import logging
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from psycopg import sql
+from .partition import plan_table_parts, part_file_path, concat_part_files
+from .export_manifest import ExportManifest
+from .export_spec import load_export_spec, spec_for_table, build_select
+from .export_telemetry import SUMMARY_FILE, fetch_table_stats, format_throughput, build_summary, write_summary
+from .watermark import STATE_FILE, WatermarkState, parse_watermarks, plan_watermark
+from ...utils.compression import compression_suffix, open_compressed_writer
 from rich.prompt import Confirm
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn, TaskProgressColumn
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn, TaskProgressColumn, DownloadColumn, TransferSpeedColumn
 
 logger = logging.getLogger(__name__)
 console = Console()
 
+# COPY hands over one row per block: progress is reported per ~1 MB, not per row
+PROGRESS_STEP_BYTES = 1024 * 1024
+
+
+def build_conn_str(args: argparse.Namespace) -> str:
+    """Builds a libpq connection string from the shared PostgreSQL CLI arguments."""
+    conn_parts = [
+        f"host={args.server}",
+        f"port={args.port}",
+        f"dbname={args.database}",
+        f"user={args.user}"
+    ]
+
+    if args.password is not None:
+        conn_parts.append(f"password={args.password}")
+
+    return " ".join(conn_parts)
+
+
+def select_tables(cursor, table_names: Optional[List[str]]):
+    """
+    Resolves the -t/--tables filter against the public tables in the database.
+    Names prefixed with `!` are excluded. Returns (tables_to_export, tables_to_exclude).
+    """
+    # Separate tables to include and exclude
+    tables_to_include = {t for t in table_names if not t.startswith('!')} if table_names else set()
+    tables_to_exclude = {t[1:] for t in table_names if t.startswith('!')} if table_names else set()
+
+    # First, get all public tables from the database
+    cursor.execute(
+        """
+        SELECT tablename
+        FROM pg_catalog.pg_tables
+        WHERE schemaname = 'public';
+        """
+    )
+    all_public_tables = {table[0] for table in cursor.fetchall()}
+
+    # Determine the final list of tables to export
+    if tables_to_include:
+        tables_to_export = tables_to_include.intersection(all_public_tables)
+        if tables_to_include - all_public_tables:
+            missing_tables = tables_to_include - all_public_tables
+            console.print(f"[yellow]Warning: The following tables were requested but do not exist: {', '.join(missing_tables)}[/yellow]")
+    else:
+        tables_to_export = all_public_tables
+
+    # Now, filter out any tables the user wants to exclude
+    return tables_to_export - tables_to_exclude, tables_to_exclude
+
+
+def fetch_table_sizes(cursor, tables) -> Dict[str, int]:
+    """
+    Returns the estimated on-disk size in bytes of each table, using the
+    planner statistics in pg_class (relpages) so no table is scanned.
+    """
+    return {table: stats["heap_bytes"] for table, stats in fetch_table_stats(cursor, tables).items()}
+
+
+def build_copy_query(item: Dict) -> sql.Composable:
+    """
+    Builds the COPY statement for a work item. Spec projections and filters,
+    incremental filters, range parts and row limits are compiled into a
+    `COPY (SELECT ...)`; a plain table copy is used when there are none.
+    Only the first part of a split table writes the CSV header.
+    """
+    options = sql.SQL("CSV HEADER" if item["header"] else "CSV")
+    conditions = [c for c in (item.get("spec_where"), item.get("filter"), item["where"]) if c is not None]
+    if not conditions and not item.get("columns") and item.get("limit") is None:
+        return sql.SQL("COPY {} TO STDOUT WITH {}").format(sql.Identifier(item["table"]), options)
+    select = build_select(item["table"], item.get("columns"), conditions, item.get("limit"))
+    return sql.SQL("COPY ({}) TO STDOUT WITH {}").format(select, options)
+
+
+def export_table(conn, cursor, item: Dict, compression: Optional[str] = None, on_bytes: Optional[Callable] = None):
+    """
+    Streams a single table (or range part of a table) to its file with COPY TO STDOUT.
+
+    The COPY runs inside a savepoint so a failing table does not abort the
+    surrounding (snapshot) transaction used for the remaining tables. With
+    compression the COPY stream is compressed as it arrives.
+
+    Data is written to `<file>.tmp` and renamed into place only once the COPY
+    finished, so a crash never leaves a truncated file under the final name.
+    The row count, size and checksum are stored on the item for the manifest,
+    along with the uncompressed COPY byte count. on_bytes, if given, is called
+    with the size of every block received.
+    """
+    tmp_path = f"{item['file_path']}.tmp"
+    digest = hashlib.sha256()
+    copy_bytes = 0
+    try:
+        with conn.transaction():
+            with open_compressed_writer(tmp_path, compression, digest=digest) as f:
+                with cursor.copy(build_copy_query(item)) as copy:
+                    for data in copy:
+                        f.write(data)
+                        copy_bytes += len(data)
+                        if on_bytes:
+                            on_bytes(len(data))
+            rows = cursor.rowcount
+        os.replace(tmp_path, item["file_path"])
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    item["rows"] = rows if rows is not None and rows >= 0 else None
+    item["bytes"] = os.path.getsize(item["file_path"])
+    item["sha256"] = digest.hexdigest()
+    item["copy_bytes"] = copy_bytes
+
+
+def run_export_item(conn, cursor, item: Dict, progress, task, compression: Optional[str] = None, on_done: Optional[Callable] = None) -> bool:
+    """
+    Exports one work item, reports the outcome and advances the progress bar.
+
+    The bar is weighted by estimated table bytes: it advances with the bytes
+    streamed (capped at the item's weight) and jumps to the full weight when
+    the item finishes, whatever the real size turned out to be.
+    """
+    advanced = 0
+    pending = 0
+
+    def on_bytes(size):
+        nonlocal advanced, pending
+        pending += size
+        if pending < PROGRESS_STEP_BYTES:
+            return
+        step = min(pending, item["weight"] - advanced)
+        pending = 0
+        if step > 0:
+            advanced += step
+            progress.advance(task, step)
+
+    item["started"] = time.perf_counter()
+    try:
+        export_table(conn, cursor, item, compression, on_bytes)
+        item["finished"] = time.perf_counter()
+        throughput = format_throughput(item["rows"], item["copy_bytes"], item["finished"] - item["started"])
+        progress.console.print(f"  [green]✅ Exported {item['label']} to {item['file_path']}[/green] [dim]{throughput}[/dim]")
+        return True
+    except (psycopg.Error, OSError) as e:
+        progress.console.print(f"[bright-red]  ❌ Error exporting {item['label']}: {e}[/bright-red]")
+        return False
+    finally:
+        item.setdefault("finished", time.perf_counter())
+        if on_done:
+            on_done(item)
+        progress.advance(task, item["weight"] - advanced)
+
+
+def manifest_file_entry(item: Dict, output_dir: str) -> Dict:
+    return {
+        "path": os.path.relpath(item["file_path"], output_dir),
+        "rows": item["rows"],
+        "bytes": item["bytes"],
+        "sha256": item["sha256"],
+    }
+
+
+def export_options(compression: Optional[str], table_spec: Dict) -> Dict:
+    """
+    Returns the settings that shape a table's output files, as recorded in the
+    manifest. `--resume` only trusts a manifest entry whose options match the
+    current run, so changing the compression or the table's spec re-exports it.
+    """
+    spec_json = json.dumps(table_spec, sort_keys=True)
+    return {
+        "compression": compression,
+        "spec_sha256": hashlib.sha256(spec_json.encode("utf-8")).hexdigest(),
+    }
+
+
+def track_table_completion(items: List[Dict], on_table_complete: Callable, defer_split_tables: bool) -> Callable:
+    """
+    Returns a callback to run after each work item. Once every item of a table
+    has finished successfully, on_table_complete(table_name, table_items) is
+    called. Split tables that will be concatenated are handled later, by
+    finalize_parts.
+    """
+    remaining: Dict[str, int] = {}
+    for item in items:
+        remaining[item["table"]] = remaining.get(item["table"], 0) + 1
+    lock = threading.Lock()
+
+    def on_done(item: Dict):
+        with lock:
+            remaining[item["table"]] -= 1
+            if remaining[item["table"]]:
+                return
+        if defer_split_tables and item["where"] is not None:
+            return
+
+        table_items = [i for i in items if i["table"] == item["table"]]
+        if all(i.get("sha256") for i in table_items):
+            on_table_complete(item["table"], table_items)
+
+    return on_done
+
+
+def plan_work_items(cursor, tables: List[str], table_sizes: Dict[str, int], output_dir: str, split_threshold: Optional[int], split_parts: int, extension: str = ".csv", spec: Optional[Dict] = None) -> List[Dict]:
+    """
+    Turns the tables to export into work items. Tables at or above the split
+    threshold (bytes) are broken into range parts that export independently.
+    Each item's progress weight is its share of the table's estimated size.
+    The export spec's columns, filter and limit are attached to every item of
+    the table; tables with a row limit are never split.
+    """
+    items = []
+    for table_name in tables:
+        table_spec = spec_for_table(spec, table_name)
+        spec_fields = {
+            "columns": table_spec["columns"],
+            "spec_where": sql.SQL(table_spec["where"]) if table_spec["where"] else None,
+            "limit": table_spec["limit"],
+            "filter": None,
+        }
+
+        ranges = []
+        if split_threshold is not None and split_parts > 1 and table_spec["limit"] is None and table_sizes[table_name] >= split_threshold:
+            ranges = plan_table_parts(cursor, table_name, split_parts)
+
+        weight = max(table_sizes[table_name], 1)
+        if not ranges:
+            items.append({
+                "table": table_name,
+                "label": table_name,
+                "weight": weight,
+                "file_path": os.path.join(output_dir, f"{table_name}{extension}"),
+                "where": None,
+                "header": True,
+                **spec_fields,
+            })
+            continue
+
+        for part, where in enumerate(ranges, 1):
+            items.append({
+                "table": table_name,
+                "label": f"{table_name} part {part}/{len(ranges)}",
+                # The last part takes the rounding remainder so parts sum to the table weight
+                "weight": weight // len(ranges) + (weight % len(ranges) if part == len(ranges) else 0),
+                "file_path": part_file_path(output_dir, table_name, part, extension),
+                "where": where,
+                "header": part == 1,
+                **spec_fields,
+            })
+    return items
+
+
+def plan_incremental_items(cursor, items: List[Dict], watermarks: Dict[str, str], state: WatermarkState, output_dir: str, extension: str = ".csv"):
+    """
+    Turns full-table work items into delta exports. Each item is filtered to
+    rows past the table's previous watermark and written to a timestamped
+    `{table}.delta-YYYYmmddHHMMSS{extension}` file. The new watermark is read
+    in the export snapshot and stored on the item until the delta completes.
+    """
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    for item in items:
+        condition, column, new_value = plan_watermark(cursor, item["table"], watermarks.get(item["table"]), state)
+        item["filter"] = condition
+        item["watermark_column"] = column
+        item["watermark_value"] = new_value
+        item["file_path"] = os.path.join(output_dir, f"{item['table']}.delta-{stamp}{extension}")
+        item["label"] = f"{item['table']} (delta on {column})" if condition is not None else f"{item['table']} (baseline)"
+
+
+def export_tables_parallel(conn_str: str, snapshot_id: str, items: List[Dict], jobs: int, progress, task, compression: Optional[str] = None, on_done: Optional[Callable] = None) -> List[Dict]:
+    """
+    Exports work items concurrently over `jobs` connections.
+
+    Every worker connection imports the snapshot exported by the coordinating
+    connection, so all tables are read from the same point in time. Workers
+    pull from a shared queue, which is filled largest-table-first so the long
+    exports start early and the small ones fill in the gaps at the end.
+
+    Returns the items that failed.
+    """
+    work = queue.Queue()
+    for item in items:
+        work.put(item)
+    failed = []
+
+    def worker():
+        with psycopg.connect(conn_str) as conn:
+            conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+            conn.read_only = True
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL("SET TRANSACTION SNAPSHOT {}").format(sql.Literal(snapshot_id))
+                )
+                while True:
+                    try:
+                        item = work.get_nowait()
+                    except queue.Empty:
+                        return
+
+                    if not run_export_item(conn, cursor, item, progress, task, compression, on_done):
+                        failed.append(item)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(worker) for _ in range(min(jobs, len(items)))]
+        for future in futures:
+            future.result()
+
+    return failed
+
+
+def finalize_parts(items: List[Dict], failed: List[Dict], output_dir: str, concat_parts: bool, manifest: ExportManifest, extension: str = ".csv", table_options: Optional[Dict[str, Dict]] = None):
+    """
+    Concatenates the part files of split tables into `{table}{extension}` when
+    requested and records the joined file in the manifest, with the table's
+    export options from `table_options`. Tables with a failed part are left
+    as parts for inspection.
+    """
+    if not concat_parts:
+        return
+
+    failed_tables = {item["table"] for item in failed}
+    parts_by_table: Dict[str, List[Dict]] = {}
+    for item in items:
+        if item["where"] is not None:
+            parts_by_table.setdefault(item["table"], []).append(item)
+
+    for table_name, parts in parts_by_table.items():
+        if table_name in failed_tables:
+            console.print(f"[yellow]Not concatenating {table_name}: one or more parts failed.[/yellow]")
+            continue
+        part_paths = [part["file_path"] for part in parts]
+        file_path = os.path.join(output_dir, f"{table_name}{extension}")
+        checksum = concat_part_files(part_paths, file_path)
+        rows = [part["rows"] for part in parts]
+        manifest.record_table(table_name, [{
+            "path": os.path.relpath(file_path, output_dir),
+            "rows": None if None in rows else sum(rows),
+            "bytes": os.path.getsize(file_path),
+            "sha256": checksum,
+        }], (table_options or {}).get(table_name))
+        console.print(f"  [green]✅ Concatenated {len(part_paths)} parts into {file_path}[/green]")
+
+
 def export_csv(args: argparse.Namespace):
     """
     Connects to a PostgreSQL database and exports tables to CSV using COPY TO.
@@ -22,51 +377,45 @@ def export_csv(args: argparse.Namespace):
     output_dir = args.output_dir
     table_names = args.tables
     if_exists = args.if_exists
+    jobs = max(1, args.jobs)
+    split_threshold = args.split_threshold * 1024 * 1024 if args.split_threshold is not None else None
+    split_parts = args.split_parts
+    compression = args.compress
+    extension = ".csv" + compression_suffix(compression)
+    resume = args.resume
+    incremental = args.incremental
 
-    os.makedirs(output_dir, exist_ok=True)
-
-    conn_parts = [
-        f"host={server}",
-        f"port={port}",
-        f"dbname={database}",
-        f"user={user}"
-    ]
+    spec = None
+    if args.spec:
+        try:
+            spec = load_export_spec(args.spec)
+        except ValueError as e:
+            console.print(f"[red]{e}[/red]")
+            return
 
-    if args.password is not None:
-        conn_parts.append(f"password={args.password}")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = ExportManifest(output_dir)
 
-    conn_str = " ".join(conn_parts)
-    # conn_str = f"host={server} port={port} dbname={database} user={user} password={password}"
+    if incremental:
+        try:
+            watermarks = parse_watermarks(args.watermark)
+        except ValueError as e:
+            console.print(f"[red]{e}[/red]")
+            return
+        state = WatermarkState(args.state_file or os.path.join(output_dir, STATE_FILE))
+        # Incremental runs only read rows past the watermark; no table is split
+        split_threshold = None
 
-    # Separate tables to include and exclude
-    tables_to_include = {t for t in table_names if not t.startswith('!')} if table_names else set()
-    tables_to_exclude = {t[1:] for t in table_names if t.startswith('!')} if table_names else set()
+    conn_str = build_conn_str(args)
 
     try:
         with psycopg.connect(conn_str) as conn:
+            # Repeatable read keeps every table on the same snapshot, and lets
+            # parallel workers share it via pg_export_snapshot().
+            conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
             with conn.cursor() as cursor:
-                # First, get all public tables from the database
-                cursor.execute(
-                    """
-                    SELECT tablename
-                    FROM pg_catalog.pg_tables
-                    WHERE schemaname = 'public';
-                    """
-                )
-                all_public_tables = {table[0] for table in cursor.fetchall()}
-
-                # Determine the final list of tables to export
-                if tables_to_include:
-                    tables_to_export = tables_to_include.intersection(all_public_tables)
-                    if tables_to_include - all_public_tables:
-                        missing_tables = tables_to_include - all_public_tables
-                        console.print(f"[yellow]Warning: The following tables were requested but do not exist: {', '.join(missing_tables)}[/yellow]")
-                else:
-                    tables_to_export = all_public_tables
-
-                # Now, filter out any tables the user wants to exclude
-                tables_to_export = tables_to_export - tables_to_exclude
-                
+                tables_to_export, tables_to_exclude = select_tables(cursor, table_names)
+
                 if not tables_to_export:
                     console.print("[yellow]No tables to export after applying filters.[/yellow]")
                     return
@@ -77,46 +426,111 @@ def export_csv(args: argparse.Namespace):
 
                 # Show the selected if-exists strategy
                 console.print(f"[bold blue]If exists strategy:[/bold blue] {if_exists}")
+                if resume:
+                    console.print(f"[bold blue]Resume:[/bold blue] skipping tables verified in {manifest.path}")
+                console.print(f"[bold blue]Parallel jobs:[/bold blue] {jobs}")
+                if compression:
+                    console.print(f"[bold blue]Compression:[/bold blue] {compression} ({extension})")
+                if split_threshold is not None:
+                    console.print(f"[bold blue]Split tables over:[/bold blue] {args.split_threshold} MB into {split_parts} parts")
+                    if jobs == 1:
+                        console.print("[yellow]Hint: with --jobs 1 the range parts export one after another; raise --jobs to run them in parallel.[/yellow]")
+                if incremental:
+                    console.print(f"[bold blue]Incremental:[/bold blue] watermarks from {state.path}")
+                if spec:
+                    console.print(f"[bold blue]Export spec:[/bold blue] {args.spec}")
+                    unknown_tables = {t for t in spec if t is not None} - tables_to_export
+                    if unknown_tables:
+                        console.print(f"[yellow]Warning: The export spec lists tables that are not being exported: {', '.join(sorted(unknown_tables))}[/yellow]")
+
+                # Pre-scan catalog statistics for sizing, scheduling and the summary
+                table_stats = fetch_table_stats(cursor, tables_to_export)
+                table_sizes = {table: max(stats["heap_bytes"], 1) for table, stats in table_stats.items()}
+                total_bytes = sum(stats["total_bytes"] for stats in table_stats.values())
+                estimated_rows = sum(stats["estimated_rows"] for stats in table_stats.values())
+                console.print(f"[bold blue]Estimated size:[/bold blue] {total_bytes / 1024 ** 3:,.2f} GB, ~{estimated_rows:,} rows")
 
                 if not Confirm.ask(f"Export tables from {server}.{database} to csv?"):
                     console.print("[red]Export aborted.[/red]")
                     return
 
-                # Use Rich Progress to show the export status
+                started = datetime.now()
+
+                # Use Rich Progress to show the export status, weighted by table size
                 with Progress(
                     SpinnerColumn(),
                     TextColumn("[progress.description]{task.description}"),
                     BarColumn(),
                     TaskProgressColumn(),
                     "•",
+                    DownloadColumn(),
+                    "•",
+                    TransferSpeedColumn(),
+                    "•",
                     TimeElapsedColumn(),
                     console=console,
                     transient=False
                 ) as progress:
-                    overall_task = progress.add_task(f"[cyan]Exporting tables from {database}", total=len(tables_to_export))
-                
-                    for table_name in sorted(list(tables_to_export)):
-                        file_path = os.path.join(output_dir, f"{table_name}.csv")
+                    overall_task = progress.add_task(f"[cyan]Exporting tables from {database}", total=sum(table_sizes.values()))
+
+                    # Resume only trusts manifest entries written with the same options
+                    table_options = {table: export_options(compression, spec_for_table(spec, table)) for table in tables_to_export}
+
+                    # Schedule the largest tables first
+                    pending_tables = []
+                    for table_name in sorted(tables_to_export, key=lambda t: (-table_sizes[t], t)):
+                        file_path = os.path.join(output_dir, f"{table_name}{extension}")
+
+                        if resume and not incremental and manifest.is_complete(table_name, table_options[table_name]):
+                            progress.console.print(f"  [yellow]Skipping {table_name}, verified complete in manifest.[/yellow]")
+                            progress.advance(overall_task, table_sizes[table_name])
+                            continue
 
-                        if if_exists == 'skip' and os.path.exists(file_path):
+                        if if_exists == 'skip' and not incremental and (os.path.exists(file_path) or os.path.exists(part_file_path(output_dir, table_name, 1, extension))):
                             progress.console.print(f"  [yellow]Skipping {table_name}, file already exists.[/yellow]")
-                            progress.advance(overall_task)
+                            progress.advance(overall_task, table_sizes[table_name])
                             continue
 
-                        progress.update(overall_task, description=f"[cyan]Exporting {table_name}")
-
-                        try:
-                            with open(file_path, "wb") as f:
-                                with cursor.copy(
-                                    f"COPY {table_name} TO STDOUT WITH CSV HEADER"
-                                ) as copy:
-                                    for data in copy:
-                                        f.write(data)
-                            progress.console.print(f"  [green]✅ Exported {table_name} to {file_path}[/green]")
-                        except psycopg.Error as e:
-                            progress.console.print(f"[bright-red]  ❌ Error exporting {table_name}: {e}[/bright-red]")
-                        
-                        progress.advance(overall_task)
+                        pending_tables.append(table_name)
+
+                    items = plan_work_items(cursor, pending_tables, table_sizes, output_dir, split_threshold, split_parts, extension, spec)
+
+                    if incremental:
+                        plan_incremental_items(cursor, items, watermarks, state, output_dir, extension)
+
+                        def on_table_complete(table_name, table_items):
+                            item = table_items[0]
+                            state.update(table_name, item["watermark_column"], item["watermark_value"])
+                    else:
+                        def on_table_complete(table_name, table_items):
+                            manifest.record_table(table_name, [manifest_file_entry(i, output_dir) for i in table_items], table_options[table_name])
+
+                    on_done = track_table_completion(items, on_table_complete, args.concat_parts)
+
+                    if jobs > 1 and len(items) > 1:
+                        cursor.execute("SELECT pg_export_snapshot();")
+                        snapshot_id = cursor.fetchone()[0]
+                        logger.debug(f"Exported snapshot {snapshot_id} for {jobs} parallel jobs")
+
+                        progress.update(overall_task, description=f"[cyan]Exporting {len(pending_tables)} tables with {jobs} jobs")
+                        failed = export_tables_parallel(conn_str, snapshot_id, items, jobs, progress, overall_task, compression, on_done)
+                    else:
+                        failed = []
+                        for item in items:
+                            progress.update(overall_task, description=f"[cyan]Exporting {item['label']}")
+                            if not run_export_item(conn, cursor, item, progress, overall_task, compression, on_done):
+                                failed.append(item)
+
+                finalize_parts(items, failed, output_dir, args.concat_parts, manifest, extension, table_options)
+
+                if items:
+                    summary = build_summary(args, table_stats, items, started, datetime.now())
+                    write_summary(summary, args.summary or os.path.join(output_dir, SUMMARY_FILE))
+                    console.print(
+                        f"[bold blue]Exported[/bold blue] {summary['total_rows']:,} rows, "
+                        f"{summary['total_copy_bytes'] / 1024 ** 2:,.1f} MB in {summary['wall_seconds']:.1f}s "
+                        f"({summary['mb_per_sec']:.1f} MB/s)"
+                    )
 
     except psycopg.OperationalError as e:
          console.print(f"[red]Connection failed: {e}[/red]")
@@ -124,13 +538,8 @@ def export_csv(args: argparse.Namespace):
 
     console.print("[bright-green]All tables exported.[/bright-green]")
 
-def setup_parser(subparsers):
-    """
-    Adds the 'export' subcommand to the 'postgresql' parser.
-    """
-    export_parser = subparsers.add_parser(
-        "export-csv", help="Export PostgreSQL tables to .csv"
-    )
+def add_connection_arguments(export_parser):
+    """Adds the PostgreSQL connection arguments shared by the export subcommands."""
     export_parser.add_argument(
         "-s",
         "--server",
@@ -161,6 +570,16 @@ def setup_parser(subparsers):
         "--password",
         help="PostgreSQL password."
     )
+
+
+def setup_parser(subparsers):
+    """
+    Adds the 'export' subcommand to the 'postgresql' parser.
+    """
+    export_parser = subparsers.add_parser(
+        "export-csv", help="Export PostgreSQL tables to .csv"
+    )
+    add_connection_arguments(export_parser)
     export_parser.add_argument(
         "-o",
         "--output-dir",
@@ -179,4 +598,63 @@ def setup_parser(subparsers):
         default='overwrite',
         help="Action to take if the CSV file already exists (default: overwrite)."
     )
+    export_parser.add_argument(
+        "--spec",
+        metavar="<PATH>",
+        help="YAML export spec with per-table columns, where filter and row limit, compiled into COPY (SELECT ...)."
+    )
+    export_parser.add_argument(
+        "--summary",
+        metavar="<PATH>",
+        help="Where to write the JSON export summary with per-table sizes and throughput (default: <output-dir>/export_summary.json)."
+    )
+    export_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip tables recorded as complete in export_manifest.json whose files still match the recorded size and checksum."
+    )
+    export_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Export only rows added or changed since the last incremental run into {table}.delta-<timestamp>.csv files."
+    )
+    export_parser.add_argument(
+        "--watermark",
+        nargs="*",
+        metavar="TABLE=COLUMN",
+        help="Watermark column per table for --incremental (e.g. notes=updated_at). Other tables are tracked by xmin."
+    )
+    export_parser.add_argument(
+        "--state-file",
+        help="Where --incremental keeps the last exported watermark per table (default: <output-dir>/export_state.json)."
+    )
+    export_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of tables to export concurrently. All connections share one snapshot (default: 1)."
+    )
+    export_parser.add_argument(
+        "--split-threshold",
+        type=int,
+        metavar="MB",
+        help="Split tables at least this large (estimated MB) into range parts; parts run in parallel when --jobs > 1. Disabled if omitted."
+    )
+    export_parser.add_argument(
+        "--split-parts",
+        type=int,
+        default=4,
+        help="Number of range parts for tables over --split-threshold (default: 4)."
+    )
+    export_parser.add_argument(
+        "--concat-parts",
+        action="store_true",
+        help="Concatenate the part files of split tables into a single {table}.csv."
+    )
+    export_parser.add_argument(
+        "--compress",
+        choices=['gzip', 'zstd'],
+        help="Compress output on the fly to .csv.gz or .csv.zst (zstd requires the 'zstandard' package)."
+    )
     export_parser.set_defaults(func=export_csv)
@@ -0,0 +1,80 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ...utils.file_utils import file_checksum, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "export_manifest.json"
+
+
+class ExportManifest:
+    """
+    Records which tables finished exporting, with the row count, byte size
+    and sha256 checksum of each output file.
+
+    The manifest lives next to the exported files and is rewritten atomically
+    every time a table completes, so it survives a crash mid-export and
+    `--resume` can tell finished tables from interrupted ones.
+    """
+
+    def __init__(self, output_dir: str, filename: str = MANIFEST_FILE):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, filename)
+        self.lock = threading.Lock()
+        self.data = {"tables": {}}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+                self.data.setdefault("tables", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable export manifest {self.path}: {e}")
+
+    def save(self):
+        write_json_atomic(self.path, self.data)
+
+    def record_table(self, table_name: str, files: List[Dict], options: Optional[Dict] = None):
+        """
+        Marks a table complete. `files` holds one entry per output file with
+        the keys path (relative to the output dir), rows, bytes and sha256.
+        `options` records the export settings the files were written with.
+        """
+        with self.lock:
+            self.data["tables"][table_name] = {
+                "files": files,
+                "options": options,
+                "rows": sum(f["rows"] or 0 for f in files),
+                "bytes": sum(f["bytes"] for f in files),
+                "completed": datetime.now().isoformat(),
+            }
+            self.save()
+
+    def is_complete(self, table_name: str, options: Optional[Dict] = None) -> bool:
+        """
+        Returns True only if the table was exported with the same `options`
+        as the current run and every file recorded for it still exists with
+        the recorded size and checksum.
+        """
+        entry = self.data["tables"].get(table_name)
+        if not entry or not entry.get("files"):
+            return False
+
+        if entry.get("options") != options:
+            logger.debug(f"{table_name}: export options changed since the last run ({entry.get('options')} -> {options})")
+            return False
+
+        for file_entry in entry["files"]:
+            path = os.path.join(self.output_dir, file_entry["path"])
+            if not os.path.isfile(path) or os.path.getsize(path) != file_entry["bytes"]:
+                logger.debug(f"{table_name}: {path} is missing or has the wrong size")
+                return False
+            if file_checksum(path) != file_entry["sha256"]:
+                logger.debug(f"{table_name}: checksum mismatch for {path}")
+                return False
+        return True
@@ -0,0 +1,346 @@
+import psycopg
+import os
+import re
+import argparse
+import logging
+from typing import Dict, List
+from psycopg import sql
+from rich.prompt import Confirm
+from rich.console import Console
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn, TaskProgressColumn
+
+from .export_csv import add_connection_arguments, build_conn_str, select_tables, fetch_table_sizes
+from .export_manifest import ExportManifest
+from ...utils.file_utils import file_checksum, write_json_atomic
+
+logger = logging.getLogger(__name__)
+console = Console()
+
+PARQUET_MANIFEST_FILE = "parquet_manifest.json"
+
+
+def require_pyarrow():
+    """Import the optional pyarrow package, with an actionable error if it is missing."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Parquet export requires the 'pyarrow' package. "
+            "Install it with: pip install sa-conversion-utils[parquet]"
+        ) from e
+    return pyarrow
+
+
+def fetch_columns(cursor, table_name: str) -> List[Dict]:
+    """
+    Reads column names, declared types and nullability for a table from
+    pg_attribute, in column order.
+    """
+    cursor.execute(
+        """
+        SELECT a.attname,
+               format_type(a.atttypid, a.atttypmod),
+               NOT a.attnotnull
+        FROM pg_catalog.pg_attribute a
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relname = %s
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+        ORDER BY a.attnum;
+        """,
+        (table_name,)
+    )
+    return [
+        {"name": name, "pg_type": pg_type, "nullable": nullable}
+        for name, pg_type, nullable in cursor.fetchall()
+    ]
+
+
+def fetch_primary_key(cursor, table_name: str) -> List[str]:
+    """Returns the primary key columns of a table in key order."""
+    cursor.execute(
+        """
+        SELECT a.attname
+        FROM pg_catalog.pg_index i
+        JOIN pg_catalog.pg_class c ON c.oid = i.indrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord) ON true
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+        WHERE n.nspname = 'public'
+          AND c.relname = %s
+          AND i.indisprimary
+        ORDER BY k.ord;
+        """,
+        (table_name,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def map_pg_type(pg_type: str, pa):
+    """
+    Maps a PostgreSQL type (as printed by format_type) to an Arrow type and
+    the matching SQL Server column type.
+
+    Returns (arrow_type, sqlserver_type, cast_to_text). Types without a
+    faithful Arrow equivalent (json, uuid, arrays, intervals, enums, ...) are
+    cast to text in the SELECT and stored as strings.
+    """
+    simple_types = {
+        "smallint": (pa.int16(), "SMALLINT"),
+        "integer": (pa.int32(), "INT"),
+        "bigint": (pa.int64(), "BIGINT"),
+        "real": (pa.float32(), "REAL"),
+        "double precision": (pa.float64(), "FLOAT"),
+        "boolean": (pa.bool_(), "BIT"),
+        "text": (pa.string(), "NVARCHAR(MAX)"),
+        "date": (pa.date32(), "DATE"),
+        "bytea": (pa.binary(), "VARBINARY(MAX)"),
+    }
+    if pg_type in simple_types:
+        arrow_type, sqlserver_type = simple_types[pg_type]
+        return arrow_type, sqlserver_type, False
+
+    match = re.fullmatch(r"(character varying|character)(?:\((\d+)\))?", pg_type)
+    if match:
+        length = int(match.group(2)) if match.group(2) else None
+        if match.group(1) == "character" and length:
+            return pa.string(), f"NCHAR({length})", False
+        return pa.string(), f"NVARCHAR({length})" if length and length <= 4000 else "NVARCHAR(MAX)", False
+
+    match = re.fullmatch(r"numeric\((\d+),(\d+)\)", pg_type)
+    if match:
+        precision, scale = int(match.group(1)), int(match.group(2))
+        if precision <= 38:
+            return pa.decimal128(precision, scale), f"DECIMAL({precision}, {scale})", False
+
+    if re.fullmatch(r"timestamp(?:\(\d\))? without time zone", pg_type):
+        return pa.timestamp("us"), "DATETIME2", False
+    if re.fullmatch(r"timestamp(?:\(\d\))? with time zone", pg_type):
+        return pa.timestamp("us", tz="UTC"), "DATETIMEOFFSET", False
+    if re.fullmatch(r"time(?:\(\d\))? without time zone", pg_type):
+        return pa.time64("us"), "TIME", False
+    if pg_type == "uuid":
+        return pa.string(), "UNIQUEIDENTIFIER", True
+
+    return pa.string(), "NVARCHAR(MAX)", True
+
+
+def build_table_schema(cursor, table_name: str, pa) -> Dict:
+    """
+    Builds the typed description of a table used both for the Parquet schema
+    and for the sidecar `{table}.schema.json`.
+    """
+    columns = fetch_columns(cursor, table_name)
+    for column in columns:
+        arrow_type, sqlserver_type, cast_to_text = map_pg_type(column["pg_type"], pa)
+        column["arrow"] = arrow_type
+        column["arrow_type"] = str(arrow_type)
+        column["sqlserver_type"] = sqlserver_type
+        column["cast_to_text"] = cast_to_text
+
+    return {
+        "table": table_name,
+        "columns": columns,
+        "primary_key": fetch_primary_key(cursor, table_name),
+    }
+
+
+def sqlserver_create_table(schema: Dict) -> str:
+    """Renders a CREATE TABLE statement for SQL Server from a table schema."""
+    lines = [
+        f"    [{c['name']}] {c['sqlserver_type']} {'NULL' if c['nullable'] else 'NOT NULL'}"
+        for c in schema["columns"]
+    ]
+    if schema["primary_key"]:
+        key_columns = ", ".join(f"[{name}]" for name in schema["primary_key"])
+        lines.append(f"    PRIMARY KEY ({key_columns})")
+    return f"CREATE TABLE [{schema['table']}] (\n" + ",\n".join(lines) + "\n);"
+
+
+def write_schema_sidecar(schema: Dict, path: str):
+    """Saves the column types and a ready-to-run CREATE TABLE for importers."""
+    write_json_atomic(path, {
+        "table": schema["table"],
+        "columns": [
+            {key: column[key] for key in ("name", "pg_type", "nullable", "arrow_type", "sqlserver_type")}
+            for column in schema["columns"]
+        ],
+        "primary_key": schema["primary_key"],
+        "create_table_sql": sqlserver_create_table(schema),
+    })
+
+
+def export_table_parquet(conn, schema: Dict, file_path: str, batch_size: int, compression: str, pa) -> int:
+    """
+    Streams a table through a server-side cursor in batches of `batch_size`
+    rows and writes each batch as a Parquet row group. Returns the row count.
+    """
+    import pyarrow.parquet as pq
+
+    arrow_schema = pa.schema([
+        pa.field(c["name"], c["arrow"], nullable=c["nullable"]) for c in schema["columns"]
+    ])
+    select_list = sql.SQL(", ").join([
+        sql.SQL("{}::text").format(sql.Identifier(c["name"])) if c["cast_to_text"] else sql.Identifier(c["name"])
+        for c in schema["columns"]
+    ])
+    query = sql.SQL("SELECT {} FROM {}").format(select_list, sql.Identifier(schema["table"]))
+
+    rows_written = 0
+    tmp_path = f"{file_path}.tmp"
+    try:
+        with conn.transaction():
+            with conn.cursor(name=f"export_{schema['table']}") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query)
+                with pq.ParquetWriter(tmp_path, arrow_schema, compression=compression) as writer:
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        columns = list(zip(*rows))
+                        batch = pa.RecordBatch.from_arrays(
+                            [pa.array(values, type=field.type) for values, field in zip(columns, arrow_schema)],
+                            schema=arrow_schema,
+                        )
+                        writer.write_batch(batch)
+                        rows_written += len(rows)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return rows_written
+
+
+def export_parquet(args: argparse.Namespace):
+    """
+    Connects to a PostgreSQL database and exports tables to typed Parquet
+    files, with a `{table}.schema.json` sidecar describing each table.
+    """
+    server = args.server
+    database = args.database
+    output_dir = args.output_dir
+    if_exists = args.if_exists
+    batch_size = args.batch_size
+    compression = None if args.compression == 'none' else args.compression
+
+    pa = require_pyarrow()
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = ExportManifest(output_dir, PARQUET_MANIFEST_FILE)
+
+    try:
+        with psycopg.connect(build_conn_str(args)) as conn:
+            # One repeatable read transaction keeps every table on the same snapshot
+            conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+            with conn.cursor() as cursor:
+                tables_to_export, tables_to_exclude = select_tables(cursor, args.tables)
+
+                if not tables_to_export:
+                    console.print("[yellow]No tables to export after applying filters.[/yellow]")
+                    return
+
+                console.print(f"[bold blue]Tables to export:[/bold blue] {', '.join(sorted(tables_to_export))}")
+                if tables_to_exclude:
+                    console.print(f"[bold blue]Tables to exclude:[/bold blue] {', '.join(sorted(tables_to_exclude))}")
+                console.print(f"[bold blue]If exists strategy:[/bold blue] {if_exists}")
+                console.print(f"[bold blue]Compression:[/bold blue] {args.compression}")
+
+                if not Confirm.ask(f"Export tables from {server}.{database} to parquet?"):
+                    console.print("[red]Export aborted.[/red]")
+                    return
+
+                table_sizes = fetch_table_sizes(cursor, tables_to_export)
+
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                TaskProgressColumn(),
+                "•",
+                TimeElapsedColumn(),
+                console=console,
+                transient=False
+            ) as progress:
+                overall_task = progress.add_task(f"[cyan]Exporting tables from {database}", total=len(tables_to_export))
+
+                for table_name in sorted(tables_to_export, key=lambda t: (-table_sizes[t], t)):
+                    file_path = os.path.join(output_dir, f"{table_name}.parquet")
+                    schema_path = os.path.join(output_dir, f"{table_name}.schema.json")
+
+                    if if_exists == 'skip' and os.path.exists(file_path):
+                        progress.console.print(f"  [yellow]Skipping {table_name}, file already exists.[/yellow]")
+                        progress.advance(overall_task)
+                        continue
+
+                    progress.update(overall_task, description=f"[cyan]Exporting {table_name}")
+
+                    try:
+                        with conn.cursor() as cursor:
+                            schema = build_table_schema(cursor, table_name, pa)
+                        rows = export_table_parquet(conn, schema, file_path, batch_size, compression, pa)
+                        write_schema_sidecar(schema, schema_path)
+                        manifest.record_table(table_name, [{
+                            "path": os.path.relpath(file_path, output_dir),
+                            "rows": rows,
+                            "bytes": os.path.getsize(file_path),
+                            "sha256": file_checksum(file_path),
+                        }], {"compression": args.compression})
+                        progress.console.print(f"  [green]✅ Exported {table_name} ({rows:,} rows) to {file_path}[/green]")
+                    except (psycopg.Error, OSError, pa.ArrowException) as e:
+                        progress.console.print(f"[bright-red]  ❌ Error exporting {table_name}: {e}[/bright-red]")
+
+                    progress.advance(overall_task)
+
+    except psycopg.OperationalError as e:
+        console.print(f"[red]Connection failed: {e}[/red]")
+        return
+
+    console.print("[bright-green]All tables exported.[/bright-green]")
+
+
+def setup_parser(subparsers):
+    """
+    Adds the 'export-parquet' subcommand to the 'postgresql' parser.
+    """
+    export_parser = subparsers.add_parser(
+        "export-parquet", help="Export PostgreSQL tables to typed .parquet with schema sidecars"
+    )
+    add_connection_arguments(export_parser)
+    export_parser.add_argument(
+        "-o",
+        "--output-dir",
+        default="./exports",
+        help="Directory to save Parquet files. (default: /exports)"
+    )
+    export_parser.add_argument(
+        "-t",
+        "--tables",
+        nargs="*",
+        help="Space-separated list of tables to export. Use `!tablename` to exclude. Exports all public tables if omitted."
+    )
+    export_parser.add_argument(
+        "--if-exists",
+        choices=['overwrite', 'skip'],
+        default='overwrite',
+        help="Action to take if the Parquet file already exists (default: overwrite)."
+    )
+    export_parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=50000,
+        help="Rows fetched per server-side cursor batch and written per row group (default: 50000)."
+    )
+    export_parser.add_argument(
+        "--compression",
+        choices=['zstd', 'snappy', 'gzip', 'none'],
+        default='zstd',
+        help="Parquet compression codec (default: zstd)."
+    )
+    export_parser.set_defaults(func=export_parquet)
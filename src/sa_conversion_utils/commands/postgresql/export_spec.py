@@ -0,0 +1,90 @@
+import logging
+from typing import Dict, Optional
+from psycopg import sql
+
+from ...utils.load_yaml import load_yaml
+
+logger = logging.getLogger(__name__)
+
+SPEC_KEYS = {"columns", "where", "limit"}
+
+
+def validate_table_spec(table_name: str, table_spec: Dict) -> Dict:
+    """Checks one table entry of an export spec and returns it normalized."""
+    if not isinstance(table_spec, dict):
+        raise ValueError(f"Export spec for '{table_name}' must be a mapping")
+
+    unknown = set(table_spec) - SPEC_KEYS
+    if unknown:
+        raise ValueError(f"Unknown keys in export spec for '{table_name}': {', '.join(sorted(unknown))}")
+
+    columns = table_spec.get("columns")
+    if columns is not None and (not isinstance(columns, list) or not columns):
+        raise ValueError(f"'columns' for '{table_name}' must be a non-empty list")
+
+    limit = table_spec.get("limit")
+    if limit is not None and (not isinstance(limit, int) or limit < 0):
+        raise ValueError(f"'limit' for '{table_name}' must be a non-negative integer")
+
+    return {
+        "columns": [str(c) for c in columns] if columns else None,
+        "where": table_spec.get("where"),
+        "limit": limit,
+    }
+
+
+def load_export_spec(path: str) -> Dict[str, Dict]:
+    """
+    Loads a YAML export spec that narrows what is pulled from each table:
+
+        defaults:
+          limit: 1000            # applied to every table (e.g. dev samples)
+        tables:
+          notes:
+            columns: [id, case_id, note_date, body]
+            where: "note_date >= '2018-01-01'"
+          audit_log:
+            columns: [id, table_name, changed_at]
+            limit: 500
+
+    Returns a dict of table name -> {columns, where, limit}, with the
+    `defaults` entry stored under None.
+    """
+    data = load_yaml(path)
+    if data is None:
+        raise ValueError(f"Could not load export spec: {path}")
+    if not isinstance(data, dict):
+        raise ValueError(f"Export spec must be a mapping: {path}")
+
+    spec = {None: validate_table_spec("defaults", data.get("defaults") or {})}
+    for table_name, table_spec in (data.get("tables") or {}).items():
+        spec[table_name] = validate_table_spec(table_name, table_spec or {})
+
+    logger.debug(f"Loaded export spec for {len(spec) - 1} tables from {path}")
+    return spec
+
+
+def spec_for_table(spec: Optional[Dict[str, Dict]], table_name: str) -> Dict:
+    """Returns the effective spec for a table: its own entry layered over the defaults."""
+    if not spec:
+        return {"columns": None, "where": None, "limit": None}
+
+    defaults = spec[None]
+    table_spec = spec.get(table_name, {})
+    return {key: table_spec.get(key) if table_spec.get(key) is not None else defaults[key] for key in SPEC_KEYS}
+
+
+def build_select(table_name: str, columns=None, conditions=(), limit: Optional[int] = None) -> sql.Composable:
+    """
+    Compiles a projection, filters and row limit into
+    `SELECT <columns> FROM <table> [WHERE ...] [LIMIT n]`.
+    Spec filters are raw SQL from the spec file and are parenthesized.
+    """
+    select_list = sql.SQL(", ").join([sql.Identifier(c) for c in columns]) if columns else sql.SQL("*")
+    query = sql.SQL("SELECT {} FROM {}").format(select_list, sql.Identifier(table_name))
+
+    if conditions:
+        query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join([sql.SQL("({})").format(c) for c in conditions])
+    if limit is not None:
+        query += sql.SQL(" LIMIT {}").format(sql.Literal(limit))
+    return query
@@ -0,0 +1,132 @@
+import os
+import hashlib
+import logging
+from typing import List
+from psycopg import sql
+
+logger = logging.getLogger(__name__)
+
+INTEGER_TYPES = {"smallint", "integer", "bigint"}
+
+
+def get_integer_primary_key(cursor, table_name: str):
+    """
+    Returns the column name of a single-column integer primary key, or None
+    if the table has no primary key, a composite key, or a non-integer key.
+    """
+    cursor.execute(
+        """
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_catalog.pg_index i
+        JOIN pg_catalog.pg_class c ON c.oid = i.indrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE n.nspname = 'public'
+          AND c.relname = %s
+          AND i.indisprimary;
+        """,
+        (table_name,)
+    )
+    key_columns = cursor.fetchall()
+    if len(key_columns) == 1 and key_columns[0][1] in INTEGER_TYPES:
+        return key_columns[0][0]
+    return None
+
+
+def plan_pk_ranges(cursor, table_name: str, key_column: str, parts: int) -> List[sql.Composable]:
+    """
+    Splits the key range [min, max] of an integer primary key into `parts`
+    contiguous WHERE clauses.
+    """
+    cursor.execute(
+        sql.SQL("SELECT min({key}), max({key}) FROM {table}").format(
+            key=sql.Identifier(key_column), table=sql.Identifier(table_name)
+        )
+    )
+    low, high = cursor.fetchone()
+    if low is None:
+        return []
+
+    step = max(1, -(-(high - low + 1) // parts))
+    key = sql.Identifier(key_column)
+    ranges = []
+    for start in range(low, high + 1, step):
+        end = start + step
+        if end > high:
+            ranges.append(sql.SQL("{} >= {}").format(key, sql.Literal(start)))
+        else:
+            ranges.append(sql.SQL("{} >= {} AND {} < {}").format(key, sql.Literal(start), key, sql.Literal(end)))
+    return ranges
+
+
+def plan_ctid_ranges(cursor, table_name: str, parts: int) -> List[sql.Composable]:
+    """
+    Splits the table's heap pages into `parts` ctid ranges. Works for any
+    table and uses a TID range scan on PostgreSQL 14+.
+    """
+    cursor.execute(
+        sql.SQL(
+            "SELECT pg_relation_size({table}::regclass) / current_setting('block_size')::bigint"
+        ).format(table=sql.Literal(sql.Identifier("public", table_name).as_string(cursor)))
+    )
+    pages = cursor.fetchone()[0]
+    if not pages:
+        return []
+
+    step = max(1, -(-pages // parts))
+    ranges = []
+    for start in range(0, pages, step):
+        end = start + step
+        lower = sql.SQL("ctid >= {}::tid").format(sql.Literal(f"({start},0)"))
+        if end >= pages:
+            # Open-ended so rows on pages added after planning are not lost
+            ranges.append(lower)
+        else:
+            ranges.append(sql.SQL("{} AND ctid < {}::tid").format(lower, sql.Literal(f"({end},0)")))
+    return ranges
+
+
+def plan_table_parts(cursor, table_name: str, parts: int) -> List[sql.Composable]:
+    """
+    Returns one WHERE clause per part, preferring integer primary key ranges
+    and falling back to ctid ranges. An empty list means the table is not split.
+    """
+    key_column = get_integer_primary_key(cursor, table_name)
+    if key_column:
+        ranges = plan_pk_ranges(cursor, table_name, key_column, parts)
+        logger.debug(f"Split {table_name} into {len(ranges)} parts on primary key {key_column}")
+    else:
+        ranges = plan_ctid_ranges(cursor, table_name, parts)
+        logger.debug(f"Split {table_name} into {len(ranges)} parts on ctid")
+
+    return ranges if len(ranges) > 1 else []
+
+
+def part_file_path(output_dir: str, table_name: str, part: int, extension: str = ".csv") -> str:
+    return os.path.join(output_dir, f"{table_name}.part{part:03d}{extension}")
+
+
+def concat_part_files(part_paths: List[str], file_path: str) -> str:
+    """
+    Concatenates part files into file_path in order and removes the parts.
+    Only the first part carries a CSV header, so a byte-level join is valid.
+    This also holds for compressed parts: concatenated gzip members and zstd
+    frames decompress as one stream.
+
+    The result is written to a temp file and renamed into place. Returns the
+    sha256 hex digest of the concatenated file.
+    """
+    digest = hashlib.sha256()
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as out:
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                for chunk in iter(lambda: part.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+    os.replace(tmp_path, file_path)
+
+    for part_path in part_paths:
+        os.remove(part_path)
+
+    return digest.hexdigest()
@@ -0,0 +1,129 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from psycopg import sql
+
+from ...utils.file_utils import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "export_state.json"
+XMIN = "xmin"
+
+
+def parse_watermarks(pairs: Optional[List[str]]) -> Dict[str, str]:
+    """
+    Parses `table=column` pairs from --watermark into a dict. Tables without
+    an entry fall back to xmin tracking.
+    """
+    watermarks = {}
+    for pair in pairs or []:
+        table_name, sep, column = pair.partition("=")
+        if not sep or not table_name or not column:
+            raise ValueError(f"Invalid --watermark '{pair}', expected table=column")
+        watermarks[table_name] = column
+    return watermarks
+
+
+class WatermarkState:
+    """
+    Remembers the last exported watermark per table between incremental runs.
+
+    A table's watermark only advances after its delta file was written
+    completely, so an interrupted run simply re-exports the same delta.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {"tables": {}}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+                self.data.setdefault("tables", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable watermark state {self.path}: {e}")
+
+    def get(self, table_name: str) -> Optional[Dict]:
+        return self.data["tables"].get(table_name)
+
+    def update(self, table_name: str, column: str, value):
+        with self.lock:
+            self.data["tables"][table_name] = {
+                "column": column,
+                "value": value,
+                "exported": datetime.now().isoformat(),
+            }
+            write_json_atomic(self.path, self.data)
+
+
+def plan_column_watermark(cursor, table_name: str, column: str, previous: Optional[Dict]):
+    """
+    Returns (filter, new_value) for a watermark column such as updated_at or a
+    serial id. Rows strictly above the previous watermark are exported.
+
+    The new value is read inside the export snapshot, so it matches exactly
+    the rows the COPY will see. Rows committed later with a lower value (e.g.
+    a long transaction stamping updated_at early) are not picked up; use xmin
+    tracking for tables where that matters.
+    """
+    cursor.execute(
+        sql.SQL("SELECT max({})::text FROM {}").format(sql.Identifier(column), sql.Identifier(table_name))
+    )
+    new_value = cursor.fetchone()[0]
+
+    if not previous or previous.get("column") != column or previous.get("value") is None:
+        return None, new_value
+
+    condition = sql.SQL("{} > {}").format(sql.Identifier(column), sql.Literal(previous["value"]))
+    # Nothing new: keep the old watermark rather than resetting it to NULL
+    return condition, new_value if new_value is not None else previous["value"]
+
+
+def plan_xmin_watermark(cursor, previous: Optional[Dict]):
+    """
+    Returns (filter, new_value) based on transaction ids, for tables without
+    a usable watermark column. Inserted and updated rows carry the id of the
+    writing transaction in xmin.
+
+    The stored value is the oldest transaction still running when the export
+    snapshot was taken (64-bit, epoch included). Every row written by a
+    transaction at or after it is exported next time, so in-flight writes
+    are never missed, at the cost of possibly repeating a few rows.
+
+    xmin is only 32 bits wide; if the xid epoch changed since the last run the
+    comparison is meaningless and the whole table is exported again.
+    """
+    cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot());")
+    new_value = cursor.fetchone()[0]
+
+    if not previous or previous.get("column") != XMIN or previous.get("value") is None:
+        return None, new_value
+
+    previous_value = int(previous["value"])
+    if previous_value >> 32 != new_value >> 32:
+        logger.warning("Transaction id epoch changed since the last export; exporting full table")
+        return None, new_value
+
+    condition = sql.SQL("xmin::text::bigint >= {}").format(sql.Literal(previous_value & 0xFFFFFFFF))
+    return condition, new_value
+
+
+def plan_watermark(cursor, table_name: str, column: Optional[str], state: WatermarkState):
+    """
+    Returns (filter, column, new_value) for an incremental export of a table.
+    A filter of None means there is no previous watermark and the full table
+    is exported as the baseline delta.
+    """
+    previous = state.get(table_name)
+    if column:
+        condition, new_value = plan_column_watermark(cursor, table_name, column, previous)
+        return condition, column, new_value
+
+    condition, new_value = plan_xmin_watermark(cursor, previous)
+    return condition, XMIN, new_value
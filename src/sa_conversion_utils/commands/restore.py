@@ -14,6 +14,23 @@ from rich.console import Console
 from rich.prompt import Confirm
 from rich.panel import Panel
 from rich.text import Text
+from rich.progress import (
+    Progress,
+    BarColumn,
+    DownloadColumn,
+    TextColumn,
+    TimeElapsedColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Internal
+from .backup_catalog import BackupCatalog, STRIPE_PATTERN, backup_set_key, to_sql_path
+from .restore_cache import RestoreCache, CACHE_DIR_NAME, GB, packed_suffix
+from .backup_store import BackupStore, MANIFEST_SUFFIX, STORE_DIR_NAME, resolve_store_dir
+from ..utils.compression import ARCHIVE_SUFFIXES
+from ..utils.sqlcmd import run_sqlcmd_with_progress
 
 # Global Constants
 logger = logging.getLogger(__name__)
@@ -33,12 +50,22 @@ DEFAULT_BACKUP_DIR = backup_dir_in_cwd if os.path.isdir(backup_dir_in_cwd) else
 def find_most_recent_backup(directory, search_term):
     """
     Searches for the most recent .bak file in the directory that contains the search_term.
+    Looks in the backup catalog first and only globs the directory if the catalog has no match.
+    The glob also finds archived backups (.bak.gz, .bak.zst, .bak.zip).
     """
     if not os.path.isdir(directory):
         return None
-    
-    # Get all .bak files
-    files = glob.glob(os.path.join(directory, "*.bak"))
+
+    try:
+        catalog = BackupCatalog(directory)
+        entry = catalog.find_latest(search_term)
+        if entry:
+            return catalog.file_paths(entry)[0]
+    except OSError as e:
+        logger.warning(f"Backup catalog unavailable, scanning {directory}: {e}")
+
+    # Get all .bak files, archived or not
+    files = [f for suffix in ("", *ARCHIVE_SUFFIXES) for f in glob.glob(os.path.join(directory, f"*.bak{suffix}"))]
     
     # Filter by search term (case-insensitive)
     matches = [f for f in files if search_term.lower() in os.path.basename(f).lower()]
@@ -46,15 +73,367 @@ def find_most_recent_backup(directory, search_term):
     if not matches:
         return None
     
-    # Return the file with the latest modification time
-    return max(matches, key=os.path.getmtime)
+    # Return the file with the latest modification time, preferring the
+    # plain .bak over its archive so nothing needs extracting
+    latest = max(matches, key=os.path.getmtime)
+    plain = latest[:len(latest) - len(packed_suffix(latest))]
+    return plain if os.path.isfile(plain) else latest
+
+
+def collect_stripe_set(backup_file):
+    """
+    Returns every file of the backup set that backup_file belongs to, in
+    stripe order. A striped backup (name_1of4.bak ... name_4of4.bak) needs all
+    of its stripes, which are looked for next to backup_file; sets spread over
+    several directories come from the catalog (catalog_stripe_set). A plain
+    .bak is returned on its own. Archived stripes (name_1of4.bak.zst, ...) are
+    expected to share the archive format of backup_file, and stored stripes
+    are looked up among the store's manifests.
+
+    Raises FileNotFoundError if a stripe is missing.
+    """
+    name = os.path.basename(backup_file)
+    suffix = packed_suffix(name)
+    match = STRIPE_PATTERN.match(name[:len(name) - len(suffix)])
+    if not match:
+        return [backup_file]
+
+    directory = os.path.dirname(backup_file)
+    count = int(match.group("count"))
+    stripes = [
+        os.path.join(directory, f"{match.group('base')}_{i}of{count}.bak{suffix}")
+        for i in range(1, count + 1)
+    ]
+    missing = [os.path.basename(path) for path in stripes if not os.path.isfile(path)]
+    if missing:
+        raise FileNotFoundError(f"Incomplete striped backup set, missing: {', '.join(missing)}")
+    return stripes
+
+
+def catalog_stripe_set(catalog: BackupCatalog, entry) -> list:
+    """
+    Returns the files of a catalogued backup set. Sets backed up to several
+    output directories are taken from the paths the catalog recorded; sets
+    in one directory go through collect_stripe_set, which also finds their
+    archived copies.
+
+    Raises FileNotFoundError if a stripe is missing.
+    """
+    paths = catalog.file_paths(entry)
+    if len({os.path.dirname(path) for path in paths}) == 1:
+        return collect_stripe_set(paths[0])
+    missing = [path for path in paths if not os.path.isfile(path)]
+    match = STRIPE_PATTERN.match(os.path.basename(paths[0]))
+    if match:
+        found = {os.path.basename(path) for path in paths}
+        missing += [
+            name for name in (f"{match.group('base')}_{i}of{match.group('count')}.bak" for i in range(1, int(match.group("count")) + 1))
+            if name not in found
+        ]
+    if missing:
+        raise FileNotFoundError(f"Incomplete striped backup set, missing: {', '.join(missing)}")
+    return paths
+
+
+def resolve_restore_chain(backup_file):
+    """
+    Returns the backup sets to restore in order, each as its list of stripe
+    files: just the selected backup for a full, or its base full followed by
+    the differential when the catalog knows it as a differential.
+
+    Raises FileNotFoundError if a stripe or a differential's base is missing.
+    """
+    # The store has no backup catalog; stored backups are restored on their own
+    if packed_suffix(backup_file) == MANIFEST_SUFFIX:
+        return [collect_stripe_set(backup_file)]
+
+    try:
+        catalog = BackupCatalog(os.path.dirname(backup_file))
+        catalog.ensure_current()
+    except OSError as e:
+        logger.warning(f"Backup catalog unavailable, restoring {backup_file} as a full backup: {e}")
+        return [collect_stripe_set(backup_file)]
+
+    key = backup_set_key(os.path.basename(backup_file))
+    if key not in catalog.backups:
+        return [collect_stripe_set(backup_file)]
+
+    return [
+        catalog_stripe_set(catalog, catalog.backups[chain_key])
+        for chain_key in catalog.restore_chain(key)
+    ]
+
+
+def run_sqlcmd(server, query):
+    """Runs a statement against master through sqlcmd, raising CalledProcessError on failure."""
+    subprocess.run([
+        "sqlcmd", "-S", server, "-Q",
+        query,
+        "-b", "-d", "master"
+    ], check=True, capture_output=True)
+
+
+def set_single_user(server, database):
+    """Kicks out other connections so the database can be overwritten."""
+    console.print(f"\n[bold blue]→[/bold blue] Setting [magenta]{database}[/magenta] to SINGLE_USER...")
+    run_sqlcmd(server, f"ALTER DATABASE [{database}] SET SINGLE_USER WITH ROLLBACK IMMEDIATE;")
+
+
+def set_multi_user(server, database):
+    console.print(f"[bold blue]→[/bold blue] Setting [magenta]{database}[/magenta] to MULTI_USER...")
+    run_sqlcmd(server, f"ALTER DATABASE [{database}] SET MULTI_USER;")
+
+
+def reset_multi_user(server, database):
+    """Cleanup after a failure: attempt to set back to multi-user so the database isn't stuck."""
+    subprocess.run(["sqlcmd", "-S", server, "-Q", f"ALTER DATABASE [{database}] SET MULTI_USER;"], capture_output=True)
+
+
+def format_sqlcmd_error(e: subprocess.CalledProcessError, limit: int = 10) -> str:
+    """Returns the output of a failed sqlcmd call, truncated to a reasonable length."""
+    # sqlcmd_rows/sqlcmd_query run in text mode, run_sqlcmd captures bytes
+    raw_output = "".join(
+        output.decode(errors="replace") if isinstance(output, bytes) else output
+        for output in (e.stdout or b'', e.stderr or b'')
+    )
+    lines = [line.strip() for line in raw_output.split('\n') if line.strip()]
+
+    if len(lines) > limit:
+        truncated = lines[:4] + ["... [output truncated] ..."] + lines[-4:]
+        return "\n".join(truncated)
+    return "\n".join(lines)
+
+
+def find_backup(args: argparse.Namespace, search_pattern):
+    """
+    Finds the most recent backup matching search_pattern in the backup
+    directory, then among the backups in the deduplicated store.
+    """
+    backup_file = find_most_recent_backup(args.backup_dir, search_pattern)
+    store_dir = resolve_store_dir(args)
+    if not backup_file and os.path.isdir(store_dir):
+        backup_file = BackupStore(store_dir).find_latest(search_pattern)
+    return backup_file
+
+
+def make_restore_cache(args: argparse.Namespace) -> RestoreCache:
+    """Archives are restored from their extracted copy in the restore cache."""
+    return RestoreCache(
+        args.cache_dir or os.path.join(args.backup_dir, CACHE_DIR_NAME),
+        max_bytes=int(args.cache_max_gb * GB),
+        max_age_days=args.cache_max_age_days,
+    )
+
+
+def plan_restore(backup_file, backup_dir, cache: RestoreCache) -> dict:
+    """
+    Works out what restoring backup_file involves: the backup sets in order
+    (stripes, and a differential's base full), the local files SQL Server
+    will read (archives replaced by their cache copy) and the paths as SQL
+    Server sees them.
+
+    Raises FileNotFoundError if a stripe or a differential's base is missing.
+    """
+    # Striped backups are restored from all of their files at once, and a
+    # differential is restored on top of its base full backup
+    chain = resolve_restore_chain(backup_file)
+    restore_chain = [
+        [cache.target_path(path) if packed_suffix(path) else path for path in backup_files]
+        for backup_files in chain
+    ]
+    return {
+        "chain": chain,
+        "restore_chain": restore_chain,
+        # Handle path translation if SQL Server sees the drive/folder differently
+        "sql_chain": [[to_sql_path(path, backup_dir) for path in backup_files] for backup_files in restore_chain],
+        "sources": [
+            os.path.basename(files[0]) if len(files) == 1 else f"{len(files)} stripes of {os.path.basename(files[0])}"
+            for files in chain
+        ],
+    }
+
+
+def packed_files(plan: dict) -> set:
+    """The archived or stored files of a plan, which must be extracted into the cache."""
+    return {os.path.abspath(path) for backup_files in plan["chain"] for path in backup_files if packed_suffix(path)}
+
+
+def extract_archives(plan: dict, cache: RestoreCache, pinned=None):
+    """
+    Extracts archived (or reassembles stored) backup files of a plan into
+    the cache, before any database is taken offline. The files of the plan,
+    and any `pinned` ones (those of other restores in the same batch), are
+    kept when the cache evicts to make room.
+    """
+    pinned = packed_files(plan) | set(pinned or ())
+    for backup_files in plan["chain"]:
+        for path in backup_files:
+            if packed_suffix(path):
+                cache.extract(path, pinned=pinned)
+
+
+def execute_restore(server, database, plan: dict, progress=None) -> bool:
+    """
+    Runs a planned restore: SINGLE_USER, the restore chain, MULTI_USER. On
+    failure the database is set back to MULTI_USER and False is returned.
+    Pass a shared rich Progress to run several restores side by side.
+    """
+    out = progress.console if progress else console
+    chain = plan["restore_chain"]
+    try:
+        # 1. Single User Mode
+        set_single_user(server, database)
+
+        # 2. Restore, with progress driven by the STATS messages. Every set but
+        # the last is restored WITH NORECOVERY so the next one can be applied.
+        for i, (backup_files, sql_paths) in enumerate(zip(chain, plan["sql_chain"])):
+            last = i == len(chain) - 1
+            out.print(f"[bold blue]→[/bold blue] Restoring [magenta]{database}[/magenta] from [cyan]{plan['sources'][i]}[/cyan]...")
+            disks = ", ".join(f"DISK='{path}'" for path in sql_paths)
+            options = ("REPLACE, " if i == 0 else "") + ("RECOVERY" if last else "NORECOVERY")
+            run_sqlcmd_with_progress(
+                server,
+                f"RESTORE DATABASE [{database}] FROM {disks} WITH {options}, STATS = 10;",
+                f"Restoring {database}",
+                command="RESTORE",
+                database=database,
+                total_bytes=sum(os.path.getsize(path) for path in backup_files),
+                progress=progress,
+            )
+
+        # 3. Multi User Mode
+        set_multi_user(server, database)
+
+        out.print(f"\n[bold green]SUCCESS:[/bold green] {database} has been restored.")
+        return True
+
+    except subprocess.CalledProcessError as e:
+        # Limit error output to be reasonable
+        out.print(f"\n[bold red]RESTORE FAILED: {database}[/bold red]\n{format_sqlcmd_error(e)}")
+        if len(chain) > 1:
+            out.print(f"[yellow]{database} may be left RESTORING; restore again or run RESTORE DATABASE [{database}] WITH RECOVERY.[/yellow]")
+
+        # Cleanup: Attempt to set back to multi-user so DB isn't stuck
+        reset_multi_user(server, database)
+        return False
+    finally:
+        logger.info(f"Restore operation finished for {database}")
+
+
+def confirmation_text(server, database, plan: dict) -> Text:
+    text = Text.assemble(
+        ("Target: ", "bold"), (f"{server}.{database}\n", "magenta"),
+        ("Source: ", "bold"), (" + ".join(plan["sources"]), "cyan")
+    )
+    if SQL_REMOTE_PATH_PREFIX:
+        text.append("\nSQL-Engine Path: ", style="bold")
+        text.append(", ".join(path for sql_paths in plan["sql_chain"] for path in sql_paths), style="dim")
+    return text
+
+
+def parse_restore_targets(patterns):
+    """Parses 'database=pattern' arguments into (database, pattern) pairs."""
+    targets = []
+    for item in patterns:
+        database, sep, pattern = item.partition("=")
+        if not sep or not database or not pattern:
+            raise ValueError(f"Invalid restore target '{item}', expected database=pattern")
+        targets.append((database, pattern))
+    return targets
+
+
+def restore_many(args: argparse.Namespace, targets):
+    """
+    Restores several databases concurrently, e.g.
+    'sami restore Source=src_clean SA=sa_base Staging=stage -j 2'.
+    Each database goes through the single-database flow; a failure only
+    rolls back (to MULTI_USER) that database.
+    """
+    server = args.server
+    cache = make_restore_cache(args)
+
+    plans = {}
+    for database, pattern in targets:
+        backup_file = find_backup(args, pattern)
+        if not backup_file:
+            console.print(f"[red]Restore cancelled: no match for '{pattern}' in {args.backup_dir}[/red]")
+            return
+        try:
+            plans[database] = plan_restore(os.path.abspath(backup_file), args.backup_dir, cache)
+        except FileNotFoundError as e:
+            console.print(f"[red]Restore cancelled: {e}[/red]")
+            return
+
+    for database, plan in plans.items():
+        console.print(Panel(confirmation_text(server, database, plan), title="[bold yellow]Confirm Restore[/bold yellow]", expand=False))
+
+    if not args.yes and not Confirm.ask(f"[bold red]Overwrite {len(plans)} databases?[/bold red]"):
+        console.print("[yellow]Operation aborted by user.[/yellow]")
+        return
+
+    # The cache is not shared between threads, so extract everything up front,
+    # keeping every file of the batch until all of them are extracted
+    pinned = set().union(*(packed_files(plan) for plan in plans.values()))
+    try:
+        for plan in plans.values():
+            extract_archives(plan, cache, pinned)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Restore cancelled: could not extract archive: {e}[/red]")
+        logger.error(f"Archive extraction failed: {e}")
+        return
+
+    with Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeElapsedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+    ) as progress:
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {
+                executor.submit(execute_restore, server, database, plan, progress): database
+                for database, plan in plans.items()
+            }
+            results = {}
+            for future in as_completed(futures):
+                database = futures[future]
+                try:
+                    results[database] = future.result()
+                except Exception as e:
+                    # execute_restore only handles sqlcmd failures; anything else must not abort the batch
+                    progress.console.print(f"[bold red]RESTORE FAILED: {database}[/bold red]\n{e}")
+                    logger.error(f"Restore of {database} failed: {e}")
+                    reset_multi_user(server, database)
+                    results[database] = False
+
+    failed = [database for database, ok in results.items() if not ok]
+    if failed:
+        console.print(f"[bold red]{len(failed)} of {len(results)} restores failed:[/bold red] {', '.join(failed)}")
+    else:
+        console.print(f"[bold green]All {len(results)} databases restored.[/bold green]")
 
 
 def restore(args: argparse.Namespace):
     server = args.server
     database = args.database
     backup_dir = args.backup_dir
-    search_pattern = args.pattern
+    patterns = args.pattern or []
+
+    # Several 'database=pattern' targets are restored concurrently
+    if any("=" in pattern for pattern in patterns):
+        if not server:
+            console.print("[red]Error: Server must be specified.[/red]")
+            return
+        try:
+            targets = parse_restore_targets(patterns)
+        except ValueError as e:
+            console.print(f"[red]Error: {e}[/red]")
+            return
+        return restore_many(args, targets)
+
+    search_pattern = patterns[0] if patterns else None
 
     if not server or not database:
         logger.error("Missing Server or Database arguments")
@@ -65,7 +444,7 @@ def restore(args: argparse.Namespace):
 
     # 1. Try to find file by pattern if provided (e.g., 'sami restore imp')
     if search_pattern:
-        backup_file = find_most_recent_backup(backup_dir, search_pattern)
+        backup_file = find_backup(args, search_pattern)
         if not backup_file:
             console.print(f"[yellow]No match for '{search_pattern}' in {backup_dir}. Opening file selector...[/yellow]")
 
@@ -76,7 +455,10 @@ def restore(args: argparse.Namespace):
         root.wm_attributes("-topmost", 1)
         backup_file = filedialog.askopenfilename(
             title="Select Backup File",
-            filetypes=[("SQL Backup files", "*.bak")],
+            filetypes=[
+                ("SQL Backup files", "*.bak"),
+                ("Archived SQL Backup files", " ".join(f"*.bak{suffix}" for suffix in ARCHIVE_SUFFIXES)),
+            ],
             initialdir=backup_dir,
         )
 
@@ -88,73 +470,30 @@ def restore(args: argparse.Namespace):
     # prefixing its own default backup path (e.g., E:\SADB\...)
     backup_file = os.path.abspath(backup_file)
 
-    # Handle path translation if SQL Server sees the drive/folder differently
-    sql_path = backup_file
-    if SQL_REMOTE_PATH_PREFIX:
-        filename = os.path.basename(backup_file)
-        sql_path = os.path.join(SQL_REMOTE_PATH_PREFIX, filename)
+    cache = make_restore_cache(args)
+    try:
+        plan = plan_restore(backup_file, backup_dir, cache)
+    except FileNotFoundError as e:
+        console.print(f"[red]Restore cancelled: {e}[/red]")
+        return
 
     # Prettier, Succinct Confirmation UI
-    confirmation_text = Text.assemble(
-        ("Target: ", "bold"), (f"{server}.{database}\n", "magenta"),
-        ("Source: ", "bold"), (f"{os.path.basename(backup_file)}", "cyan")
-    )
-    
-    if SQL_REMOTE_PATH_PREFIX:
-        confirmation_text.append("\nSQL-Engine Path: ", style="bold")
-        confirmation_text.append(f"{sql_path}", style="dim")
-
-    console.print(Panel(confirmation_text, title="[bold yellow]Confirm Restore[/bold yellow]", expand=False))
+    console.print(Panel(confirmation_text(server, database, plan), title="[bold yellow]Confirm Restore[/bold yellow]", expand=False))
 
-    if not Confirm.ask("[bold red]Proceed with overwrite?[/bold red]"):
+    if not args.yes and not Confirm.ask("[bold red]Proceed with overwrite?[/bold red]"):
         console.print("[yellow]Operation aborted by user.[/yellow]")
         return
 
-    # Execution phase
+    # Extract archives before the database is taken offline
     try:
-        # 1. Single User Mode
-        console.print(f"\n[bold blue]→[/bold blue] Setting [magenta]{database}[/magenta] to SINGLE_USER...")
-        subprocess.run([
-            "sqlcmd", "-S", server, "-Q", 
-            f"ALTER DATABASE [{database}] SET SINGLE_USER WITH ROLLBACK IMMEDIATE;",
-            "-b", "-d", "master"
-        ], check=True, capture_output=True)
-
-        # 2. Restore
-        console.print(f"[bold blue]→[/bold blue] Restoring from [cyan]{os.path.basename(backup_file)}[/cyan]...")
-        subprocess.run([
-            "sqlcmd", "-S", server, "-Q", 
-            f"RESTORE DATABASE [{database}] FROM DISK='{sql_path}' WITH REPLACE, RECOVERY;",
-            "-b", "-d", "master"
-        ], check=True, capture_output=True)
-
-        # 3. Multi User Mode
-        console.print(f"[bold blue]→[/bold blue] Setting [magenta]{database}[/magenta] to MULTI_USER...")
-        subprocess.run([
-            "sqlcmd", "-S", server, "-Q", 
-            f"ALTER DATABASE [{database}] SET MULTI_USER;",
-            "-b", "-d", "master"
-        ], check=True, capture_output=True)
-
-        console.print(f"\n[bold green]SUCCESS:[/bold green] {database} has been restored.")
+        extract_archives(plan, cache)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Restore cancelled: could not extract archive: {e}[/red]")
+        logger.error(f"Archive extraction failed: {e}")
+        return
 
-    except subprocess.CalledProcessError as e:
-        # Limit error output to be reasonable
-        raw_output = (e.stdout or b'').decode() + (e.stderr or b'').decode()
-        lines = [line.strip() for line in raw_output.split('\n') if line.strip()]
-        
-        if len(lines) > 10:
-            truncated = lines[:4] + ["... [output truncated] ..."] + lines[-4:]
-            output = "\n".join(truncated)
-        else:
-            output = "\n".join(lines)
-
-        console.print(f"\n[bold red]RESTORE FAILED[/bold red]\n{output}")
-        
-        # Cleanup: Attempt to set back to multi-user so DB isn't stuck
-        subprocess.run(["sqlcmd", "-S", server, "-Q", f"ALTER DATABASE [{database}] SET MULTI_USER;"], capture_output=True)
-    finally:
-        logger.info(f"Restore operation finished for {database}")
+    # Execution phase
+    execute_restore(server, database, plan)
 
 
 def setup_parser(subparsers):
@@ -163,11 +502,12 @@ def setup_parser(subparsers):
     """
     restore_parser = subparsers.add_parser("restore", help="Restore a database from a backup file.")
     
-    # Positional argument for pattern matching: 'sami restore imp'
+    # Positional argument for pattern matching: 'sami restore imp',
+    # or several databases at once: 'sami restore Source=src SA=sa_base'
     restore_parser.add_argument(
         "pattern",
-        nargs="?",
-        help="Search pattern to find a backup file (e.g., 'imp')"
+        nargs="*",
+        help="Search pattern to find a backup file (e.g., 'imp'), or database=pattern pairs to restore several databases concurrently"
     )
     
     restore_parser.add_argument(
@@ -186,4 +526,37 @@ def setup_parser(subparsers):
         default=DEFAULT_BACKUP_DIR,
         help="Directory where backup files are stored",
     )
+    restore_parser.add_argument(
+        "--store-dir",
+        help=f"Deduplicated backup store searched when no backup file matches (default: <backup-dir>/{STORE_DIR_NAME})",
+    )
+    restore_parser.add_argument(
+        "--cache-dir",
+        help=f"Where archived backups are extracted; must be visible to SQL Server (default: <backup-dir>/{CACHE_DIR_NAME})",
+    )
+    restore_parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=100,
+        help="Evict least recently used extracted backups beyond this total size (default: 100)",
+    )
+    restore_parser.add_argument(
+        "--cache-max-age-days",
+        type=float,
+        default=7,
+        help="Evict extracted backups unused for this many days (default: 7)",
+    )
+    restore_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=2,
+        help="Databases restored concurrently with database=pattern targets (default: 2)",
+    )
+    restore_parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="Skip confirmation prompt",
+    )
     restore_parser.set_defaults(func=restore)
\ No newline at end of file
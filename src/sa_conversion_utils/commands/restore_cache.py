@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Iterable
+
+from rich.console import Console
+from rich.progress import Progress, BarColumn, DownloadColumn, TextColumn, TimeRemainingColumn, TransferSpeedColumn
+
+from ..utils.file_utils import write_json_atomic
+from .backup_store import MANIFEST_SUFFIX, load_manifest, reassemble
+from ..utils.compression import archive_suffix, decompress_file
+
+logger = logging.getLogger(__name__)
+console = Console()
+
+CACHE_DIR_NAME = ".restore_cache"
+CACHE_INDEX_FILE = "cache_index.json"
+GB = 1024 ** 3
+
+
+def packed_suffix(path: str) -> str:
+    """
+    Returns the suffix marking a backup that must be unpacked before SQL
+    Server can read it: an archive suffix, or the manifest suffix of a
+    backup in the deduplicated store. '' for a plain .bak.
+    """
+    if path.lower().endswith(MANIFEST_SUFFIX):
+        return path[-len(MANIFEST_SUFFIX):]
+    return archive_suffix(path)
+
+
+class RestoreCache:
+    """
+    Holds .bak files extracted from archives (.bak.gz, .bak.zst, .bak.zip)
+    or reassembled from the backup store so SQL Server can restore them, and
+    so repeated restores from the same source skip decompression.
+
+    The cache directory must be visible to SQL Server (by default it sits in
+    the backup directory). Entries are keyed by archive path and reused while
+    the archive's size and mtime are unchanged. After each extraction,
+    entries unused for longer than max_age_days are dropped, then the least
+    recently used ones until the cache fits in max_bytes. Archives pinned by
+    the caller (every file of the restores being prepared) are never
+    evicted, even if that leaves the cache over max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 100 * GB, max_age_days: float = 7):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.index_path = os.path.join(self.cache_dir, CACHE_INDEX_FILE)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.data = {"files": {}}
+
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+                self.data.setdefault("files", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable restore cache index {self.index_path}: {e}")
+
+    @property
+    def files(self) -> Dict[str, Dict]:
+        return self.data["files"]
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_json_atomic(self.index_path, self.data)
+
+    def target_path(self, archive_path: str) -> str:
+        """Path the archive is extracted to: its name without the archive suffix, e.g. x.bak.zst -> x.bak."""
+        name = os.path.basename(archive_path)
+        return os.path.join(self.cache_dir, name[:len(name) - len(packed_suffix(name))])
+
+    def is_cached(self, archive_path: str) -> bool:
+        entry = self.files.get(os.path.abspath(archive_path))
+        if not entry:
+            return False
+        stat = os.stat(archive_path)
+        target = self.target_path(archive_path)
+        return (
+            entry["source_size"] == stat.st_size
+            and entry["source_mtime"] == stat.st_mtime
+            and os.path.isfile(target)
+            and os.path.getsize(target) == entry["size"]
+        )
+
+    def extract(self, archive_path: str, pinned: Iterable[str] = ()) -> str:
+        """
+        Returns the path of the extracted .bak, decompressing the archive (or
+        reassembling a store manifest) unless a current copy is cached.
+
+        `pinned` are the other archives the same restore (or batch of
+        restores) needs; their extracted copies are kept when evicting.
+        """
+        archive_path = os.path.abspath(archive_path)
+        target = self.target_path(archive_path)
+
+        if self.is_cached(archive_path):
+            console.print(f"[bold blue]→[/bold blue] Using cached [cyan]{os.path.basename(target)}[/cyan]")
+            logger.info(f"Restore cache hit: {archive_path}")
+        else:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            stat = os.stat(archive_path)
+            # Another archive of the same name extracted to this target is overwritten
+            for other in [k for k, e in self.files.items() if e["target"] == os.path.basename(target)]:
+                del self.files[other]
+            with Progress(
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                DownloadColumn(),
+                TransferSpeedColumn(),
+                TimeRemainingColumn(),
+                console=console,
+            ) as progress:
+                # Archives report progress in archive bytes, the store in reassembled bytes
+                if archive_path.lower().endswith(MANIFEST_SUFFIX):
+                    task = progress.add_task(f"Reassembling {os.path.basename(target)}", total=load_manifest(archive_path)["size"])
+                    reassemble(archive_path, target, on_bytes=lambda n: progress.advance(task, n))
+                else:
+                    task = progress.add_task(f"Extracting {os.path.basename(archive_path)}", total=stat.st_size)
+                    decompress_file(archive_path, target, on_bytes=lambda n: progress.advance(task, n))
+            logger.info(f"Extracted {archive_path} to {target}")
+            self.files[archive_path] = {
+                "target": os.path.basename(target),
+                "source_size": stat.st_size,
+                "source_mtime": stat.st_mtime,
+                "size": os.path.getsize(target),
+                "extracted": datetime.now().isoformat(),
+            }
+
+        self.files[archive_path]["last_used"] = time.time()
+        self.evict(keep={archive_path, *(os.path.abspath(path) for path in pinned)})
+        self.save()
+        return target
+
+    def remove(self, archive_path: str):
+        entry = self.files.pop(archive_path)
+        target = os.path.join(self.cache_dir, entry["target"])
+        if os.path.exists(target):
+            os.remove(target)
+        logger.info(f"Evicted {target} from the restore cache")
+
+    def evict(self, keep: Iterable[str] = ()):
+        """
+        Drops entries past max_age_days, then least recently used entries
+        until the cache fits in max_bytes. Entries of the archives in `keep`
+        are never dropped.
+        """
+        keep = set(keep)
+        cutoff = time.time() - self.max_age_days * 86400
+        for archive_path, entry in list(self.files.items()):
+            if archive_path not in keep and entry.get("last_used", 0) < cutoff:
+                self.remove(archive_path)
+
+        total = sum(entry["size"] for entry in self.files.values())
+        for archive_path, entry in sorted(self.files.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if archive_path not in keep:
+                total -= entry["size"]
+                self.remove(archive_path)
+        if total > self.max_bytes:
+            logger.warning(
+                f"Restore cache holds {total / GB:.1f} GB, over its {self.max_bytes / GB:.1f} GB limit, "
+                f"to keep the files of the current restore"
+            )
@@ -1,36 +1,122 @@
 import os
 import json
+import time
 import logging
 import argparse
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional
 from datetime import datetime
 
 from rich.console import Console
 from rich.prompt import Confirm
 from rich.tree import Tree
+from ...utils.file_utils import write_json_atomic
 from ...logging.logger_config import logger_config
 
 console = Console()
 logger = logger_config(name='scan', log_file="scan.log", level=logging.INFO, rich_console=console)
 
-def discover_sql_scripts(root_dir: str) -> Dict:
+WORKFLOWS_FILE = "workflows.json"
+
+# Directories never holding workflow scripts; hidden directories (.git,
+# .venv, .map_cache, ...) are skipped as well
+PRUNED_DIRS = {"venv", "env", "__pycache__", "node_modules", "backups", "logs"}
+
+# Directory mtimes this recent are not trusted: an entry added in the same
+# clock tick as the scan would not change them (coarse on FAT and some shares)
+RACY_SECONDS = 2
+
+
+def is_pruned(name: str, pruned: Iterable[str]) -> bool:
+    return name.startswith(".") or name.lower() in pruned
+
+
+def scan_directories(root_dir: str, index: Dict, pruned: Iterable[str] = PRUNED_DIRS) -> Dict[str, int]:
+    """
+    Walks root_dir with os.scandir, skipping pruned directories, and returns
+    the number of .sql files per directory (relative path, '' for the root).
+
+    `index` is the directory index of the previous scan, updated in place:
+    each directory's mtime, script count and subdirectories. A directory's
+    mtime changes whenever an entry is added, removed or renamed in it, so a
+    directory whose mtime is unchanged is not listed again; its entry is
+    reused and only its subdirectories are visited. An unchanged tree costs
+    one stat per directory.
+    """
+    root_dir = os.path.abspath(root_dir)
+    pruned = sorted(name.lower() for name in pruned)
+    previous = index.get("dirs", {}) if index.get("root") == root_dir and index.get("pruned") == pruned else {}
+
+    dirs = {}
+    listed = 0
+    now = time.time()
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        path = os.path.join(root_dir, relative) if relative else root_dir
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+
+        entry = previous.get(relative)
+        if not entry or entry["mtime"] != mtime:
+            scripts, subdirs = 0, []
+            try:
+                with os.scandir(path) as entries:
+                    for item in entries:
+                        try:
+                            if item.is_dir(follow_symlinks=False):
+                                if not is_pruned(item.name, pruned):
+                                    subdirs.append(item.name)
+                            elif item.name.lower().endswith(".sql") and item.is_file():
+                                scripts += 1
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.warning(f"Skipping {path}: {e}")
+                continue
+            listed += 1
+            entry = {"scripts": scripts, "subdirs": sorted(subdirs)}
+
+        racy = now - mtime / 1e9 < RACY_SECONDS
+        dirs[relative] = {"mtime": None if racy else mtime, "scripts": entry["scripts"], "subdirs": entry["subdirs"]}
+        pending.extend(f"{relative}/{name}" if relative else name for name in reversed(entry["subdirs"]))
+
+    logger.info(f"Listed {listed} of {len(dirs)} directories, the others are unchanged since the last scan")
+    index.clear()
+    index.update({"root": root_dir, "pruned": pruned, "dirs": dirs})
+    return {relative: entry["scripts"] for relative, entry in dirs.items() if entry["scripts"]}
+
+
+def load_index(workflows_file: str = WORKFLOWS_FILE) -> Dict:
+    """Returns the directory index saved in workflows.json, or an empty one."""
+    try:
+        with open(workflows_file, 'r') as f:
+            return json.load(f).get("index") or {}
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return {}
+
+
+def discover_sql_scripts(root_dir: str, index: Optional[Dict] = None, pruned: Iterable[str] = PRUNED_DIRS) -> Dict:
     """
     Recursively scan directory for SQL scripts and build workflow structure.
     Groups scripts by directory structure and stores the script count at the 
     most specific directory level.
+
+    Pass the index of the previous scan (see scan_directories) to only list
+    directories that changed since; it is updated in place.
     """
     workflows: Dict[str, Any] = {}
     root_path = Path(root_dir)
 
-    # Find all SQL files and count them per directory path
-    dir_counts: Dict[Path, int] = {}
-    folders_with_sql = set()
-    
-    for sql_file in root_path.rglob('*.sql'):
-        dir_path = sql_file.parent
-        dir_counts[dir_path] = dir_counts.get(dir_path, 0) + 1
-        folders_with_sql.add(dir_path)
+    # Count SQL files per directory path
+    dir_counts: Dict[Path, int] = {
+        root_path / relative: count
+        for relative, count in scan_directories(root_dir, {} if index is None else index, pruned).items()
+    }
+    folders_with_sql = set(dir_counts)
     
     if not dir_counts:
         return workflows
@@ -70,9 +156,10 @@ def discover_sql_scripts(root_dir: str) -> Dict:
     return workflows
 
 
-def save_workflows(workflows: Dict, output_file: str):
+def save_workflows(workflows: Dict, output_file: str, index: Optional[Dict] = None):
     """
-    Save discovered workflows to JSON file.
+    Save discovered workflows to JSON file, with the directory index the
+    next scan starts from.
     """
     workflow_data = {
         "workflows": {
@@ -81,14 +168,14 @@ def save_workflows(workflows: Dict, output_file: str):
                 "path": os.getcwd()
             },
             "structure": workflows
-        }
+        },
+        "index": index or {}
     }
 
     if os.path.dirname(output_file):
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
-    with open(output_file, 'w') as f:
-        json.dump(workflow_data, f, indent=2)
+    write_json_atomic(output_file, workflow_data)
     
     logger.info(f"Workflows saved to [bold green]{output_file}[/bold green]")
 
@@ -128,8 +215,10 @@ def scan(args):
     """
     logger.info("Starting directory scan...")
     
-    # Discover SQL scripts and their organization
-    workflows = discover_sql_scripts(os.getcwd())
+    # Discover SQL scripts and their organization, listing only directories changed since the last scan
+    index = {} if getattr(args, "rescan", False) else load_index(WORKFLOWS_FILE)
+    pruned = PRUNED_DIRS | {name.lower() for name in getattr(args, "exclude", None) or []}
+    workflows = discover_sql_scripts(os.getcwd(), index, pruned)
     
     if not workflows:
         logger.warning("No SQL scripts found in the current directory structure")
@@ -166,7 +255,7 @@ def scan(args):
     console.print("\n" + "="*50 + "\n")
 
     if Confirm.ask("[bold]✅ Structure Discovery Complete. Save discovered structure?[/bold]"):
-        save_workflows(workflows, "workflows.json")
+        save_workflows(workflows, WORKFLOWS_FILE, index)
         logger.info("Directory scan complete")
         
     else:
@@ -179,6 +268,17 @@ def setup_parser(subparsers):
         "scan",
         help="Scan directory structure and create workflows.json"
     )
+    scan_parser.add_argument(
+        "--rescan",
+        action="store_true",
+        help="List every directory instead of only those changed since the last scan."
+    )
+    scan_parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="",
+        help=f"Directory name to skip, in addition to hidden directories and {', '.join(sorted(PRUNED_DIRS))}. Repeatable."
+    )
     scan_parser.set_defaults(func=scan)
 
 
@@ -0,0 +1,223 @@
+import os
+import re
+import ntpath
+import posixpath
+import argparse
+import logging
+import subprocess
+from datetime import datetime
+from dotenv import load_dotenv
+
+from rich.console import Console
+from rich.prompt import Confirm
+from rich.table import Table
+
+from .restore import run_sqlcmd, set_single_user, set_multi_user, reset_multi_user, format_sqlcmd_error
+from ..utils.sqlcmd import sqlcmd_rows
+
+logger = logging.getLogger(__name__)
+console = Console()
+
+load_dotenv(dotenv_path=os.path.join(os.getcwd(), ".env"))
+DEFUALT_SERVER = os.getenv("SERVER")
+DEFAULT_DB = os.getenv("TARGET_DB")
+
+
+def snapshot_name(database: str, name: str = None) -> str:
+    """Snapshots are named <database>_snap_<name>, with a timestamp when no name is given."""
+    name = re.sub(r'[^A-Za-z0-9_-]+', '_', name) if name else datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{database}_snap_{name}"
+
+
+def list_snapshots(server: str, database: str) -> list:
+    """Returns the snapshots of a database as dicts with name and create_date, newest first."""
+    return sqlcmd_rows(
+        server,
+        f"SELECT name, create_date FROM sys.databases "
+        f"WHERE source_database_id = DB_ID(N'{database}') ORDER BY create_date DESC;",
+    )
+
+
+def fetch_snapshots(server: str, database: str):
+    """list_snapshots for the commands: prints the sqlcmd error and returns None if the query fails."""
+    try:
+        return list_snapshots(server, database)
+    except subprocess.CalledProcessError as e:
+        console.print(f"[bold red]Could not list snapshots of {database}[/bold red]\n{format_sqlcmd_error(e)}")
+        logger.error(f"Failed to list snapshots of {database} on {server}")
+        return None
+
+
+def snapshot_file_specs(server: str, database: str, snapshot: str) -> str:
+    """
+    Builds the ON (...) clause of CREATE DATABASE ... AS SNAPSHOT OF: one
+    sparse file per data file, next to the original and named after the
+    snapshot. Paths are the server's, so Windows and Linux separators are both handled.
+    """
+    files = sqlcmd_rows(
+        server,
+        f"SELECT name, physical_name FROM sys.master_files "
+        f"WHERE database_id = DB_ID(N'{database}') AND type = 0;",
+    )
+    if not files:
+        raise ValueError(f"Database {database} not found on {server}")
+
+    specs = []
+    for file in files:
+        path = ntpath if "\\" in file["physical_name"] else posixpath
+        sparse_file = path.join(path.dirname(file["physical_name"]), f"{snapshot}_{file['name']}.ss")
+        specs.append(f"(NAME = [{file['name']}], FILENAME = N'{sparse_file}')")
+    return ", ".join(specs)
+
+
+def has_target(args: argparse.Namespace) -> bool:
+    """Checks that a server and database were given (flags or .env) before any sqlcmd call."""
+    if not args.server or not args.database:
+        console.print("[red]Error: Server and Database must be specified.[/red]")
+        logger.error("Missing SQL Server or database argument")
+        return False
+    return True
+
+
+def create_snapshot(args: argparse.Namespace):
+    if not has_target(args):
+        return
+    snapshot = snapshot_name(args.database, args.name)
+    try:
+        file_specs = snapshot_file_specs(args.server, args.database, snapshot)
+        with console.status(f"Creating snapshot {snapshot}..."):
+            run_sqlcmd(args.server, f"CREATE DATABASE [{snapshot}] ON {file_specs} AS SNAPSHOT OF [{args.database}];")
+        console.print(f"[green]Snapshot created: {snapshot}")
+        logger.info(f"Created snapshot {snapshot} of {args.database}")
+    except subprocess.CalledProcessError as e:
+        console.print(f"[bold red]SNAPSHOT FAILED[/bold red]\n{format_sqlcmd_error(e)}")
+        logger.error(f"Failed to create snapshot {snapshot}")
+    except ValueError as e:
+        console.print(f"[red]{e}")
+
+
+def show_snapshots(args: argparse.Namespace):
+    if not has_target(args):
+        return
+    snapshots = fetch_snapshots(args.server, args.database)
+    if snapshots is None:
+        return
+    if not snapshots:
+        console.print(f"[yellow]No snapshots of {args.database}.")
+        return
+
+    table = Table(title=f"Snapshots of {args.server}.{args.database}")
+    table.add_column("Snapshot", style="cyan")
+    table.add_column("Created")
+    for snapshot in snapshots:
+        table.add_row(snapshot["name"], snapshot["create_date"])
+    console.print(table)
+
+
+def drop_snapshot(args: argparse.Namespace):
+    if not has_target(args):
+        return
+    snapshots = fetch_snapshots(args.server, args.database)
+    if snapshots is None:
+        return
+    names = [s["name"] for s in snapshots]
+    if args.snapshot not in names:
+        console.print(f"[red]{args.snapshot} is not a snapshot of {args.database}.")
+        return
+    if not args.yes and not Confirm.ask(f"Drop snapshot {args.snapshot}?"):
+        return
+    try:
+        run_sqlcmd(args.server, f"DROP DATABASE [{args.snapshot}];")
+        console.print(f"[green]Dropped snapshot {args.snapshot}")
+        logger.info(f"Dropped snapshot {args.snapshot}")
+    except subprocess.CalledProcessError as e:
+        console.print(f"[bold red]DROP FAILED[/bold red]\n{format_sqlcmd_error(e)}")
+
+
+def revert_snapshot(args: argparse.Namespace):
+    """
+    Reverts the database to a snapshot (the newest one by default). Only the
+    pages changed since the snapshot are copied back, so this takes seconds
+    where a full restore takes minutes.
+
+    SQL Server refuses to revert while other snapshots of the database exist;
+    --drop-others drops them first.
+    """
+    if not has_target(args):
+        return
+    server, database = args.server, args.database
+    snapshots = fetch_snapshots(server, database)
+    if snapshots is None:
+        return
+    snapshots = [s["name"] for s in snapshots]
+    if not snapshots:
+        console.print(f"[red]No snapshots of {database} to revert to.")
+        return
+
+    snapshot = args.snapshot or snapshots[0]
+    if snapshot not in snapshots:
+        console.print(f"[red]{snapshot} is not a snapshot of {database}.")
+        return
+
+    others = [name for name in snapshots if name != snapshot]
+    if others and not args.drop_others:
+        console.print(f"[red]Other snapshots of {database} exist ({', '.join(others)}). Drop them or pass --drop-others.")
+        return
+
+    if not args.yes and not Confirm.ask(f"[bold red]Revert {server}.{database} to {snapshot}?[/bold red]"):
+        console.print("[yellow]Operation aborted by user.[/yellow]")
+        return
+
+    try:
+        for name in others:
+            console.print(f"[bold blue]→[/bold blue] Dropping snapshot [cyan]{name}[/cyan]...")
+            run_sqlcmd(server, f"DROP DATABASE [{name}];")
+
+        set_single_user(server, database)
+
+        console.print(f"[bold blue]→[/bold blue] Reverting to [cyan]{snapshot}[/cyan]...")
+        run_sqlcmd(server, f"RESTORE DATABASE [{database}] FROM DATABASE_SNAPSHOT = '{snapshot}';")
+
+        set_multi_user(server, database)
+
+        console.print(f"\n[bold green]SUCCESS:[/bold green] {database} has been reverted to {snapshot}.")
+
+    except subprocess.CalledProcessError as e:
+        console.print(f"\n[bold red]REVERT FAILED[/bold red]\n{format_sqlcmd_error(e)}")
+        reset_multi_user(server, database)
+    finally:
+        logger.info(f"Snapshot revert finished for {database}")
+
+
+def setup_parser(subparsers):
+    """
+    Configures the parser for the 'snapshot' subcommand.
+    """
+    snapshot_parser = subparsers.add_parser("snapshot", help="Create, revert, list or drop database snapshots.")
+    snapshot_subparsers = snapshot_parser.add_subparsers(title="actions", dest="snapshot_command", required=True)
+
+    def add_common_arguments(parser):
+        parser.add_argument("-s", "--server", default=DEFUALT_SERVER, help="SQL Server")
+        parser.add_argument("-d", "--database", default=DEFAULT_DB, help="Source database of the snapshot")
+
+    create_parser = snapshot_subparsers.add_parser("create", help="Create a snapshot of the database.")
+    add_common_arguments(create_parser)
+    create_parser.add_argument("name", nargs="?", help="Snapshot label (default: current timestamp)")
+    create_parser.set_defaults(func=create_snapshot)
+
+    revert_parser = snapshot_subparsers.add_parser("revert", help="Revert the database to a snapshot.")
+    add_common_arguments(revert_parser)
+    revert_parser.add_argument("snapshot", nargs="?", help="Snapshot to revert to (default: the newest)")
+    revert_parser.add_argument("--drop-others", action="store_true", help="Drop the database's other snapshots first.")
+    revert_parser.add_argument("-y", "--yes", action="store_true", help="Skip confirmation prompt.")
+    revert_parser.set_defaults(func=revert_snapshot)
+
+    list_parser = snapshot_subparsers.add_parser("list", help="List the database's snapshots.")
+    add_common_arguments(list_parser)
+    list_parser.set_defaults(func=show_snapshots)
+
+    drop_parser = snapshot_subparsers.add_parser("drop", help="Drop a snapshot.")
+    add_common_arguments(drop_parser)
+    drop_parser.add_argument("snapshot", help="Snapshot to drop")
+    drop_parser.add_argument("-y", "--yes", action="store_true", help="Skip confirmation prompt.")
+    drop_parser.set_defaults(func=drop_snapshot)
@@ -12,6 +12,8 @@ from sa_conversion_utils.utils.detect_encoding import detect_encoding
 from sa_conversion_utils.commands.backup import backup
 from sa_conversion_utils.utils.create_engine import main as create_engine
 from sa_conversion_utils.utils.detect_delimiter import detect_delimiter
+from sa_conversion_utils.utils.compression import strip_compression_suffix
+from sa_conversion_utils.utils.sanitize_utils import sanitize_dataframe
 
 console = Console()
 encodings = ['ISO-889-1', 'latin1', 'cp1252', 'utf-8']
@@ -38,7 +40,7 @@ def import_csv(args: argparse.Namespace):
     if os.path.isdir(input_path):
         data_files = [
             os.path.join(input_path, f) for f in os.listdir(input_path)
-            if f.lower().endswith(tuple(extensions)) and os.path.getsize(os.path.join(input_path, f)) > 0
+            if strip_compression_suffix(f.lower()).endswith(tuple(extensions)) and os.path.getsize(os.path.join(input_path, f)) > 0
         ]
         if not data_files:
             logger.warning(f"No files with specified extensions found in the directory: {input_path}")
@@ -46,7 +48,7 @@ def import_csv(args: argparse.Namespace):
         
     # If input path is a file, check if it is a CSV or TXT
     elif os.path.isfile(input_path):
-        if input_path.lower().endswith(tuple(extensions)) and os.path.getsize(input_path) > 0:
+        if strip_compression_suffix(input_path.lower()).endswith(tuple(extensions)) and os.path.getsize(input_path) > 0:
             data_files = [input_path]
         else:
             logger.warning(f"The specified file does not have one of the required extensions: {input_path}")
@@ -83,7 +85,7 @@ def import_csv(args: argparse.Namespace):
             progress.update(overall_task, description=f"[cyan]Importing {file_name}")
 
             try:
-                # Read the CSV file into a pandas DataFrame
+                # Read the CSV file into a pandas DataFrame (.gz/.zst are decompressed by extension)
                 detected_encoding = detect_encoding(file_path)
                 detected_delimiter = detect_delimiter(file_path, detected_encoding)
                 try:
@@ -97,7 +99,11 @@ def import_csv(args: argparse.Namespace):
                     progress.console.print(f"  ℹ️  Skipping {file_name} - empty or only contains header.")
                     continue
 
-                table_name = os.path.splitext(os.path.basename(file_path))[0]
+                # Tabs and line breaks are data (e.g. multi-line notes); other control characters are not
+                if args.sanitize:
+                    df = sanitize_dataframe(df, keep_whitespace=True)
+
+                table_name = os.path.splitext(strip_compression_suffix(os.path.basename(file_path)))[0]
                 
                 # Use to_sql with the if_exists argument
                 df.to_sql(table_name, engine, index=False, if_exists=if_exists, chunksize=chunk_size)
@@ -172,4 +178,9 @@ def setup_parser(subparsers):
         metavar="",
         help="Action to take if the table already exists (default: append)."
     )
+    import_parser.add_argument(
+        "--sanitize",
+        action="store_true",
+        help="Remove control characters (other than tabs and line breaks) from values before importing."
+    )
     import_parser.set_defaults(func=import_csv)
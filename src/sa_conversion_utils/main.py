@@ -5,12 +5,14 @@ import logging
 # Commands
 from .commands.backup import setup_parser as backup_parser
 from .commands.restore import setup_parser as restore_parser
+from .commands.snapshot import setup_parser as snapshot_parser
 from .commands.run.run import setup_parser as run_parser
 from .commands.extract_highrise.main import add_extract_highrise_parser
 from .commands.map import setup_parser as map_parser
 from .commands.encrypt import setup_parser as encrypt_parser
 from .commands.scan.scan import setup_parser as scan_parser
 from .commands.postgresql.export_csv import setup_parser as export_postgresql_csv_parser
+from .commands.postgresql.export_parquet import setup_parser as export_postgresql_parquet_parser
 from .commands.sqlserver.import_csv import setup_parser as import_sqlserver_csv_parser
 from .commands.setup_project.main import setup_init_command as setup_project_parser
 # from .logging.logger_config import logger_config
@@ -43,11 +45,12 @@ def main():
     # General Commands
     backup_parser(subparsers)
     restore_parser(subparsers)
+    snapshot_parser(subparsers)
     encrypt_parser(subparsers)
     run_parser(subparsers)
     # add_extract_highrise_parser(subparsers)
-    # map_parser(subparsers)
-    # scan_parser(subparsers)
+    map_parser(subparsers)
+    scan_parser(subparsers)
     setup_project_parser(subparsers)
 
     # PostgreSQL export command and its subcommands
@@ -58,6 +61,7 @@ def main():
         title="Supported exports", dest="export_command", required=True
     )
     export_postgresql_csv_parser(postgresql_subparsers)
+    export_postgresql_parquet_parser(postgresql_subparsers)
 
     # SQL Server import command and its subcommands
     sqlserver_parser = subparsers.add_parser(
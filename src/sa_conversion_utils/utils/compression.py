@@ -0,0 +1,258 @@
+import os
+import gzip
+import shutil
+import logging
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# File suffix added for each supported compression format
+COMPRESSION_SUFFIXES = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+# Archive formats that can be decompressed back to a single file
+ARCHIVE_SUFFIXES = (".gz", ".zst", ".zip")
+
+# Large buffers keep the many small COPY blocks from turning into many small writes
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+# Input block size for block-parallel gzip; each block becomes one gzip member
+GZIP_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def require_zstandard():
+    """Import the optional zstandard package, with an actionable error if it is missing."""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "zstd compression requires the 'zstandard' package. "
+            "Install it with: pip install sa-conversion-utils[zstd]"
+        ) from e
+    return zstandard
+
+
+def compression_suffix(compression: str = None) -> str:
+    """Returns the file suffix for a compression format, or '' for no compression."""
+    return COMPRESSION_SUFFIXES.get(compression, "")
+
+
+def strip_compression_suffix(path: str) -> str:
+    """Removes a known compression suffix, e.g. 'notes.csv.gz' -> 'notes.csv'."""
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if path.lower().endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def archive_suffix(path: str) -> str:
+    """Returns the archive suffix of path ('.gz', '.zst' or '.zip'), or '' if it is not an archive."""
+    for suffix in ARCHIVE_SUFFIXES:
+        if path.lower().endswith(suffix):
+            return path[-len(suffix):]
+    return ""
+
+
+class CountingReader:
+    """File wrapper that reports the number of bytes read from the underlying file."""
+
+    def __init__(self, raw, on_bytes):
+        self.raw = raw
+        self.on_bytes = on_bytes
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.on_bytes(len(data))
+        return data
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        self.on_bytes(count or 0)
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class HashingReader:
+    """File wrapper that feeds every byte read into a hashlib digest."""
+
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.digest.update(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class HashingWriter:
+    """File wrapper that feeds every byte written to disk into a hashlib digest."""
+
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+    def writable(self):
+        return True
+
+
+@contextmanager
+def open_compressed_writer(path: str, compression: str = None, level: int = None, digest=None):
+    """
+    Opens path for binary writing, compressing on the fly when compression
+    is 'gzip' or 'zstd'. Output goes through a large write buffer.
+
+    If a hashlib digest is given it is updated with the bytes as stored on
+    disk (i.e. after compression), so no second read is needed to checksum.
+    """
+    file_obj = open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+    raw = HashingWriter(file_obj, digest) if digest is not None else file_obj
+    try:
+        if compression == "gzip":
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level or 6) as f:
+                yield f
+        elif compression == "zstd":
+            zstandard = require_zstandard()
+            compressor = zstandard.ZstdCompressor(level=level or 3, threads=-1)
+            with compressor.stream_writer(raw, closefd=False) as f:
+                yield f
+        else:
+            yield raw
+    finally:
+        file_obj.close()
+
+
+def open_data_file(path: str, mode: str = "rb", encoding: str = None, errors: str = None):
+    """
+    Opens a possibly-compressed data file for reading. The format is chosen
+    from the file extension (.gz, .zst); anything else is opened as-is.
+    Use mode 'rt' for text.
+    """
+    lower = path.lower()
+    if lower.endswith(COMPRESSION_SUFFIXES["gzip"]):
+        return gzip.open(path, mode, encoding=encoding, errors=errors)
+    if lower.endswith(COMPRESSION_SUFFIXES["zstd"]):
+        zstandard = require_zstandard()
+        return zstandard.open(path, mode, encoding=encoding, errors=errors)
+    return open(path, mode.replace("t", ""), encoding=encoding, errors=errors)
+
+
+def parallel_gzip_copy(src, dst, level: int = 6, threads: int = None, block_size: int = GZIP_BLOCK_SIZE):
+    """
+    Compresses src into dst as a series of independent gzip members, one per
+    block, compressed concurrently (zlib releases the GIL). Concatenated
+    members are a valid gzip stream for any reader. At most two blocks per
+    thread are held in memory at a time.
+    """
+    threads = threads or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+        for block in iter(lambda: src.read(block_size), b""):
+            pending.append(executor.submit(gzip.compress, block, level, mtime=0))
+            if len(pending) >= threads * 2:
+                dst.write(pending.popleft().result())
+        while pending:
+            dst.write(pending.popleft().result())
+
+
+def compress_file(
+        src_path: str,
+        dst_path: str,
+        compression: str = "gzip",
+        level: int = None,
+        threads: int = None,
+        digest=None
+    ):
+    """
+    Streams src_path into a compressed dst_path using all cores: block-parallel
+    gzip, or zstd with its own worker threads. The file is never loaded into
+    memory, and the result appears under dst_path only once complete.
+
+    If a hashlib digest is given it is updated with the source bytes as they
+    are read, so the uncompressed file is checksummed in the same pass.
+    """
+    threads = threads or os.cpu_count() or 1
+    tmp_path = f"{dst_path}.tmp"
+    try:
+        with open(src_path, "rb", buffering=WRITE_BUFFER_SIZE) as raw, open(tmp_path, "wb", buffering=WRITE_BUFFER_SIZE) as dst:
+            src = HashingReader(raw, digest) if digest is not None else raw
+            if compression == "gzip":
+                parallel_gzip_copy(src, dst, level or 6, threads)
+            elif compression == "zstd":
+                zstandard = require_zstandard()
+                compressor = zstandard.ZstdCompressor(level=level or 3, threads=threads)
+                compressor.copy_stream(src, dst, read_size=WRITE_BUFFER_SIZE, write_size=WRITE_BUFFER_SIZE)
+            else:
+                raise ValueError(f"Unsupported compression: {compression}")
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def decompress_file(src_path: str, dst_path: str, on_bytes=None):
+    """
+    Streams a .gz, .zst or single-file .zip archive into dst_path without
+    holding it in memory. on_bytes(n) is called with the number of archive
+    bytes consumed, so progress can be measured against the archive size.
+    The result appears under dst_path only once complete.
+    """
+    suffix = archive_suffix(src_path).lower()
+    tmp_path = f"{dst_path}.tmp"
+    try:
+        with open(src_path, "rb", buffering=WRITE_BUFFER_SIZE) as raw, open(tmp_path, "wb", buffering=WRITE_BUFFER_SIZE) as dst:
+            src = CountingReader(raw, on_bytes) if on_bytes else raw
+            if suffix == ".gz":
+                with gzip.GzipFile(fileobj=src, mode="rb") as f:
+                    shutil.copyfileobj(f, dst, WRITE_BUFFER_SIZE)
+            elif suffix == ".zst":
+                zstandard = require_zstandard()
+                with zstandard.ZstdDecompressor().stream_reader(src, read_size=WRITE_BUFFER_SIZE) as f:
+                    shutil.copyfileobj(f, dst, WRITE_BUFFER_SIZE)
+            elif suffix == ".zip":
+                with zipfile.ZipFile(src) as archive:
+                    members = [m for m in archive.infolist() if not m.is_dir()]
+                    if len(members) != 1:
+                        raise ValueError(f"Expected exactly one file in {src_path}, found {len(members)}")
+                    with archive.open(members[0]) as f:
+                        shutil.copyfileobj(f, dst, WRITE_BUFFER_SIZE)
+            else:
+                raise ValueError(f"Not a supported archive: {src_path}")
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+__all__ = [
+    'COMPRESSION_SUFFIXES',
+    'HashingWriter',
+    'HashingReader',
+    'compression_suffix',
+    'strip_compression_suffix',
+    'open_compressed_writer',
+    'open_data_file',
+    'parallel_gzip_copy',
+    'compress_file',
+    'archive_suffix',
+    'decompress_file',
+]
@@ -13,7 +13,8 @@ def main(
         username=None,
         password=None,
         port=None,
-        database="master"
+        database="master",
+        pool_size=5
 ):
 
 	# If username and password are omitted, use windows authentication (trusted connection)
@@ -46,9 +47,11 @@ def main(
 
     # conn_str = f'mssql+pyodbc://{server}/{database}?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes'
     # connection_string = f"mssql+pyodbc://sa:SAsuper@{server}/{database}?driver=ODBC+Driver+17+for+SQL+Server"
+	# pool_size bounds the connections kept open for concurrent queries
 	engine = create_engine(
 		connection_url,
-		pool_pre_ping=True
+		pool_pre_ping=True,
+		pool_size=pool_size
 	)
 
 	return engine
\ No newline at end of file
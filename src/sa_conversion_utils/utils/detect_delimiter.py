@@ -1,5 +1,6 @@
 import csv
 import logging
+from .compression import open_data_file
 
 def detect_delimiter(file_path, encoding):
     """
@@ -7,7 +8,7 @@ def detect_delimiter(file_path, encoding):
     Returns the detected delimiter or a default delimiter (comma) if detection fails.
     """
     try:
-        with open(file_path, 'r', encoding=encoding) as file:
+        with open_data_file(file_path, 'rt', encoding=encoding) as file:
             sample = file.readline()
             sniffer = csv.Sniffer()
             try:
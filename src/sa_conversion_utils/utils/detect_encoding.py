@@ -1,6 +1,7 @@
 import chardet
+from .compression import open_data_file
 
 def detect_encoding(file_path):
-    with open(file_path, 'rb') as f:
+    with open_data_file(file_path, 'rb') as f:
         result = chardet.detect(f.read())
         return result['encoding']
\ No newline at end of file
@@ -0,0 +1,23 @@
+import os
+import json
+import hashlib
+from typing import Dict
+
+CHECKSUM_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def file_checksum(path: str) -> str:
+    """Returns the sha256 hex digest of a file, read in large chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path: str, data: Dict):
+    """Writes JSON to a temp file and renames it over path, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
@@ -1,14 +1,99 @@
+import numpy as np
 import pandas as pd
 import re
 
+# C0 and C1 control characters; tab, line feed and carriage return are the
+# only ones worth keeping (e.g. in multi-line notes loaded from CSV)
+CONTROL_CHARACTERS = re.compile(r'[\x00-\x1F\x7F-\x9F]')
+CONTROL_CHARACTERS_EXCEPT_WHITESPACE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]')
+
+# Strings checked per block, which bounds the memory of the UTF-32 buffer
+CHECK_BLOCK_SIZE = 100_000
+
 def clean_string(value):
     """Remove non-printable or control characters from a string."""
     if isinstance(value, str):
-        return re.sub(r'[\x00-\x1F\x7F-\x9F]', '', value)
+        return CONTROL_CHARACTERS.sub('', value)
     return value
 
-def sanitize_dataframe(df):
-    """Sanitize a DataFrame by cleaning its string values."""
-    return df.map(clean_string)
+def control_lookup(keep_whitespace=False):
+    """Boolean table indexed by code point, True for the characters to remove. Code points past it are kept."""
+    lookup = np.zeros(0xA1, dtype=bool)
+    lookup[:0x20] = True
+    lookup[0x7F:0xA0] = True
+    if keep_whitespace:
+        lookup[[0x09, 0x0A, 0x0D]] = False
+    return lookup
+
+def find_dirty_strings(strings, lookup):
+    """
+    Returns a boolean array flagging the strings that contain a character
+    of the lookup table. The strings are joined and encoded as UTF-32, so
+    each code point is one array element and the check runs in numpy
+    rather than as a regex call per string.
+    """
+    dirty = np.zeros(len(strings), dtype=bool)
+    for start in range(0, len(strings), CHECK_BLOCK_SIZE):
+        block = strings[start:start + CHECK_BLOCK_SIZE]
+        lengths = np.fromiter(map(len, block), dtype=np.int64, count=len(block))
+        codes = np.frombuffer(''.join(block).encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+        hits = np.concatenate(([0], np.cumsum(lookup[np.minimum(codes, len(lookup) - 1)])))
+        ends = np.cumsum(lengths)
+        dirty[start:start + len(block)] = hits[ends] > hits[ends - lengths]
+    return dirty
+
+def sanitize_series(series, keep_whitespace=False):
+    """
+    Returns the series with control characters removed from its strings, or
+    the series itself if it has none.
+
+    Clean columns (the common case) cost one vectorized check and are not
+    copied; in dirty ones only the flagged strings are rewritten. Arrow-backed
+    string columns are checked with Arrow's regex kernel, object columns with
+    a numpy lookup over their code points. Object columns mixing strings with
+    other values fall back to cleaning cell by cell.
+    """
+    pattern = CONTROL_CHARACTERS_EXCEPT_WHITESPACE if keep_whitespace else CONTROL_CHARACTERS
+
+    if isinstance(series.dtype, pd.StringDtype) and series.dtype.storage == 'pyarrow':
+        dirty = series.str.contains(pattern.pattern, regex=True, na=False).to_numpy(dtype=bool)
+        if not dirty.any():
+            return series
+        cleaned = series.copy()
+        cleaned[dirty] = series[dirty].str.replace(pattern.pattern, '', regex=True)
+        return cleaned
+
+    kind = pd.api.types.infer_dtype(series, skipna=True)
+    if kind == 'empty':
+        return series
+    if kind != 'string':
+        return series.map(lambda value: pattern.sub('', value) if isinstance(value, str) else value)
+
+    values = series.to_numpy(dtype=object)
+    positions = np.flatnonzero(series.notna().to_numpy())
+    positions = positions[find_dirty_strings(values[positions], control_lookup(keep_whitespace))]
+    if not len(positions):
+        return series
+    values = values.copy()
+    values[positions] = [pattern.sub('', value) for value in values[positions]]
+    return pd.Series(values, index=series.index, name=series.name, dtype=series.dtype)
+
+def sanitize_dataframe(df, keep_whitespace=False):
+    """
+    Sanitize a DataFrame by cleaning its string values. Only object and
+    string columns are looked at, and only dirty ones are copied; the input
+    is not modified. With keep_whitespace, tabs and line breaks are kept.
+    """
+    sanitized = None
+    for position in range(len(df.columns)):
+        series = df.iloc[:, position]
+        if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+            continue
+        cleaned = sanitize_series(series, keep_whitespace=keep_whitespace)
+        if cleaned is not series:
+            if sanitized is None:
+                sanitized = df.copy(deep=False)
+            sanitized.isetitem(position, cleaned)
+    return df if sanitized is None else sanitized
 
-__all__ = ['clean_string', 'sanitize_dataframe']
\ No newline at end of file
+__all__ = ['CONTROL_CHARACTERS', 'clean_string', 'sanitize_series', 'sanitize_dataframe']
@@ -0,0 +1,184 @@
+import re
+import time
+import logging
+import threading
+import subprocess
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+from rich.console import Console
+from rich.progress import (
+    Progress,
+    BarColumn,
+    DownloadColumn,
+    TextColumn,
+    TimeElapsedColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+
+logger = logging.getLogger(__name__)
+console = Console()
+
+# "10 percent processed." as printed for WITH STATS = n
+STATS_PATTERN = re.compile(r"^\s*(\d+)\s+percent processed", re.IGNORECASE)
+
+# Column separator for result sets read back from sqlcmd
+FIELD_SEPARATOR = "\t"
+
+# Switch to polling sys.dm_exec_requests if sqlcmd prints no STATS message for this long
+POLL_AFTER_SECONDS = 15
+POLL_INTERVAL_SECONDS = 5
+
+
+def sqlcmd_query(server: str, query: str, database: str = "master") -> List[str]:
+    """
+    Runs a query through sqlcmd without headers or padding and returns the
+    non-empty output lines. Raises CalledProcessError on failure.
+    """
+    result = subprocess.run(
+        ["sqlcmd", "-S", server, "-d", database, "-b", "-h", "-1", "-W", "-Q", f"SET NOCOUNT ON; {query}"],
+        check=True, capture_output=True, text=True, encoding="utf-8", errors="replace",
+    )
+    return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+
+def sqlcmd_scalar(server: str, query: str, database: str = "master") -> Optional[str]:
+    """Returns the first value of a single-value query, or None if it fails or returns NULL."""
+    try:
+        lines = sqlcmd_query(server, query, database)
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.debug(f"sqlcmd query failed: {e}")
+        return None
+    if not lines or lines[0] == "NULL":
+        return None
+    return lines[0]
+
+
+def sqlcmd_rows(server: str, query: str, database: str = "master") -> List[Dict[str, str]]:
+    """
+    Runs a query through sqlcmd and returns its first result set as a list of
+    dicts keyed by column name. Values are strings, NULL included as "NULL".
+    """
+    result = subprocess.run(
+        ["sqlcmd", "-S", server, "-d", database, "-b", "-W", "-s", FIELD_SEPARATOR, "-Q", f"SET NOCOUNT ON; {query}"],
+        check=True, capture_output=True, text=True, encoding="utf-8", errors="replace",
+    )
+    lines = [line for line in result.stdout.splitlines() if line.strip()]
+    if len(lines) < 2:
+        return []
+    # Line 0 is the header, line 1 the dashed underline
+    columns = [column.strip() for column in lines[0].split(FIELD_SEPARATOR)]
+    return [dict(zip(columns, (value.strip() for value in line.split(FIELD_SEPARATOR)))) for line in lines[2:]]
+
+
+def fetch_database_size(server: str, database: str) -> Optional[int]:
+    """Returns the allocated size of a database's data files in bytes, used to size the backup progress bar."""
+    value = sqlcmd_scalar(
+        server,
+        f"SELECT SUM(CAST(size AS bigint)) * 8192 FROM sys.master_files "
+        f"WHERE database_id = DB_ID(N'{database}') AND type = 0;",
+    )
+    return int(value) if value and value.isdigit() else None
+
+
+def poll_percent_complete(server: str, command: str, database: str) -> Optional[float]:
+    """
+    Reads percent_complete of the running BACKUP/RESTORE for a database from
+    sys.dm_exec_requests. Used when sqlcmd holds back its STATS messages.
+    """
+    value = sqlcmd_scalar(
+        server,
+        f"SELECT MAX(r.percent_complete) FROM sys.dm_exec_requests r "
+        f"CROSS APPLY sys.dm_exec_sql_text(r.sql_handle) t "
+        f"WHERE r.command LIKE '{command}%' AND t.text LIKE N'%[[]{database}]%';",
+    )
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def run_sqlcmd_with_progress(
+        server: str,
+        query: str,
+        description: str,
+        command: str,
+        database: str,
+        total_bytes: Optional[int] = None,
+        progress: Optional[Progress] = None,
+    ) -> List[str]:
+    """
+    Runs a BACKUP or RESTORE statement (which should include WITH STATS) and
+    drives a progress bar from the "n percent processed" lines sqlcmd prints
+    as they arrive. If no STATS line shows up for a while, percent_complete is
+    polled from sys.dm_exec_requests instead.
+
+    With total_bytes the bar shows size, throughput and ETA in bytes;
+    otherwise it counts percent. Pass a running Progress to add the task to
+    it instead, so several statements can run side by side. Returns the
+    output lines and raises CalledProcessError (with the output as bytes) if
+    sqlcmd fails.
+    """
+    cmd = ["sqlcmd", "-S", server, "-d", "master", "-b", "-Q", query]
+    total = total_bytes or 100
+    columns = [TextColumn("[progress.description]{task.description}"), BarColumn()]
+    if total_bytes:
+        columns += [DownloadColumn(), TransferSpeedColumn()]
+    else:
+        columns += [TextColumn("{task.percentage:>3.0f}%")]
+    columns += [TimeElapsedColumn(), TimeRemainingColumn()]
+
+    lines = []
+    last_stats = [time.monotonic()]
+    done = threading.Event()
+
+    with nullcontext(progress) if progress else Progress(*columns, console=console) as progress:
+        task = progress.add_task(description, total=total)
+
+        def update(percent: float):
+            progress.update(task, completed=min(percent, 100) * total / 100)
+
+        def poll():
+            while not done.wait(POLL_INTERVAL_SECONDS):
+                if time.monotonic() - last_stats[0] < POLL_AFTER_SECONDS:
+                    continue
+                percent = poll_percent_complete(server, command, database)
+                if percent is not None and not done.is_set():
+                    update(percent)
+
+        poller = threading.Thread(target=poll, daemon=True)
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, encoding="utf-8", errors="replace", bufsize=1,
+        )
+        poller.start()
+        try:
+            for line in process.stdout:
+                line = line.rstrip()
+                if not line:
+                    continue
+                lines.append(line)
+                match = STATS_PATTERN.match(line)
+                if match:
+                    last_stats[0] = time.monotonic()
+                    update(int(match.group(1)))
+                else:
+                    logger.debug(line)
+            returncode = process.wait()
+        finally:
+            done.set()
+            if process.poll() is None:
+                process.kill()
+            poller.join()
+
+        if returncode == 0:
+            progress.update(task, completed=total)
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output="\n".join(lines).encode(), stderr=b"")
+
+    # The last line is e.g. "BACKUP DATABASE successfully processed 123 pages in 4.5 seconds (210.3 MB/sec)."
+    if lines:
+        logger.info(lines[-1])
+    return lines
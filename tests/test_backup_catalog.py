@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from sa_conversion_utils.commands.backup import stripe_paths
+from sa_conversion_utils.commands.backup_catalog import BackupCatalog, backup_set_key, split_backup_name, stripe_index
+from sa_conversion_utils.commands.restore import catalog_stripe_set, collect_stripe_set
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"bak")
+    return path
+
+
+def test_split_backup_name_uses_known_database():
+    assert split_backup_name("Sales_DB_pre_import_2024-05-01.bak", "Sales_DB") == ("Sales_DB", "pre_import", "2024-05-01")
+
+
+def test_split_backup_name_without_database_splits_at_first_underscore():
+    assert split_backup_name("Sales_pre_import_2024-05-01.bak") == ("Sales", "pre_import", "2024-05-01")
+    assert split_backup_name("Sales.bak") == ("Sales", None, None)
+
+
+def test_backup_set_key_and_stripe_index():
+    assert backup_set_key("Sales_x_2024-05-01_2of4.bak") == "Sales_x_2024-05-01.bak"
+    assert backup_set_key("Sales_x_2024-05-01.bak") == "Sales_x_2024-05-01.bak"
+    assert stripe_index("/backups/Sales_x_2024-05-01_3of4.bak") == 3
+    assert stripe_index("/backups/Sales_x_2024-05-01.bak") == 0
+
+
+def test_stripe_paths_single_file_keeps_plain_name():
+    assert stripe_paths(["/a"], "Sales_x", 1) == [os.path.join("/a", "Sales_x.bak")]
+
+
+def test_stripe_paths_round_robin_over_output_dirs():
+    assert stripe_paths(["/a", "/b"], "Sales_x", 3) == [
+        os.path.join("/a", "Sales_x_1of3.bak"),
+        os.path.join("/b", "Sales_x_2of3.bak"),
+        os.path.join("/a", "Sales_x_3of3.bak"),
+    ]
+    # At least one stripe per output directory
+    assert len(stripe_paths(["/a", "/b"], "Sales_x", 1)) == 2
+
+
+def make_catalog(tmp_path, backups):
+    catalog = BackupCatalog(str(tmp_path))
+    catalog.data["backups"] = backups
+    return catalog
+
+
+def full(created, checkpoint=None, database="Sales", copy_only=False):
+    header = {"CheckpointLSN": checkpoint, "IsCopyOnly": "1" if copy_only else "0"} if checkpoint else None
+    return {"type": "full", "database": database, "created": created, "header": header, "files": []}
+
+
+def differential(created, base_lsn=None, database="Sales"):
+    header = {"DifferentialBaseLSN": base_lsn} if base_lsn else None
+    return {"type": "differential", "database": database, "created": created, "header": header, "files": []}
+
+
+def test_find_base_matches_lsn_over_dates(tmp_path):
+    catalog = make_catalog(tmp_path, {
+        "old.bak": full("2024-05-01T00:00:00", checkpoint="100"),
+        "new.bak": full("2024-05-02T00:00:00", checkpoint="200"),
+        "diff.bak": differential("2024-05-03T00:00:00", base_lsn="100"),
+    })
+    assert catalog.find_base("diff.bak") == "old.bak"
+    assert catalog.restore_chain("diff.bak") == ["old.bak", "diff.bak"]
+
+
+def test_find_base_skips_copy_only_fulls(tmp_path):
+    catalog = make_catalog(tmp_path, {
+        "copy.bak": full("2024-05-01T00:00:00", checkpoint="100", copy_only=True),
+        "diff.bak": differential("2024-05-03T00:00:00", base_lsn="100"),
+    })
+    assert catalog.find_base("diff.bak") is None
+    with pytest.raises(FileNotFoundError):
+        catalog.restore_chain("diff.bak")
+
+
+def test_find_base_without_headers_takes_newest_earlier_full_of_the_database(tmp_path):
+    catalog = make_catalog(tmp_path, {
+        "first.bak": full("2024-05-01T00:00:00"),
+        "second.bak": full("2024-05-02T00:00:00"),
+        "later.bak": full("2024-05-04T00:00:00"),
+        "other.bak": full("2024-05-02T12:00:00", database="Billing"),
+        "diff.bak": differential("2024-05-03T00:00:00"),
+    })
+    assert catalog.find_base("diff.bak") == "second.bak"
+
+
+def test_restore_chain_of_full_is_the_full_alone(tmp_path):
+    catalog = make_catalog(tmp_path, {"full.bak": full("2024-05-01T00:00:00")})
+    assert catalog.restore_chain("full.bak") == ["full.bak"]
+
+
+def test_collect_stripe_set_finds_all_stripes(tmp_path):
+    paths = [touch(str(tmp_path / f"Sales_x_{i}of3.bak")) for i in (1, 2, 3)]
+    assert collect_stripe_set(paths[1]) == paths
+    plain = touch(str(tmp_path / "Sales_y.bak"))
+    assert collect_stripe_set(plain) == [plain]
+
+
+def test_collect_stripe_set_reports_missing_stripes(tmp_path):
+    first = touch(str(tmp_path / "Sales_x_1of3.bak"))
+    touch(str(tmp_path / "Sales_x_3of3.bak"))
+    with pytest.raises(FileNotFoundError, match="Sales_x_2of3.bak"):
+        collect_stripe_set(first)
+
+
+def test_catalog_stripe_set_spans_output_directories(tmp_path):
+    paths = [touch(path) for path in stripe_paths([str(tmp_path / "a"), str(tmp_path / "b")], "Sales_x", 2)]
+    catalog = BackupCatalog(str(tmp_path / "a"))
+    entry = catalog.record(paths, "Sales", "x")
+    assert catalog_stripe_set(catalog, entry) == paths
+
+    os.remove(paths[1])
+    with pytest.raises(FileNotFoundError):
+        catalog_stripe_set(catalog, entry)
+
+
+def test_catalog_stripe_set_checks_the_stripe_count(tmp_path):
+    paths = [touch(path) for path in stripe_paths([str(tmp_path / "a"), str(tmp_path / "b")], "Sales_x", 3)]
+    catalog = BackupCatalog(str(tmp_path / "a"))
+    entry = catalog.record(paths[:2], "Sales", "x")
+    with pytest.raises(FileNotFoundError, match="Sales_x_3of3.bak"):
+        catalog_stripe_set(catalog, entry)
@@ -0,0 +1,123 @@
+import io
+import os
+import random
+import zlib
+
+import pytest
+
+from sa_conversion_utils.commands.backup_store import (
+    BackupStore,
+    StoreBusyError,
+    GC_LOCK,
+    iter_chunks,
+    reassemble,
+)
+
+# Small chunks so a few hundred KB of data spans many boundaries and read blocks
+CHUNK_PARAMS = {"min_size": 1024, "max_size": 16 * 1024, "bits": 12}
+
+
+def random_bytes(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+def chunks_of(data, block_size=4096, workers=1):
+    return list(iter_chunks(io.BytesIO(data), block_size=block_size, workers=workers, **CHUNK_PARAMS))
+
+
+def test_iter_chunks_reassembles_and_respects_sizes():
+    data = random_bytes(300_000)
+    chunks = chunks_of(data)
+    assert b"".join(chunks) == data
+    assert all(len(chunk) <= CHUNK_PARAMS["max_size"] for chunk in chunks)
+    assert all(len(chunk) >= CHUNK_PARAMS["min_size"] for chunk in chunks[:-1])
+
+
+def test_iter_chunks_boundaries_do_not_depend_on_read_blocks():
+    data = random_bytes(300_000)
+    assert chunks_of(data, block_size=4096) == chunks_of(data, block_size=100_000, workers=3)
+
+
+def test_iter_chunks_boundaries_survive_an_insertion():
+    data = random_bytes(300_000)
+    edited = data[:50_000] + b"inserted bytes" + data[50_000:]
+    before, after = chunks_of(data), chunks_of(edited)
+    # Only the chunks around the edit change; everything after it resynchronizes
+    shared = set(before) & set(after)
+    assert len(shared) >= len(before) - 3
+    assert before[-5:] == after[-5:]
+
+
+def test_iter_chunks_cuts_uniform_data_at_max_size():
+    chunks = chunks_of(bytes(100_000))
+    assert b"".join(chunks) == bytes(100_000)
+    assert all(len(chunk) == CHUNK_PARAMS["max_size"] for chunk in chunks[:-1])
+
+
+def write_bak(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_add_and_reassemble_roundtrip_deduplicates(tmp_path):
+    store = BackupStore(str(tmp_path / "store"), "zlib")
+    data = random_bytes(3_000_000)
+    first = store.add(write_bak(tmp_path / "a.bak", data), workers=2)
+    second = store.add(write_bak(tmp_path / "b.bak", data[:1_000_000] + b"changed" + data[1_000_000:]), workers=2)
+
+    assert first["new_chunks"] == len(first["chunks"])
+    assert second["new_chunks"] < len(second["chunks"])
+
+    reassemble(store.manifest_path("a.bak"), str(tmp_path / "out.bak"))
+    with open(tmp_path / "out.bak", "rb") as f:
+        assert f.read() == data
+
+
+def test_store_keeps_its_compression(tmp_path):
+    store_dir = str(tmp_path / "store")
+    BackupStore(store_dir, "zlib").add(write_bak(tmp_path / "a.bak", random_bytes(10_000)))
+
+    assert BackupStore(store_dir).compression == "zlib"
+    with pytest.raises(ValueError, match="zlib"):
+        BackupStore(store_dir, "zstd")
+
+
+def test_reassemble_detects_corrupt_chunks(tmp_path):
+    store = BackupStore(str(tmp_path / "store"), "zlib")
+    manifest = store.add(write_bak(tmp_path / "a.bak", random_bytes(10_000)))
+    digest, size = manifest["chunks"][0]
+    with open(store.chunk_path(digest), "wb") as f:
+        f.write(zlib.compress(random_bytes(size, seed=1)))
+
+    with pytest.raises(ValueError, match="corrupt"):
+        reassemble(store.manifest_path("a.bak"), str(tmp_path / "out.bak"))
+    assert not os.path.exists(tmp_path / "out.bak")
+
+
+def test_gc_removes_only_unreferenced_chunks(tmp_path):
+    store = BackupStore(str(tmp_path / "store"), "zlib")
+    manifest = store.add(write_bak(tmp_path / "a.bak", random_bytes(10_000)))
+    orphan = store.chunk_path("ff" + "0" * 62)
+    os.makedirs(os.path.dirname(orphan), exist_ok=True)
+    with open(orphan, "wb") as f:
+        f.write(b"orphan")
+
+    assert store.gc() == 1
+    assert not os.path.exists(orphan)
+    assert all(os.path.exists(store.chunk_path(digest)) for digest, _ in manifest["chunks"])
+
+
+def test_gc_and_add_exclude_each_other(tmp_path):
+    store = BackupStore(str(tmp_path / "store"), "zlib")
+    store.add(write_bak(tmp_path / "a.bak", random_bytes(10_000)))
+
+    lock = store.create_lock("add-test.lock")
+    with pytest.raises(StoreBusyError):
+        store.gc()
+    os.remove(lock)
+
+    store.create_lock(GC_LOCK)
+    with pytest.raises(StoreBusyError):
+        store.add(write_bak(tmp_path / "b.bak", random_bytes(10_000, seed=1)))
+    assert not store.active_adds()
@@ -0,0 +1,45 @@
+import pytest
+
+from sa_conversion_utils.commands.postgresql.export_csv import export_options
+from sa_conversion_utils.commands.postgresql.export_spec import load_export_spec, spec_for_table
+
+
+def write_spec(tmp_path, text):
+    path = tmp_path / "spec.yaml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_load_export_spec_layers_tables_over_defaults(tmp_path):
+    spec = load_export_spec(write_spec(tmp_path, """
+defaults:
+  limit: 1000
+tables:
+  notes:
+    columns: [id, body]
+    where: "note_date >= '2018-01-01'"
+  audit_log:
+    limit: 5
+"""))
+    assert spec_for_table(spec, "notes") == {"columns": ["id", "body"], "where": "note_date >= '2018-01-01'", "limit": 1000}
+    assert spec_for_table(spec, "audit_log") == {"columns": None, "where": None, "limit": 5}
+    assert spec_for_table(spec, "cases") == {"columns": None, "where": None, "limit": 1000}
+    assert spec_for_table(None, "cases") == {"columns": None, "where": None, "limit": None}
+
+
+@pytest.mark.parametrize("table_spec", [
+    "    colums: [id]",
+    "    columns: []",
+    "    limit: -1",
+    "    limit: many",
+])
+def test_load_export_spec_rejects_invalid_entries(tmp_path, table_spec):
+    with pytest.raises(ValueError):
+        load_export_spec(write_spec(tmp_path, f"tables:\n  notes:\n{table_spec}\n"))
+
+
+def test_export_options_change_with_compression_and_spec():
+    spec = {"columns": None, "where": None, "limit": None}
+    assert export_options("gzip", spec) == export_options("gzip", dict(spec))
+    assert export_options("gzip", spec) != export_options(None, spec)
+    assert export_options("gzip", spec) != export_options("gzip", {**spec, "where": "id > 10"})
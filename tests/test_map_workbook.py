@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import pandas as pd
+
+from sa_conversion_utils.commands.map_workbook import is_volatile_column, key_value, merge_annotations
+
+
+class FakeWorkbook:
+    """Stands in for ExistingWorkbook: a header row followed by value rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def iter_rows(self, sheet_name):
+        return iter(self.rows)
+
+
+def merged(chunks, rows, annotation_columns=("SA Role", "SA Party")):
+    return pd.concat(list(merge_annotations(chunks, FakeWorkbook(rows), "Party Roles", annotation_columns)), ignore_index=True)
+
+
+def test_key_value_normalizes_workbook_and_query_values():
+    assert key_value(12.0) == key_value(12) == key_value(Decimal("12")) == "12"
+    assert key_value(None) == key_value(float("nan")) == ""
+    assert key_value(" Plaintiff\x0b ") == "Plaintiff"
+
+
+def test_volatile_columns_are_recognized():
+    assert is_volatile_column("Count")
+    assert is_volatile_column("RecordCount")
+    assert is_volatile_column("total_cases")
+    assert is_volatile_column("Case #")
+    assert not is_volatile_column("role")
+
+
+def test_merge_annotations_carries_values_by_key_ignoring_counts():
+    rows = [
+        ("role", "Count", "SA Role", "SA Party"),
+        ("Plaintiff", 10, "Plaintiff", "P"),
+        ("Defendant", 3, None, None),
+    ]
+    chunks = [
+        pd.DataFrame({"role": ["Defendant"], "Count": [4], "SA Role": [None], "SA Party": [None]}),
+        pd.DataFrame({"role": ["Plaintiff", "Witness"], "Count": [12, 1], "SA Role": [None, None], "SA Party": [None, None]}),
+    ]
+    result = merged(chunks, rows)
+    assert result["role"].tolist() == ["Defendant", "Plaintiff", "Witness"]
+    assert result["Count"].tolist() == [4, 12, 1]
+    assert result["SA Role"].tolist() == [None, "Plaintiff", None]
+    assert result["SA Party"].tolist() == [None, "P", None]
+
+
+def test_merge_annotations_keeps_columns_analysts_added():
+    rows = [
+        ("role", "SA Role", "SA Party", "Notes"),
+        ("Plaintiff", None, None, "check with client"),
+    ]
+    chunks = [pd.DataFrame({"role": ["Plaintiff", "Witness"], "SA Role": [None, None], "SA Party": [None, None]})]
+    result = merged(chunks, rows)
+    assert list(result.columns) == ["role", "SA Role", "SA Party", "Notes"]
+    assert result["Notes"].tolist() == ["check with client", None]
+
+
+def test_merge_annotations_without_existing_rows_passes_chunks_through():
+    chunks = [pd.DataFrame({"role": ["Plaintiff"], "SA Role": [None], "SA Party": [None]})]
+    result = merged(chunks, [("role", "SA Role", "SA Party")])
+    pd.testing.assert_frame_equal(result, chunks[0])
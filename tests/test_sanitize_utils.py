@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sa_conversion_utils.utils.sanitize_utils import (
+    CONTROL_CHARACTERS_EXCEPT_WHITESPACE,
+    clean_string,
+    sanitize_dataframe,
+)
+
+DIRTY_VALUES = [
+    "plain",
+    "tab\there",
+    "line one\x0bline two\x00",
+    "new\r\nline",
+    "c1 control \x85\x9f end",
+    "nbsp\xa0kept",
+    "emoji \U0001F600 \x07bell",
+    "",
+    None,
+]
+
+
+def frame(string_dtype):
+    rows = 2_000
+    rng = np.random.default_rng(0)
+    values = [DIRTY_VALUES[i] for i in rng.integers(0, len(DIRTY_VALUES), rows)]
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "text": pd.Series(values, dtype=string_dtype),
+        "clean": pd.Series(["clean value"] * rows, dtype=string_dtype),
+        "amount": rng.random(rows),
+        "created": pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(rows), unit="min"),
+    })
+
+
+def values(df):
+    """The frame as plain objects with one missing marker; df.map re-infers dtypes (object -> str, None -> nan)."""
+    return df.astype(object).where(df.notna(), None)
+
+
+@pytest.mark.parametrize("string_dtype", [object, "string[python]", "string[pyarrow]"])
+def test_sanitize_dataframe_matches_per_cell_clean_string(string_dtype):
+    if string_dtype == "string[pyarrow]":
+        pytest.importorskip("pyarrow")
+    df = frame(string_dtype)
+    expected = df.map(clean_string)
+    result = sanitize_dataframe(df)
+    pd.testing.assert_frame_equal(values(result), values(expected))
+
+
+def test_sanitize_dataframe_keep_whitespace_matches_regex():
+    df = frame(object)
+    expected = df.map(lambda v: CONTROL_CHARACTERS_EXCEPT_WHITESPACE.sub("", v) if isinstance(v, str) else v)
+    pd.testing.assert_frame_equal(values(sanitize_dataframe(df, keep_whitespace=True)), values(expected))
+
+
+def test_sanitize_dataframe_does_not_modify_its_input():
+    df = frame(object)
+    before = df.copy()
+    sanitize_dataframe(df)
+    pd.testing.assert_frame_equal(df, before)
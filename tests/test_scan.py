@@ -0,0 +1,62 @@
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture
+def scan(tmp_path, monkeypatch):
+    # The scan module sets up its log file in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("sa_conversion_utils.commands.scan.scan")
+    # Directories written during the test are "racy" and never trusted otherwise
+    monkeypatch.setattr(module, "RACY_SECONDS", -1)
+    return module
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("select 1;")
+
+
+def make_tree(root):
+    touch(os.path.join(root, "init.sql"))
+    touch(os.path.join(root, "conv", "1_cases.sql"))
+    touch(os.path.join(root, "conv", "2_contacts.sql"))
+    touch(os.path.join(root, "conv", "notes.txt"))
+    touch(os.path.join(root, "conv", "lookups", "roles.sql"))
+    touch(os.path.join(root, ".git", "hook.sql"))
+    touch(os.path.join(root, "venv", "lib.sql"))
+
+
+def test_scan_directories_counts_scripts_and_prunes(scan, tmp_path):
+    root = str(tmp_path / "project")
+    make_tree(root)
+    counts = scan.scan_directories(root, {})
+    assert counts == {"": 1, "conv": 2, "conv/lookups": 1}
+
+
+def test_scan_directories_reuses_unchanged_directories(scan, tmp_path, monkeypatch):
+    root = str(tmp_path / "project")
+    make_tree(root)
+    index = {}
+    first = scan.scan_directories(root, index)
+
+    listed = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(scan.os, "scandir", lambda path: listed.append(path) or real_scandir(path))
+    assert scan.scan_directories(root, index) == first
+    assert listed == []
+
+    touch(os.path.join(root, "conv", "3_notes.sql"))
+    assert scan.scan_directories(root, index)["conv"] == 3
+    assert listed == [os.path.join(root, "conv")]
+
+
+def test_scan_directories_ignores_index_of_other_root(scan, tmp_path):
+    make_tree(str(tmp_path / "a"))
+    touch(str(tmp_path / "b" / "only.sql"))
+    index = {}
+    scan.scan_directories(str(tmp_path / "a"), index)
+    assert scan.scan_directories(str(tmp_path / "b"), index) == {"": 1}